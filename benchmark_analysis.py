@@ -0,0 +1,338 @@
+import argparse
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from datetime import time as dt_time
+from pathlib import Path
+
+from src.data.synthetic import generate_transactions, write_transactions
+from src.preprocessing.preprocessor import DataPreprocessor
+from src.features.feature_engineering import FeatureEngineer
+from src.models.sales_analyzer import SalesAnalyzer
+from src.models.sales_cube import SalesCube
+from src.models.partitioned import PartitionedExecutor
+from src.models.sql_backend import SQL_INPUTS
+from src.data.data_loader import DataLoader
+from src.models.forecaster import fit_seasonal, forecast_seasonal
+from src.visualization.sales_visualizer import SalesVisualizer
+from src.utils.profiling import StageProfiler
+
+def legacy_combine_date_time(df: pd.DataFrame) -> pd.Series:
+    """Previous implementation: string concatenation and re-parsing."""
+    df = df.copy()
+    if isinstance(df['transaction_time'].iloc[0], str):
+        df['transaction_time'] = pd.to_datetime(df['transaction_time']).dt.time
+    return pd.to_datetime(
+        df['transaction_date'].astype(str) + ' ' +
+        df['transaction_time'].astype(str)
+    )
+
+def make_datetime_frame(n_rows: int, time_kind: str = 'time', seed: int = 42) -> pd.DataFrame:
+    """Build date/time columns shaped like the coffee shop export.
+
+    Args:
+        n_rows (int): Number of rows
+        time_kind (str): 'time' for datetime.time, 'str' for HH:MM:SS strings
+            or 'timedelta' for timedelta64
+        seed (int): Random seed
+
+    Returns:
+        pd.DataFrame: Frame with transaction_date and transaction_time
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 181, n_rows), unit='D')
+    seconds = rng.integers(6 * 3600, 21 * 3600, n_rows)
+    offsets = pd.to_timedelta(seconds, unit='s')
+
+    if time_kind == 'timedelta':
+        times = offsets
+    else:
+        # Build the distinct values once and broadcast them, like a real load
+        day_seconds = np.arange(24 * 3600)
+        if time_kind == 'str':
+            lookup = np.array([f'{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}' for s in day_seconds],
+                              dtype=object)
+        else:
+            lookup = np.array([dt_time(s // 3600, s // 60 % 60, s % 60) for s in day_seconds],
+                              dtype=object)
+        times = lookup[seconds]
+    return pd.DataFrame({'transaction_date': dates, 'transaction_time': times})
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def benchmark_datetime(sizes=(1_000_000, 10_000_000), time_kinds=('time', 'str')) -> pd.DataFrame:
+    """Compare numeric and string-based datetime construction.
+
+    Args:
+        sizes (tuple): Row counts to benchmark
+        time_kinds (tuple): Input representations of transaction_time
+
+    Returns:
+        pd.DataFrame: Timings and an identical-output check per case
+    """
+    results = []
+    for n_rows in sizes:
+        for time_kind in time_kinds:
+            df = make_datetime_frame(n_rows, time_kind)
+            legacy, legacy_seconds = _timed(legacy_combine_date_time, df)
+
+            def fast(frame):
+                offsets, _ = DataPreprocessor._time_offsets(frame['transaction_time'])
+                return DataPreprocessor._combine_date_time(frame['transaction_date'], offsets)
+
+            numeric, numeric_seconds = _timed(fast, df)
+            results.append({
+                'rows': n_rows,
+                'time_input': time_kind,
+                'legacy_s': round(legacy_seconds, 3),
+                'numeric_s': round(numeric_seconds, 3),
+                'speedup': round(legacy_seconds / numeric_seconds, 1),
+                'identical': legacy.equals(numeric),
+            })
+            print(results[-1])
+    return pd.DataFrame(results)
+
+def profile_pipeline(df: pd.DataFrame, profiler: StageProfiler, figure_dir: str):
+    """Run every pipeline stage on raw data under the profiler.
+
+    Args:
+        df (pd.DataFrame): Raw transactions
+        profiler (StageProfiler): Profiler collecting the stage records
+        figure_dir (str): Directory for the rendered figures
+    """
+    rows = len(df)
+    with profiler.stage('preprocess', rows=rows):
+        df_processed = DataPreprocessor.preprocess_data(df)
+    with profiler.stage('check_data_quality', rows=rows):
+        DataPreprocessor.check_data_quality(df_processed)
+
+    # The individual feature methods, then the fused entry point
+    for method in ('create_time_features', 'create_sales_features', 'create_store_features'):
+        with profiler.stage(f'FeatureEngineer.{method}', rows=rows):
+            getattr(FeatureEngineer, method)(df_processed)
+    with profiler.stage('FeatureEngineer.create_features', rows=rows):
+        df_featured = FeatureEngineer.create_features(df_processed)
+
+    for method in ('analyze_sales_trends', 'analyze_product_performance',
+                   'analyze_store_performance', 'segment_customers'):
+        with profiler.stage(f'SalesAnalyzer.{method}', rows=rows):
+            getattr(SalesAnalyzer, method)(df_featured)
+
+    with profiler.stage('SalesCube.from_transactions', rows=rows):
+        cube = SalesCube.from_transactions(df_featured)
+    visualizer = SalesVisualizer(figure_dir)
+    for plot in ('plot_daily_sales_trend', 'plot_hourly_sales_pattern',
+                 'plot_product_category_sales', 'plot_store_performance', 'plot_sales_heatmap'):
+        with profiler.stage(f'SalesVisualizer.{plot}', rows=rows):
+            getattr(visualizer, plot)(cube)
+
+def benchmark_pipeline(sizes=(100_000, 1_000_000, 10_000_000), seed: int = 42,
+                       output_dir: str = 'reports/benchmarks',
+                       trace_memory: bool = False) -> pd.DataFrame:
+    """Profile the full pipeline on synthetic data of increasing size.
+
+    The data is generated from a fixed seed, so runs on the same machine are
+    comparable and regressions show up as changed stage timings.
+
+    Args:
+        sizes (tuple): Row counts to benchmark
+        seed (int): Seed of the synthetic data generator
+        output_dir (str): Directory for the JSON and CSV reports
+        trace_memory (bool): Also record tracemalloc allocations (slower)
+
+    Returns:
+        pd.DataFrame: Stage records of all sizes
+    """
+    output_dir = Path(output_dir)
+    reports = []
+    for n_rows in sizes:
+        print(f"\nPipeline benchmark with {n_rows:,} rows")
+        profiler = StageProfiler(trace_memory=trace_memory)
+        with profiler.stage('generate', rows=n_rows):
+            df = generate_transactions(n_rows, seed=seed)
+        with tempfile.TemporaryDirectory() as figure_dir:
+            profile_pipeline(df, profiler, figure_dir)
+        del df
+
+        profiler.to_json(output_dir / f'pipeline_{n_rows}.json')
+        profiler.to_csv(output_dir / f'pipeline_{n_rows}.csv')
+        report = profiler.report()
+        print(report[['stage', 'wall_s', 'cpu_s', 'peak_rss_mb']].round(3).to_string(index=False))
+        reports.append(report)
+    return pd.concat(reports, ignore_index=True)
+
+def benchmark_partitioned(sizes=(1_000_000, 10_000_000), workers=(1, 2, 4, 8, 16),
+                          partition_by: str = 'date', seed: int = 42) -> pd.DataFrame:
+    """Measure the speedup of partitioned execution over worker counts.
+
+    The synthetic data is written to Parquet first so every worker reads its
+    own shard, as it would from a real export.
+
+    Args:
+        sizes (tuple): Row counts to benchmark
+        workers (tuple): Pool sizes to compare
+        partition_by (str): Shard key, 'date' or 'store_id'
+        seed (int): Seed of the synthetic data generator
+
+    Returns:
+        pd.DataFrame: Timings and speedup over one worker per case
+    """
+    results = []
+    for n_rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / 'transactions.parquet'
+            write_transactions(path, n_rows, seed=seed)
+            baseline = None
+            for n_workers in workers:
+                executor = PartitionedExecutor(n_workers=n_workers, partition_by=partition_by)
+                _, seconds = _timed(executor.run, path)
+                baseline = baseline or seconds
+                results.append({
+                    'rows': n_rows,
+                    'workers': n_workers,
+                    'seconds': round(seconds, 3),
+                    'speedup': round(baseline / seconds, 2),
+                })
+                print(results[-1])
+    return pd.DataFrame(results)
+
+def benchmark_sql(sizes=(1_000_000, 10_000_000), seed: int = 42,
+                  threads=None) -> pd.DataFrame:
+    """Compare the pandas and DuckDB backends on the three sales analyses.
+
+    The pandas path loads and preprocesses the file before analyzing it; the
+    SQL path queries the Parquet file directly.
+
+    Args:
+        sizes (tuple): Row counts to benchmark
+        seed (int): Seed of the synthetic data generator
+        threads (Optional[int]): DuckDB worker threads, all cores when None
+
+    Returns:
+        pd.DataFrame: Timings and speedup of the SQL backend per size
+    """
+    methods = ('analyze_sales_trends', 'analyze_product_performance', 'analyze_store_performance')
+    results = []
+    for n_rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / 'transactions.parquet'
+            write_transactions(path, n_rows, seed=seed)
+
+            def pandas_path():
+                df = DataLoader(path, use_cache=False).load_data(columns=SQL_INPUTS)
+                df = DataPreprocessor.preprocess_data(df)
+                analyzer = SalesAnalyzer()
+                return [getattr(analyzer, method)(df) for method in methods]
+
+            def sql_path():
+                analyzer = SalesAnalyzer(backend='duckdb', threads=threads)
+                return [getattr(analyzer, method)(path) for method in methods]
+
+            _, pandas_seconds = _timed(pandas_path)
+            _, sql_seconds = _timed(sql_path)
+            results.append({
+                'rows': n_rows,
+                'pandas_s': round(pandas_seconds, 3),
+                'duckdb_s': round(sql_seconds, 3),
+                'speedup': round(pandas_seconds / sql_seconds, 2),
+            })
+            print(results[-1])
+    return pd.DataFrame(results)
+
+def make_series_grid(n_series: int, n_days: int = 181, seed: int = 42) -> np.ndarray:
+    """Random hourly demand with per-series level, weekday and hour profiles.
+
+    Args:
+        n_series (int): Number of series
+        n_days (int): Number of days
+        seed (int): Random seed
+
+    Returns:
+        np.ndarray: Array of shape (n_series, n_days, 24)
+    """
+    rng = np.random.default_rng(seed)
+    level = rng.gamma(2.0, 2.0, (n_series, 1, 1))
+    weekday = rng.uniform(0.7, 1.3, (n_series, 7))[:, np.arange(n_days) % 7, None]
+    hours = np.exp(-0.5 * ((np.arange(24) - rng.uniform(8, 16, (n_series, 1, 1))) / 3) ** 2)
+    return rng.poisson(level * weekday * hours).astype('float64')
+
+def benchmark_forecast(series_counts=(100, 1_000, 5_000), n_days: int = 181,
+                       history_days: int = 56, seed: int = 42) -> pd.DataFrame:
+    """Compare fitting all series as stacked arrays with a per-series loop.
+
+    Args:
+        series_counts (tuple): Numbers of series to fit
+        n_days (int): Days of history generated per series
+        history_days (int): Trailing days used for fitting
+        seed (int): Random seed
+
+    Returns:
+        pd.DataFrame: Fit times and the largest difference between the two
+            forecasts per case
+    """
+    results = []
+    for n_series in series_counts:
+        history = make_series_grid(n_series, n_days, seed)[:, -history_days:]
+
+        def stacked():
+            return forecast_seasonal(fit_seasonal(history, 0), 7)
+
+        def looped():
+            return np.concatenate([forecast_seasonal(fit_seasonal(history[i:i + 1], 0), 7)
+                                   for i in range(n_series)])
+
+        stacked_forecast, stacked_seconds = _timed(stacked)
+        looped_forecast, looped_seconds = _timed(looped)
+        results.append({
+            'series': n_series,
+            'stacked_s': round(stacked_seconds, 3),
+            'per_series_loop_s': round(looped_seconds, 3),
+            'speedup': round(looped_seconds / stacked_seconds, 1),
+            'max_abs_diff': float(np.abs(stacked_forecast - looped_forecast).max()),
+        })
+        print(results[-1])
+    return pd.DataFrame(results)
+
+def main():
+    parser = argparse.ArgumentParser(description='Coffee shop analysis benchmarks')
+    parser.add_argument('benchmark', choices=['datetime', 'pipeline', 'partitioned', 'forecast', 'sql'], nargs='?', default='pipeline',
+                        help='Benchmark to run')
+    parser.add_argument('--sizes', type=int, nargs='+', help='Row counts to benchmark')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Record tracemalloc allocations in the pipeline benchmark')
+    parser.add_argument('--series', type=int, nargs='+',
+                        help='Series counts for the forecast benchmark')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        help='Pool sizes for the partitioned benchmark')
+    parser.add_argument('--partition-by', choices=['date', 'store_id'], default='date',
+                        help='Shard key for the partitioned benchmark')
+    parser.add_argument('--threads', type=int, help='DuckDB threads for the sql benchmark')
+    args = parser.parse_args()
+
+    if args.benchmark == 'datetime':
+        print("Datetime construction benchmark")
+        sizes = args.sizes or [1_000_000, 10_000_000]
+        print(benchmark_datetime(tuple(sizes)).to_string(index=False))
+    elif args.benchmark == 'forecast':
+        print("Forecast fitting benchmark")
+        series = args.series or [100, 1_000, 5_000]
+        print(benchmark_forecast(tuple(series)).to_string(index=False))
+    elif args.benchmark == 'partitioned':
+        print("Partitioned execution benchmark")
+        sizes = args.sizes or [1_000_000, 10_000_000]
+        workers = args.workers or [1, 2, 4, 8, 16]
+        print(benchmark_partitioned(tuple(sizes), tuple(workers), args.partition_by).to_string(index=False))
+    elif args.benchmark == 'sql':
+        print("SQL backend benchmark")
+        sizes = args.sizes or [1_000_000, 10_000_000]
+        print(benchmark_sql(tuple(sizes), threads=args.threads).to_string(index=False))
+    else:
+        sizes = args.sizes or [100_000, 1_000_000, 10_000_000]
+        benchmark_pipeline(tuple(sizes), trace_memory=args.trace_memory)
+
+if __name__ == "__main__":
+    main()
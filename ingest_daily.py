@@ -0,0 +1,40 @@
+import argparse
+
+from src.data.data_loader import DataLoader
+from src.preprocessing.preprocessor import DataPreprocessor
+from src.models.incremental_store import IncrementalSalesStore
+
+def main():
+    parser = argparse.ArgumentParser(description='Fold new transactions into the persisted sales aggregates')
+    parser.add_argument('data_path', help='File with the new day of transactions')
+    parser.add_argument('--state-dir', default='.cache/incremental', help='Directory of the persisted aggregates')
+    parser.add_argument('--compact', action='store_true', help='Merge all stored parts after ingesting')
+    args = parser.parse_args()
+
+    print("Starting incremental ingestion...")
+    store = IncrementalSalesStore(args.state_dir)
+
+    print("\n1. Loading new transactions...")
+    df = DataLoader(args.data_path, use_cache=False).load_data()
+
+    print("\n2. Preprocessing data...")
+    df_processed = DataPreprocessor.preprocess_data(df)
+
+    print("\n3. Updating aggregates...")
+    summary = store.ingest(df_processed)
+    for metric, value in summary.items():
+        print(f"{metric}: {value}")
+    if args.compact:
+        print(f"Compacted {store.compact()} parts")
+
+    print("\n4. Refreshing reports...")
+    print("\nSales Trend Analysis:")
+    for metric, value in store.analyze_sales_trends().items():
+        print(f"{metric}: {value}")
+    print("\nTop 5 Products by Sales:")
+    print(store.analyze_product_performance().head())
+    print("\nStore Performance:")
+    print(store.analyze_store_performance())
+
+if __name__ == "__main__":
+    main()
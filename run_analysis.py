@@ -1,65 +1,95 @@
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Optional
 
 from src.data.data_loader import DataLoader
 from src.preprocessing.preprocessor import DataPreprocessor
 from src.features.feature_engineering import FeatureEngineer
 from src.visualization.sales_visualizer import SalesVisualizer
 from src.models.sales_analyzer import SalesAnalyzer
+from src.models.sales_cube import SalesCube
+from src.utils.result_cache import ResultCache
 
-def main():
+def main(data_path: str = 'Coffee Shop Sales.xlsx', profile_path: Optional[str] = None,
+         cache_results: bool = True):
     print("Starting Coffee Shop Sales Analysis...")
     
+    # Stages are only measured when a report is requested; nullcontext
+    # accepts (and ignores) the stage name
+    profiler = None
+    if profile_path:
+        from src.utils.profiling import StageProfiler
+        profiler = StageProfiler()
+    stage = profiler.stage if profiler else nullcontext
+    
     # Initialize components
-    loader = DataLoader('Coffee Shop Sales.xlsx')
+    loader = DataLoader(data_path)
     preprocessor = DataPreprocessor()
     feature_engineer = FeatureEngineer()
     visualizer = SalesVisualizer('reports/figures')
     analyzer = SalesAnalyzer()
+    if cache_results:
+        # Unchanged inputs reuse the results of earlier runs from .cache/results
+        analyzer.set_result_cache(ResultCache())
     
     # Load and process data
     print("\n1. Loading data...")
-    df = loader.load_data()
+    with stage('load'):
+        df = loader.load_data()
     
     print("\n2. Preprocessing data...")
-    df_processed = preprocessor.preprocess_data(df)
-    quality_metrics = preprocessor.check_data_quality(df_processed)
+    with stage('preprocess'):
+        df_processed = preprocessor.preprocess_data(df, optimize=False)
+        df_processed = preprocessor.optimize_dtypes(df_processed, verbose=True)
+    with stage('check_data_quality'):
+        quality_metrics = preprocessor.check_data_quality(df_processed)
     print("\nData Quality Metrics:")
     for metric, value in quality_metrics.items():
         print(f"{metric}: {value}")
     
     print("\n3. Engineering features...")
-    df_featured = (df_processed
-                  .pipe(feature_engineer.create_time_features)
-                  .pipe(feature_engineer.create_sales_features)
-                  .pipe(feature_engineer.create_store_features))
+    with stage('FeatureEngineer.create_features'):
+        df_featured = feature_engineer.create_features(df_processed)
+    
+    # Aggregate once; the reports and plots below are rollups of this cube
+    with stage('SalesCube.from_transactions'):
+        cube = SalesCube.from_transactions(df_featured)
     
     print("\n4. Analyzing sales trends...")
-    sales_trends = analyzer.analyze_sales_trends(df_featured)
+    with stage('SalesAnalyzer.analyze_sales_trends'):
+        sales_trends = analyzer.analyze_sales_trends(cube)
     print("\nSales Trend Analysis:")
     for metric, value in sales_trends.items():
         print(f"{metric}: {value}")
     
     print("\n5. Analyzing product performance...")
-    product_metrics = analyzer.analyze_product_performance(df_featured)
+    with stage('SalesAnalyzer.analyze_product_performance'):
+        product_metrics = analyzer.analyze_product_performance(cube)
     print("\nTop 5 Products by Sales:")
     print(product_metrics.head())
     
     print("\n6. Analyzing store performance...")
-    store_metrics = analyzer.analyze_store_performance(df_featured)
+    with stage('SalesAnalyzer.analyze_store_performance'):
+        store_metrics = analyzer.analyze_store_performance(cube)
     print("\nStore Performance:")
     print(store_metrics)
     
     print("\n7. Creating visualizations...")
-    visualizer.plot_daily_sales_trend(df_featured)
-    visualizer.plot_hourly_sales_pattern(df_featured)
-    visualizer.plot_product_category_sales(df_featured)
-    visualizer.plot_store_performance(df_featured)
-    visualizer.plot_sales_heatmap(df_featured)
+    if profiler:
+        # Render one plot at a time so each can be attributed
+        for plot in ('plot_daily_sales_trend', 'plot_hourly_sales_pattern',
+                     'plot_product_category_sales', 'plot_store_performance',
+                     'plot_sales_heatmap'):
+            with stage(f'SalesVisualizer.{plot}'):
+                getattr(visualizer, plot)(cube)
+    else:
+        visualizer.render_all(cube)
     
     print("\n8. Performing customer segmentation...")
-    customer_segments, model = analyzer.segment_customers(df_featured)
+    with stage('SalesAnalyzer.segment_customers'):
+        customer_segments, model = analyzer.segment_customers(df_featured)
     print("\nCustomer Segments Summary:")
     print(customer_segments.groupby('segment').agg({
         'total_amount': ['mean', 'count'],
@@ -67,7 +97,20 @@ def main():
         'product_id': 'mean'
     }).round(2))
     
+    if cache_results:
+        print(f"\nResult cache: {analyzer.result_cache.stats()}")
+    
+    if profiler:
+        print(f"\nStage profile written to {profiler.save(profile_path)}")
+        print(profiler.report().round(3).to_string(index=False))
+    
     print("\nAnalysis complete! Check the 'reports/figures' directory for visualizations.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Coffee shop sales analysis')
+    parser.add_argument('--data', default='Coffee Shop Sales.xlsx', help='Path to the sales data file')
+    parser.add_argument('--profile', help='Write a per-stage time/memory report (.json or .csv)')
+    parser.add_argument('--no-result-cache', action='store_true',
+                        help='Recompute every analysis instead of reusing cached results')
+    args = parser.parse_args()
+    main(args.data, args.profile, cache_results=not args.no_result_cache)
@@ -0,0 +1,186 @@
+import argparse
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from src.data.data_loader import DataLoader, FILE_FORMATS
+from src.data.synthetic import write_transactions
+from src.models.sales_analyzer import SalesAnalyzer
+from src.models.sales_cube import SalesCube
+from src.models.streaming import STREAM_DERIVED, STREAM_INPUTS
+from src.pipeline.lazy_pipeline import LazyPipeline, load_cube
+from src.preprocessing.preprocessor import DataPreprocessor
+
+# matplotlib/seaborn (plots) and sklearn (segment) are imported by the
+# subcommands that use them, so a metrics run only pays for pandas
+
+def run_metrics(loader: DataLoader, time_format: Optional[str] = None, top: int = 5,
+                batch_size: Optional[int] = None, cube: Optional[SalesCube] = None) -> Dict:
+    """Print the key sales metrics and the top products and stores.
+
+    Args:
+        loader (DataLoader): Configured loader
+        time_format (Optional[str]): strftime format of string transaction times
+        top (int): Number of products to list
+        batch_size (Optional[int]): Stream the file in batches of this many
+            rows through `SalesAnalyzer.analyze_sales_stream` instead of
+            loading it whole
+        cube (Optional[SalesCube]): Cube already loaded from `loader`, to
+            share one load with `run_plots`
+
+    Returns:
+        Dict: Sales trends, product and store performance
+    """
+    if batch_size:
+        batches = DataPreprocessor.preprocess_batches(loader.iter_batches(batch_size, columns=STREAM_INPUTS),
+                                                      time_format=time_format, columns=STREAM_DERIVED)
+        results, _ = SalesAnalyzer.analyze_sales_stream(batches, top_n=top)
+    else:
+        if cube is None:
+            cube = load_cube(loader, time_format)
+        results = {
+            'sales_trends': SalesAnalyzer.analyze_sales_trends(cube),
+            'product_performance': SalesAnalyzer.analyze_product_performance(cube),
+            'store_performance': SalesAnalyzer.analyze_store_performance(cube),
+        }
+    trends = results['sales_trends']
+    print("\nKey Metrics:")
+    print(f"- Total Sales: ${trends['total_sales']:,.2f}")
+    print(f"- Average Daily Sales: ${trends['avg_daily_sales']:,.2f}")
+    print(f"- Peak Sales Hour: {trends['peak_sales_hour']}:00")
+    print(f"- Best Performing Category: {trends['best_performing_category']}")
+    print(f"- Best Performing Store: {trends['best_performing_store']}")
+    print(f"\nTop {top} Products by Sales:")
+    print(results['product_performance'].head(top).to_string(index=False))
+    print("\nStore Performance:")
+    print(results['store_performance'].to_string(index=False))
+    if 'error_bounds' in results:
+        print("\nError Bounds:")
+        for bound, value in results['error_bounds'].items():
+            print(f"{bound}: {value}")
+    return results
+
+def run_plots(loader: DataLoader, output_dir: str = 'reports/figures',
+              formats: Sequence[str] = ('png',), time_format: Optional[str] = None,
+              cube: Optional[SalesCube] = None) -> List[Path]:
+    """Render every figure of `SalesVisualizer` from the sales cube.
+
+    Args:
+        loader (DataLoader): Configured loader
+        output_dir (str): Directory to save figures
+        formats (Sequence[str]): Output formats, e.g. ('png', 'svg')
+        time_format (Optional[str]): strftime format of string transaction times
+        cube (Optional[SalesCube]): Cube already loaded from `loader`
+
+    Returns:
+        List[Path]: Paths of the written files
+    """
+    from src.visualization.sales_visualizer import SalesVisualizer
+    if cube is None:
+        cube = load_cube(loader, time_format)
+    paths = SalesVisualizer(output_dir).render_all(cube, formats=formats)
+    print(f"\nWrote {len(paths)} figures to {output_dir}")
+    return paths
+
+def run_segment(loader: DataLoader, n_clusters: int = 3, scalable: bool = False,
+                time_format: Optional[str] = None) -> pd.DataFrame:
+    """Segment customers and print a per-segment summary.
+
+    Args:
+        loader (DataLoader): Configured loader
+        n_clusters (int): Number of clusters for segmentation
+        scalable (bool): Use MiniBatchKMeans instead of KMeans
+        time_format (Optional[str]): strftime format of string transaction times
+
+    Returns:
+        pd.DataFrame: Customer features with their segment
+    """
+    pipeline = LazyPipeline(loader, time_format=time_format)
+    if scalable:
+        segments, _ = pipeline.segment_customers_scalable(n_clusters).collect()['segment_customers_scalable']
+    else:
+        segments, _ = pipeline.segment_customers(n_clusters).collect()['segment_customers']
+    print("\nCustomer Segments Summary:")
+    print(segments.groupby('segment').agg({
+        'total_amount': ['mean', 'count'],
+        'transaction_qty': 'mean',
+        'product_id': 'mean'
+    }).round(2))
+    return segments
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser with one subcommand per analysis."""
+    parser = argparse.ArgumentParser(prog='python -m src.cli',
+                                     description='Coffee shop sales analysis')
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--data', default='Coffee Shop Sales.xlsx', help='Path to the sales data file')
+    common.add_argument('--format', choices=('auto',) + FILE_FORMATS, default='auto',
+                        help='Input file format, inferred from the extension by default')
+    common.add_argument('--time-format', help='strftime format of string transaction times')
+    common.add_argument('--no-data-cache', action='store_true',
+                        help='Parse the source file instead of its columnar cached copy')
+
+    commands = parser.add_subparsers(dest='command', required=True)
+    metrics = commands.add_parser('metrics', parents=[common], help='Print key sales metrics')
+    metrics.add_argument('--top', type=int, default=5, help='Number of products to list')
+    metrics.add_argument('--stream', type=int, metavar='BATCH_SIZE',
+                         help='Stream the file in batches with constant-memory sketches')
+
+    plots = commands.add_parser('plots', parents=[common], help='Render the report figures')
+    plots.add_argument('--output-dir', default='reports/figures', help='Directory to save figures')
+    plots.add_argument('--formats', nargs='+', default=['png'], help='Figure formats, e.g. png svg')
+
+    segment = commands.add_parser('segment', parents=[common], help='Segment customers')
+    segment.add_argument('--clusters', type=int, default=3, help='Number of segments')
+    segment.add_argument('--scalable', action='store_true',
+                         help='Use MiniBatchKMeans, for large inputs')
+
+    serve = commands.add_parser('serve', parents=[common],
+                                help='Serve reports over HTTP from a warm in-memory cube')
+    serve.add_argument('--host', default='127.0.0.1', help='Interface to listen on')
+    serve.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    serve.add_argument('--reload-interval', type=float, default=1.0,
+                       help='Seconds between checks of the data file for changes, 0 to disable')
+
+    generate = commands.add_parser('generate', help='Write a synthetic data set for load testing')
+    generate.add_argument('output', help='Output file (.parquet or .csv)')
+    generate.add_argument('--rows', type=int, default=1_000_000, help='Number of transaction lines')
+    generate.add_argument('--chunk-size', type=int, default=1_000_000,
+                          help='Lines generated and written at a time')
+    generate.add_argument('--stores', type=int, default=3, help='Number of stores')
+    generate.add_argument('--products', type=int, help='Number of product ids')
+    generate.add_argument('--days', type=int, default=181, help='Number of days covered')
+    generate.add_argument('--seed', type=int, default=42, help='Random seed')
+    return parser
+
+def main(argv: Optional[List[str]] = None):
+    """Run one subcommand.
+
+    Args:
+        argv (Optional[List[str]]): Command line arguments, sys.argv by default
+
+    Returns:
+        The subcommand's result
+    """
+    args = build_parser().parse_args(argv)
+    if args.command == 'generate':
+        return write_transactions(args.output, args.rows, chunk_size=args.chunk_size,
+                                  seed=args.seed, n_days=args.days, n_stores=args.stores,
+                                  n_products=args.products)
+    loader = DataLoader(args.data, use_cache=not args.no_data_cache,
+                        file_format=None if args.format == 'auto' else args.format)
+    if args.command == 'metrics':
+        return run_metrics(loader, args.time_format, args.top, args.stream)
+    if args.command == 'serve':
+        import asyncio
+        from src.service.report_service import serve
+        return asyncio.run(serve(args.data, host=args.host, port=args.port,
+                                 time_format=args.time_format, use_cache=not args.no_data_cache,
+                                 file_format=loader.file_format,
+                                 reload_interval=args.reload_interval))
+    if args.command == 'plots':
+        return run_plots(loader, args.output_dir, args.formats, args.time_format)
+    return run_segment(loader, args.clusters, args.scalable, args.time_format)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from pathlib import Path
+from typing import Dict, Optional
+
+# Explicit column types for the coffee shop schema. Columns that are not
+# listed here keep whatever type the reader inferred.
+SCHEMA_DTYPES = {
+    'transaction_id': 'int64',
+    'transaction_qty': 'int64',
+    'store_id': 'int64',
+    'product_id': 'int64',
+    'unit_price': 'float64',
+    'store_location': 'string',
+    'product_category': 'string',
+    'product_type': 'string',
+    'product_detail': 'string',
+}
+
+CACHE_FORMATS = {'arrow': '.arrow', 'parquet': '.parquet'}
+
+
+class DatasetCache:
+    def __init__(self, cache_dir: str = '.cache/data', cache_format: str = 'arrow'):
+        """Initialize a columnar cache for slow-to-parse source files.
+
+        Cached copies are keyed by the SHA-256 of the source file contents. A
+        small manifest remembers the size and mtime of each source so that the
+        hash only needs to be recomputed when the file has been touched.
+
+        Args:
+            cache_dir (str): Directory where cached files are stored
+            cache_format (str): Either 'arrow' (Arrow IPC, memory-mapped on
+                load) or 'parquet'
+        """
+        if cache_format not in CACHE_FORMATS:
+            raise ValueError(f"Unknown cache format '{cache_format}', "
+                             f"expected one of {sorted(CACHE_FORMATS)}")
+        self.cache_dir = Path(cache_dir)
+        self.cache_format = cache_format
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.last_load: Dict = {}
+
+    @staticmethod
+    def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+        """Compute the SHA-256 hex digest of a file's contents.
+
+        Args:
+            path (Path): File to hash
+            chunk_size (int): Number of bytes read per iteration
+
+        Returns:
+            str: Hex digest
+        """
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _manifest_path(self, source: Path) -> Path:
+        key = f'{source.resolve()}:{self.cache_format}'
+        source_key = hashlib.sha1(key.encode()).hexdigest()
+        return self.cache_dir / f'{source_key}.json'
+
+    def _cache_path(self, digest: str) -> Path:
+        return self.cache_dir / f'{digest}{CACHE_FORMATS[self.cache_format]}'
+
+    def lookup(self, source: Path) -> Optional[Path]:
+        """Find the cached copy of a source file if it is still valid.
+
+        The cache is considered valid when the source's size and mtime match
+        the manifest, or, failing that, when its content hash still matches.
+
+        Args:
+            source (Path): Source data file
+
+        Returns:
+            Optional[Path]: Path of the cached file, or None on a miss
+        """
+        stat = source.stat()
+        manifest_path = self._manifest_path(source)
+        if manifest_path.exists():
+            manifest = json.loads(manifest_path.read_text())
+            cache_path = self._cache_path(manifest['sha256'])
+            if (manifest.get('format') == self.cache_format
+                    and manifest['size'] == stat.st_size
+                    and manifest['mtime_ns'] == stat.st_mtime_ns
+                    and cache_path.exists()):
+                return cache_path
+
+        # The file was touched; fall back to comparing contents
+        digest = self.file_digest(source)
+        cache_path = self._cache_path(digest)
+        if cache_path.exists():
+            self._write_manifest(source, digest)
+            return cache_path
+        return None
+
+    def _write_manifest(self, source: Path, digest: str):
+        stat = source.stat()
+        manifest = {
+            'source': str(source.resolve()),
+            'sha256': digest,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'format': self.cache_format,
+        }
+        self._manifest_path(source).write_text(json.dumps(manifest, indent=2))
+
+    @staticmethod
+    def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+        """Cast known columns to their explicit cache dtypes.
+
+        Args:
+            df (pd.DataFrame): Freshly parsed source data
+
+        Returns:
+            pd.DataFrame: Data frame with normalized dtypes
+        """
+        dtypes = {col: dtype for col, dtype in SCHEMA_DTYPES.items() if col in df.columns}
+        df = df.astype(dtypes)
+        if 'transaction_date' in df.columns:
+            df['transaction_date'] = pd.to_datetime(df['transaction_date'])
+        if 'transaction_time' in df.columns and df['transaction_time'].dtype == object:
+            # Mixed str/datetime.time cells cannot be stored in one Arrow column
+            df['transaction_time'] = df['transaction_time'].astype(str)
+        return df
+
+    def store(self, source: Path, df: pd.DataFrame) -> Path:
+        """Write a parsed source file to the cache.
+
+        Args:
+            source (Path): Source data file the frame was read from
+            df (pd.DataFrame): Parsed data
+
+        Returns:
+            Path: Path of the cached file
+        """
+        digest = self.file_digest(source)
+        cache_path = self._cache_path(digest)
+
+        # Drop the copy of the previous version of this source, if any
+        manifest_path = self._manifest_path(source)
+        if manifest_path.exists():
+            stale = json.loads(manifest_path.read_text())
+            stale_path = self.cache_dir / f"{stale['sha256']}{CACHE_FORMATS.get(stale.get('format'), '')}"
+            if stale['sha256'] != digest and stale_path.is_file():
+                stale_path.unlink()
+
+        table = pa.Table.from_pandas(self.apply_schema(df), preserve_index=False)
+
+        # Write to a temporary file first so a crash never leaves a truncated cache
+        tmp_path = cache_path.with_suffix(cache_path.suffix + '.tmp')
+        try:
+            if self.cache_format == 'arrow':
+                # Uncompressed IPC so later loads can memory-map the buffers
+                feather.write_feather(table, tmp_path, compression='uncompressed')
+            else:
+                pq.write_table(table, tmp_path)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        self._write_manifest(source, digest)
+        return cache_path
+
+    def read(self, cache_path: Path, columns: Optional[list] = None) -> pd.DataFrame:
+        """Read a cached file back into a data frame.
+
+        Args:
+            cache_path (Path): Path returned by `lookup` or `store`
+            columns (Optional[list]): Subset of columns to read
+
+        Returns:
+            pd.DataFrame: Cached data
+        """
+        if self.cache_format == 'arrow':
+            # The table's buffers point into the mapping, so it is left open
+            # and released together with the table
+            source = pa.memory_map(str(cache_path), 'r')
+            table = pa.ipc.open_file(source).read_all()
+            if columns is not None:
+                table = table.select(columns)
+        else:
+            table = pq.read_table(cache_path, columns=columns, memory_map=True)
+        return table.to_pandas()
+
+    def load(self, source: Path, reader, columns: Optional[list] = None) -> pd.DataFrame:
+        """Load a source file through the cache.
+
+        Args:
+            source (Path): Source data file
+            reader (callable): Function parsing the source into a data frame,
+                only called on a cache miss
+            columns (Optional[list]): Subset of columns to return
+
+        Returns:
+            pd.DataFrame: Loaded data
+        """
+        start = time.perf_counter()
+        cache_path = self.lookup(source)
+        hit = cache_path is not None
+        if not hit:
+            cache_path = self.store(source, reader(source))
+        df = self.read(cache_path, columns=columns)
+        self.last_load = {
+            'source': str(source),
+            'cache_file': str(cache_path),
+            'hit': hit,
+            'seconds': time.perf_counter() - start,
+        }
+        return df
+
+    def clear(self) -> Dict[str, int]:
+        """Remove every cached file and manifest.
+
+        Returns:
+            Dict[str, int]: Number of removed files
+        """
+        removed = 0
+        for path in self.cache_dir.iterdir():
+            if path.suffix in set(CACHE_FORMATS.values()) | {'.json', '.tmp'}:
+                path.unlink()
+                removed += 1
+        return {'removed': removed}
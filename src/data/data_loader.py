@@ -1,25 +1,186 @@
+import time
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from src.data.cache import DatasetCache
+
+EXCEL_SUFFIXES = ('.xlsx', '.xlsm', '.xls')
+FILE_FORMATS = ('excel', 'csv', 'parquet')
 
 class DataLoader:
-    def __init__(self, data_path: str):
+    def __init__(self, data_path: str, use_cache: bool = True,
+                 cache_dir: str = '.cache/data', cache_format: str = 'arrow',
+                 file_format: Optional[str] = None):
         """Initialize DataLoader with path to data file.
-        
+
         Args:
-            data_path (str): Path to the Excel file
+            data_path (str): Path to the data file (.xlsx, .csv or .parquet)
+            use_cache (bool): Keep a columnar copy of the workbook so later
+                loads skip the Excel parser
+            cache_dir (str): Directory holding the columnar cache
+            cache_format (str): Cache file format, 'arrow' or 'parquet'
+            file_format (Optional[str]): 'excel', 'csv' or 'parquet'; inferred
+                from the file extension when None
         """
+        if file_format is not None and file_format not in FILE_FORMATS:
+            raise ValueError(f"file_format must be one of {FILE_FORMATS}, got '{file_format}'")
         self.data_path = Path(data_path)
-        
-    def load_data(self) -> pd.DataFrame:
-        """Load the coffee shop sales data from Excel file.
-        
+        self.file_format = file_format or self.infer_format(self.data_path)
+        self.cache = DatasetCache(cache_dir, cache_format) if use_cache else None
+        self.load_timings: List[Dict] = []
+
+    def load_data(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Load the coffee shop sales data from the data file.
+
+        Args:
+            columns (Optional[List[str]]): Subset of columns to load; CSV,
+                Parquet and cached copies only read these
+
         Returns:
             pd.DataFrame: Loaded data
         """
         try:
-            df = pd.read_excel(self.data_path)
-            print(f"Successfully loaded {len(df)} records from {self.data_path}")
+            start = time.perf_counter()
+            if self.cache is not None and self._is_cacheable():
+                # The cache always holds the full file and is projected on read
+                df = self.cache.load(self.data_path, self._read_full_source, columns=columns)
+                mode = 'warm' if self.cache.last_load['hit'] else 'cold'
+            else:
+                df = self._read_source(self.data_path, columns, self.file_format)
+                mode = 'uncached'
+            elapsed = time.perf_counter() - start
+            self.load_timings.append({'mode': mode, 'seconds': elapsed, 'rows': len(df)})
+            print(f"Successfully loaded {len(df)} records from {self.data_path} "
+                  f"({mode} load, {elapsed:.2f}s)")
             return df
         except Exception as e:
             print(f"Error loading data: {str(e)}")
             raise
+
+    def iter_batches(self, batch_size: int = 100_000,
+                     columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+        """Stream the data file as fixed-size row batches.
+
+        Only one batch is materialized at a time, so memory use is bounded by
+        the batch size rather than by the size of the file. The last batch may
+        be shorter than `batch_size`.
+
+        Args:
+            batch_size (int): Number of rows per batch
+            columns (Optional[List[str]]): Subset of columns to read
+
+        Yields:
+            pd.DataFrame: The next batch of rows
+        """
+        if batch_size <= 0:
+            raise ValueError("batch_size must be positive")
+
+        if self.file_format == 'csv':
+            yield from self._iter_csv(batch_size, columns)
+        elif self.file_format == 'parquet':
+            yield from self._iter_parquet(self.data_path, batch_size, columns)
+        elif self.file_format == 'excel':
+            cache_path = self.cache.lookup(self.data_path) if self.cache is not None else None
+            if cache_path is not None and self.cache.cache_format == 'parquet':
+                yield from self._iter_parquet(cache_path, batch_size, columns)
+            elif cache_path is not None:
+                yield from self._iter_arrow(cache_path, batch_size, columns)
+            else:
+                yield from self._iter_excel(batch_size, columns)
+        else:
+            raise ValueError(f"Unsupported data file type: {self.data_path.suffix}")
+
+    def _iter_csv(self, batch_size: int, columns: Optional[List[str]]) -> Iterator[pd.DataFrame]:
+        with pd.read_csv(self.data_path, usecols=columns, chunksize=batch_size) as reader:
+            for batch in reader:
+                yield batch.reset_index(drop=True)
+
+    @staticmethod
+    def _iter_parquet(path: Path, batch_size: int,
+                      columns: Optional[List[str]]) -> Iterator[pd.DataFrame]:
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+
+    @staticmethod
+    def _iter_arrow(path: Path, batch_size: int,
+                    columns: Optional[List[str]]) -> Iterator[pd.DataFrame]:
+        table = pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+        if columns is not None:
+            table = table.select(columns)
+        # Slicing a memory-mapped table is zero-copy; only the converted
+        # batch is held in memory
+        for offset in range(0, table.num_rows, batch_size):
+            yield table.slice(offset, batch_size).to_pandas()
+
+    def _iter_excel(self, batch_size: int, columns: Optional[List[str]]) -> Iterator[pd.DataFrame]:
+        from openpyxl import load_workbook
+        workbook = load_workbook(self.data_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = list(next(rows))
+            if columns is None:
+                columns = header
+            positions = [header.index(col) for col in columns]
+
+            batch = []
+            for row in rows:
+                batch.append([row[i] for i in positions])
+                if len(batch) == batch_size:
+                    yield pd.DataFrame(batch, columns=columns)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=columns)
+        finally:
+            workbook.close()
+
+    def _is_cacheable(self) -> bool:
+        # Parquet is already columnar, there is nothing to gain from caching it
+        return self.file_format != 'parquet'
+
+    def _read_full_source(self, path: Path) -> pd.DataFrame:
+        # Reader handed to the dataset cache, which always stores every column
+        return self._read_source(path, None, self.file_format)
+
+    @staticmethod
+    def infer_format(path: Path) -> Optional[str]:
+        """Guess the file format from the extension.
+
+        Args:
+            path (Path): Path to the data file
+
+        Returns:
+            Optional[str]: 'excel', 'csv', 'parquet', or None if unknown
+        """
+        suffix = Path(path).suffix.lower()
+        if suffix in EXCEL_SUFFIXES:
+            return 'excel'
+        if suffix in ('.csv', '.parquet'):
+            return suffix[1:]
+        return None
+
+    @staticmethod
+    def _read_source(path: Path, columns: Optional[List[str]] = None,
+                     file_format: Optional[str] = None) -> pd.DataFrame:
+        """Parse the source file according to its format.
+
+        Args:
+            path (Path): Path to the data file
+            columns (Optional[List[str]]): Subset of columns to read
+            file_format (Optional[str]): File format, inferred from the
+                extension when None
+
+        Returns:
+            pd.DataFrame: Parsed data
+        """
+        file_format = file_format or DataLoader.infer_format(path)
+        if file_format == 'csv':
+            return pd.read_csv(path, usecols=columns)
+        if file_format == 'parquet':
+            return pd.read_parquet(path, columns=columns)
+        if file_format == 'excel':
+            return pd.read_excel(path, usecols=columns)
+        raise ValueError(f"Unsupported data file type: {path.suffix}")
@@ -0,0 +1,236 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+STORES = [(3, 'Astoria'), (5, 'Lower Manhattan'), (8, "Hell's Kitchen")]
+CATEGORIES = {
+    'Coffee': ['Barista Espresso', 'Brewed Chai tea', 'Gourmet brewed coffee', 'Organic brewed coffee'],
+    'Tea': ['Brewed Black tea', 'Brewed Green tea', 'Brewed herbal tea'],
+    'Bakery': ['Biscotti', 'Pastry', 'Scone'],
+    'Drinking Chocolate': ['Hot chocolate'],
+    'Flavours': ['Regular syrup', 'Sugar free syrup'],
+}
+# Unit price range per category
+CATEGORY_PRICES = {
+    'Coffee': (2.0, 4.75),
+    'Tea': (2.5, 3.5),
+    'Bakery': (3.0, 4.5),
+    'Drinking Chocolate': (3.5, 4.75),
+    'Flavours': (0.8, 0.8),
+}
+# Share of transactions per opening hour (06:00 to 20:59): a morning rush,
+# a flat afternoon and a quiet evening
+HOUR_WEIGHTS = {6: 4.5, 7: 11.0, 8: 12.5, 9: 12.5, 10: 13.0, 11: 6.5, 12: 6.0, 13: 6.0,
+                14: 6.0, 15: 6.0, 16: 6.0, 17: 5.5, 18: 4.5, 19: 2.0, 20: 0.5}
+# Relative traffic Monday to Sunday
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.0, 1.0, 1.02, 0.95, 0.93]
+# Probability of buying 1, 2 or 3 units on a line
+QTY_WEIGHTS = [0.56, 0.42, 0.02]
+
+TRANSACTION_COLUMNS = ['transaction_id', 'transaction_date', 'transaction_time', 'store_id',
+                       'store_location', 'product_id', 'product_category', 'product_type',
+                       'transaction_qty', 'unit_price']
+
+def _store_table(n_stores: int) -> List[Tuple[int, str]]:
+    """The real stores first, then numbered ones."""
+    stores = STORES[:n_stores]
+    next_id = max(store_id for store_id, _ in STORES) + 1
+    for store_id in range(next_id, next_id + n_stores - len(stores)):
+        stores.append((store_id, f'Store {store_id}'))
+    return stores
+
+def iter_transactions(n_rows: int, chunk_size: int = 1_000_000, seed: int = 42,
+                      start_date: str = '2023-01-01', n_days: int = 181,
+                      n_stores: int = 3, n_products: Optional[int] = None,
+                      growth: float = 0.5) -> Iterator[pd.DataFrame]:
+    """Generate synthetic transactions as chunks in date order.
+
+    Days are drawn with weekday seasonality and a linear growth trend, hours
+    follow HOUR_WEIGHTS, stores get uneven traffic shares and product
+    popularity is Zipf-like. Lines of one transaction share its store and
+    time and list distinct products. Every chunk is generated independently
+    with vectorized draws, so memory is bounded by `chunk_size` whatever
+    `n_rows` is; the data depend on the seed and on the chunk size.
+
+    Args:
+        n_rows (int): Total number of transaction lines
+        chunk_size (int): Lines per chunk
+        seed (int): Random seed
+        start_date (str): First transaction date
+        n_days (int): Number of days covered
+        n_stores (int): Number of stores
+        n_products (Optional[int]): Number of product ids, spread over the
+            product types; one per product type by default
+        growth (float): Relative traffic increase from the first to the last
+            day
+
+    Yields:
+        pd.DataFrame: The next chunk of raw transactions
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    if n_stores <= 0:
+        raise ValueError("n_stores must be positive")
+    rng = np.random.default_rng(seed)
+
+    # Catalogue: product ids cycle through the product types
+    types = [(category, product_type)
+             for category, product_types in CATEGORIES.items() for product_type in product_types]
+    n_products = n_products or len(types)
+    type_codes = np.arange(n_products) % len(types)
+    low, high = np.array([CATEGORY_PRICES[category] for category, _ in types]).T
+    unit_price = np.round(rng.uniform(low[type_codes], high[type_codes]) * 20) / 20
+    popularity = 1.0 / np.sqrt(rng.permutation(np.arange(1, n_products + 1)))
+    popularity /= popularity.sum()
+    product_type = pd.Categorical.from_codes(type_codes, [t for _, t in types])
+    category_names = list(CATEGORIES)
+    category_codes = np.array([category_names.index(c) for c, _ in types])[type_codes]
+    product_category = pd.Categorical.from_codes(category_codes, category_names)
+
+    stores = _store_table(n_stores)
+    store_ids = np.array([store_id for store_id, _ in stores])
+    store_share = rng.lognormal(0.0, 0.1, n_stores)
+    store_share /= store_share.sum()
+
+    hours = np.array(list(HOUR_WEIGHTS))
+    hour_share = np.array(list(HOUR_WEIGHTS.values()))
+    hour_share /= hour_share.sum()
+
+    # Lines per day; the cumulative counts place every global row on its day
+    start = pd.Timestamp(start_date)
+    weekday = (start.dayofweek + np.arange(n_days)) % 7
+    day_share = np.array(WEEKDAY_WEIGHTS)[weekday] * (1 + growth * np.arange(n_days) / max(n_days - 1, 1))
+    day_share /= day_share.sum()
+    day_ends = np.cumsum(rng.multinomial(n_rows, day_share))
+    dates = (start + pd.to_timedelta(np.arange(n_days), unit='D')).to_numpy()
+
+    next_id = 1
+    for offset in range(0, n_rows, chunk_size):
+        n = min(chunk_size, n_rows - offset)
+        day = np.searchsorted(day_ends, np.arange(offset, offset + n), side='right')
+
+        # A line starts a new transaction with probability 0.7, and always on
+        # a new day or chunk, so no transaction spans chunks
+        new_transaction = rng.random(n) < 0.7
+        new_transaction[0] = True
+        new_transaction[1:] |= day[1:] != day[:-1]
+        # A transaction lists each product once, so it has at most
+        # n_products lines
+        first_line = np.maximum.accumulate(np.where(new_transaction, np.arange(n), 0))
+        new_transaction |= (np.arange(n) - first_line) % n_products == 0
+        first_line = np.maximum.accumulate(np.where(new_transaction, np.arange(n), 0))
+        transaction_id = next_id + np.cumsum(new_transaction) - 1
+        next_id = int(transaction_id[-1]) + 1
+
+        store = rng.choice(n_stores, n, p=store_share)[first_line]
+        seconds = (hours[rng.choice(len(hours), n, p=hour_share)] * 3600
+                   + rng.integers(0, 3600, n))[first_line]
+        product = rng.choice(n_products, n, p=popularity)
+        # Move a product drawn twice for one transaction to the next id until
+        # every line of the transaction has its own product
+        repeated = pd.DataFrame({'transaction': transaction_id, 'product': product}).duplicated().to_numpy()
+        while repeated.any():
+            product[repeated] = (product[repeated] + 1) % n_products
+            repeated = pd.DataFrame({'transaction': transaction_id, 'product': product}).duplicated().to_numpy()
+
+        chunk = pd.DataFrame({
+            'transaction_id': transaction_id,
+            'transaction_date': dates[day],
+            'transaction_time': pd.to_timedelta(seconds, unit='s'),
+            'store_id': store_ids[store],
+            'store_location': pd.Categorical.from_codes(store, [name for _, name in stores]),
+            'product_id': product + 1,
+            'product_category': product_category[product],
+            'product_type': product_type[product],
+            'transaction_qty': rng.choice(np.arange(1, 4), n, p=QTY_WEIGHTS),
+            'unit_price': unit_price[product],
+        })
+        yield chunk
+
+def generate_transactions(n_rows: int, seed: int = 42,
+                          start_date: str = '2023-01-01', n_days: int = 181,
+                          n_stores: int = 3, n_products: Optional[int] = None,
+                          growth: float = 0.5) -> pd.DataFrame:
+    """Generate synthetic coffee shop transactions with the export's schema.
+
+    Args:
+        n_rows (int): Number of transaction lines
+        seed (int): Random seed
+        start_date (str): First transaction date
+        n_days (int): Number of days covered
+        n_stores (int): Number of stores
+        n_products (Optional[int]): Number of product ids
+        growth (float): Relative traffic increase over the period
+
+    Returns:
+        pd.DataFrame: Raw transactions, sorted by date
+    """
+    chunks = iter_transactions(n_rows, chunk_size=max(n_rows, 1), seed=seed,
+                               start_date=start_date, n_days=n_days, n_stores=n_stores,
+                               n_products=n_products, growth=growth)
+    return next(chunks, pd.DataFrame(columns=TRANSACTION_COLUMNS))
+
+def _plain_csv_types(table: pa.Table) -> pa.Table:
+    """Write dates without a time part and categories as their labels."""
+    for i, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type):
+            table = table.set_column(i, field.name, table[field.name].cast(pa.date32()))
+        elif pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, table[field.name].cast(field.type.value_type))
+    return table
+
+def write_transactions(path: str, n_rows: int, chunk_size: int = 1_000_000,
+                       file_format: Optional[str] = None, **kwargs) -> Path:
+    """Write a synthetic data set chunk by chunk.
+
+    Only one chunk is held in memory, so data sets far larger than memory
+    (e.g. 100M rows) can be written. Parquet chunks become row groups; CSV
+    chunks are appended with HH:MM:SS transaction times, like the export.
+
+    Args:
+        path (str): Output file
+        n_rows (int): Number of transaction lines
+        chunk_size (int): Lines generated and written at a time
+        file_format (Optional[str]): 'parquet' or 'csv', inferred from the
+            extension when None
+        **kwargs: Generator parameters, see `iter_transactions`
+
+    Returns:
+        Path: Path of the written file
+    """
+    if n_rows <= 0:
+        raise ValueError("n_rows must be positive")
+    path = Path(path)
+    file_format = file_format or path.suffix.lower().lstrip('.')
+    if file_format not in ('parquet', 'csv'):
+        raise ValueError(f"Can only write 'parquet' or 'csv', got '{file_format}'")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Written next to the target and renamed at the end, so readers never
+    # see a partial file
+    tmp_path = path.with_name(path.name + '.tmp')
+
+    # HH:MM:SS of every second of the day, indexed by offset in seconds
+    time_strings = pd.Series(pd.to_timedelta(np.arange(86400), unit='s')).astype(str).str[-8:].to_numpy()
+    writer = None
+    try:
+        for chunk in iter_transactions(n_rows, chunk_size=chunk_size, **kwargs):
+            if file_format == 'csv':
+                seconds = chunk['transaction_time'].dt.total_seconds().to_numpy().astype('int64')
+                chunk['transaction_time'] = time_strings[seconds]
+                table = _plain_csv_types(pa.Table.from_pandas(chunk, preserve_index=False))
+            else:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = (pa_csv.CSVWriter(tmp_path, table.schema) if file_format == 'csv'
+                          else pq.ParquetWriter(tmp_path, table.schema))
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    tmp_path.replace(path)
+    print(f"Wrote {n_rows:,} synthetic transactions to {path}")
+    return path
@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from typing import Optional, Tuple
+
+def basket_matrix(df: pd.DataFrame, item: str = 'product_id',
+                  basket: str = 'transaction_id') -> Tuple[sp.csr_matrix, pd.Index, pd.Index]:
+    """Build the binary basket x item matrix of processed transactions.
+
+    Args:
+        df (pd.DataFrame): Processed dataframe
+        item (str): Column identifying an item
+        basket (str): Column identifying a basket
+
+    Returns:
+        Tuple[sp.csr_matrix, pd.Index, pd.Index]: CSR matrix with a 1 where
+            the basket contains the item, the basket labels (rows) and the
+            item labels (columns)
+    """
+    basket_codes, baskets = pd.factorize(df[basket])
+    item_codes, items = pd.factorize(df[item])
+    valid = (basket_codes >= 0) & (item_codes >= 0)
+    matrix = sp.csr_matrix((np.ones(int(valid.sum()), dtype='int32'),
+                            (basket_codes[valid], item_codes[valid])),
+                           shape=(len(baskets), len(items)))
+    # An item bought on several lines of a basket still counts once
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix, pd.Index(baskets, name=basket), pd.Index(items, name=item)
+
+class BasketAnalyzer:
+    def __init__(self, item: str = 'product_id', basket: str = 'transaction_id',
+                 min_support: float = 0.001, chunk_size: int = 250_000):
+        """Market-basket analysis with sparse matrix products.
+
+        Pair co-occurrence counts are the upper triangle of X^T X, where X is
+        the binary basket x item matrix. X is multiplied in row chunks of
+        `chunk_size` baskets and the counts are accumulated, so the working
+        memory is bounded by one chunk plus the (sparse) pair counts.
+        Batches can be added with `partial_fit`, e.g. one per day of data, as
+        long as a basket does not span batches.
+
+        Args:
+            item (str): Column identifying an item
+            basket (str): Column identifying a basket
+            min_support (float): Minimum share of baskets an item and a pair
+                must appear in; rarer items are dropped before the product
+            chunk_size (int): Baskets per sparse product
+        """
+        self.item = item
+        self.basket = basket
+        self.min_support = min_support
+        self.chunk_size = chunk_size
+        self.reset()
+
+    def reset(self):
+        """Forget all accumulated counts."""
+        self.n_baskets_ = 0
+        self.items_ = pd.Index([], name=self.item)
+        self.item_counts_ = np.zeros(0, dtype='int64')
+        self.pair_counts_ = sp.csr_matrix((0, 0), dtype='int64')
+
+    def fit(self, df: pd.DataFrame) -> 'BasketAnalyzer':
+        """Count items and pairs of one data set.
+
+        Items below `min_support` cannot be part of a frequent pair, so they
+        are dropped before the pair counts are computed.
+
+        Args:
+            df (pd.DataFrame): Processed dataframe
+
+        Returns:
+            BasketAnalyzer: The fitted analyzer
+        """
+        self.reset()
+        matrix, _, items = basket_matrix(df, self.item, self.basket)
+        support = np.asarray(matrix.sum(axis=0)).ravel() / max(matrix.shape[0], 1)
+        keep = np.flatnonzero(support >= self.min_support)
+        return self._accumulate(matrix[:, keep], items[keep])
+
+    def partial_fit(self, df: pd.DataFrame) -> 'BasketAnalyzer':
+        """Add the baskets of one batch to the counts.
+
+        Overall support is not known per batch, so no item is pruned here;
+        the thresholds apply when pairs and rules are read.
+
+        Args:
+            df (pd.DataFrame): Processed batch
+
+        Returns:
+            BasketAnalyzer: The analyzer itself
+        """
+        matrix, _, items = basket_matrix(df, self.item, self.basket)
+        return self._accumulate(matrix, items)
+
+    def _accumulate(self, matrix: sp.csr_matrix, items: pd.Index) -> 'BasketAnalyzer':
+        """Fold a basket x item matrix into the item and pair counts."""
+        # Map the batch's items onto the accumulated item index
+        new_items = items.difference(self.items_, sort=False)
+        if len(new_items):
+            self.items_ = self.items_.append(new_items)
+            n_items = len(self.items_)
+            self.item_counts_ = np.concatenate([self.item_counts_,
+                                                np.zeros(len(new_items), dtype='int64')])
+            self.pair_counts_.resize((n_items, n_items))
+        positions = self.items_.get_indexer(items)
+        matrix = sp.csr_matrix((matrix.data, positions[matrix.indices], matrix.indptr),
+                               shape=(matrix.shape[0], len(self.items_)))
+
+        self.n_baskets_ += matrix.shape[0]
+        self.item_counts_ += np.asarray(matrix.sum(axis=0)).ravel()
+
+        for start in range(0, matrix.shape[0], self.chunk_size):
+            chunk = matrix[start:start + self.chunk_size]
+            # Baskets with a single item cannot form pairs
+            chunk = chunk[np.diff(chunk.indptr) > 1]
+            if chunk.shape[0]:
+                self.pair_counts_ = self.pair_counts_ + sp.triu(chunk.T @ chunk, k=1, format='csr')
+        return self
+
+    def frequent_items(self, min_support: Optional[float] = None) -> pd.DataFrame:
+        """Items whose support reaches the threshold.
+
+        Args:
+            min_support (Optional[float]): Threshold, the analyzer's by default
+
+        Returns:
+            pd.DataFrame: Item, basket count and support, most frequent first
+        """
+        min_support = self.min_support if min_support is None else min_support
+        support = self.item_counts_ / max(self.n_baskets_, 1)
+        keep = support >= min_support
+        result = pd.DataFrame({
+            self.item: self.items_[keep],
+            'count': self.item_counts_[keep],
+            'support': support[keep],
+        })
+        return result.sort_values('count', ascending=False, ignore_index=True)
+
+    def pairs(self, min_support: Optional[float] = None) -> pd.DataFrame:
+        """Frequent item pairs with support and lift.
+
+        Args:
+            min_support (Optional[float]): Threshold, the analyzer's by default
+
+        Returns:
+            pd.DataFrame: item_a, item_b, pair count, support and lift
+        """
+        min_support = self.min_support if min_support is None else min_support
+        n_baskets = max(self.n_baskets_, 1)
+        counts = self.pair_counts_.tocoo()
+        keep = counts.data / n_baskets >= min_support
+        a, b, pair_count = counts.row[keep], counts.col[keep], counts.data[keep]
+        support = pair_count / n_baskets
+        item_support = self.item_counts_ / n_baskets
+        result = pd.DataFrame({
+            'item_a': self.items_[a],
+            'item_b': self.items_[b],
+            'count': pair_count,
+            'support': support,
+            'lift': support / (item_support[a] * item_support[b]),
+        })
+        return result.sort_values('count', ascending=False, ignore_index=True)
+
+    def rules(self, min_support: Optional[float] = None, min_confidence: float = 0.0,
+              min_lift: float = 0.0) -> pd.DataFrame:
+        """Association rules antecedent -> consequent from the frequent pairs.
+
+        Args:
+            min_support (Optional[float]): Pair support threshold
+            min_confidence (float): Minimum P(consequent | antecedent)
+            min_lift (float): Minimum lift
+
+        Returns:
+            pd.DataFrame: Rules with support, confidence and lift, highest lift
+                first
+        """
+        pairs = self.pairs(min_support)
+        counts = pd.Series(self.item_counts_, index=self.items_)
+        both_ways = pd.concat([
+            pairs.rename(columns={'item_a': 'antecedent', 'item_b': 'consequent'}),
+            pairs.rename(columns={'item_b': 'antecedent', 'item_a': 'consequent'}),
+        ], ignore_index=True)
+        both_ways['confidence'] = both_ways['count'] / counts.reindex(both_ways['antecedent']).to_numpy()
+        rules = both_ways[(both_ways['confidence'] >= min_confidence) & (both_ways['lift'] >= min_lift)]
+        columns = ['antecedent', 'consequent', 'count', 'support', 'confidence', 'lift']
+        return rules[columns].sort_values(['lift', 'confidence'], ascending=False, ignore_index=True)
@@ -0,0 +1,262 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Sequence, Tuple
+
+def hourly_grid(df: pd.DataFrame, keys: Sequence[str],
+                value: str = 'transaction_qty') -> Tuple[np.ndarray, pd.DataFrame, np.datetime64]:
+    """Stack every series into a dense series x day x hour array.
+
+    Args:
+        df (pd.DataFrame): Processed dataframe
+        keys (Sequence[str]): Columns identifying a series
+        value (str): Column to sum, e.g. quantity for demand
+
+    Returns:
+        Tuple[np.ndarray, pd.DataFrame, np.datetime64]: Array of shape
+            (series, days, 24) with zeros where nothing sold, the key values
+            of each series, and the date of day 0
+    """
+    # Combine per-key factorize codes, then renumber to the observed series
+    combined = np.zeros(len(df), dtype='int64')
+    missing = np.zeros(len(df), dtype=bool)
+    for key in keys:
+        key_codes, uniques = pd.factorize(df[key])
+        missing |= key_codes < 0
+        combined = combined * len(uniques) + key_codes
+
+    days = pd.to_datetime(df['transaction_date']).to_numpy().astype('datetime64[D]')
+    values = df[value].to_numpy(dtype='float64')
+    hours = df['hour'].to_numpy(dtype='float64')
+    rows = np.flatnonzero(~missing & ~np.isnat(days) & ~np.isnan(hours) & ~np.isnan(values))
+    if len(rows) == 0:
+        raise ValueError("No rows to build series from")
+    _, codes = np.unique(combined[rows], return_inverse=True)
+    n_series = int(codes.max()) + 1
+    first_row = np.empty(n_series, dtype='int64')
+    first_row[codes[::-1]] = rows[::-1]
+    series = df[list(keys)].iloc[first_row].reset_index(drop=True)
+
+    first_day = days[rows].min()
+    day = (days[rows] - first_day).astype('int64')
+    n_days = int(day.max()) + 1
+    cells = (codes * n_days + day) * 24 + hours[rows].astype('int64')
+    grid = np.bincount(cells, weights=values[rows], minlength=n_series * n_days * 24)
+    return grid.reshape(n_series, n_days, 24), series, first_day
+
+def _weekdays(first_weekday: int, start: int, n_days: int) -> np.ndarray:
+    """Weekday (Monday = 0) of `n_days` consecutive days starting at `start`."""
+    return (first_weekday + start + np.arange(n_days)) % 7
+
+def fit_seasonal(grid: np.ndarray, first_weekday: int, trend: bool = True) -> Dict[str, np.ndarray]:
+    """Fit the seasonal baseline of every series at once.
+
+    Each series gets weekday factors (mean sales on that weekday over the
+    overall daily mean), an hour-of-day profile per weekday (share of the
+    day's sales in each hour) and a linear trend fitted by least squares on
+    the weekday-adjusted daily totals. All of it is computed with array
+    operations over the stacked series.
+
+    Args:
+        grid (np.ndarray): History of shape (series, days, 24)
+        first_weekday (int): Weekday of the first history day
+        trend (bool): Fit a slope; otherwise the level is the adjusted mean
+
+    Returns:
+        Dict[str, np.ndarray]: Fitted parameters
+    """
+    n_series, n_days, _ = grid.shape
+    daily = grid.sum(axis=2)
+    onehot = np.eye(7)[_weekdays(first_weekday, 0, n_days)]
+    weekday_totals = daily @ onehot
+    weekday_days = onehot.sum(axis=0)
+    overall = daily.mean(axis=1, keepdims=True)
+
+    # Weekdays missing from the history or series without sales get a
+    # neutral factor of 1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weekday_factor = (weekday_totals / weekday_days) / overall
+    weekday_factor[~np.isfinite(weekday_factor)] = 1.0
+
+    factor_by_day = weekday_factor @ onehot.T
+    adjusted = np.divide(daily, factor_by_day, out=np.zeros_like(daily), where=factor_by_day > 0)
+    t = np.arange(n_days, dtype='float64')
+    t_mean = t.mean()
+    level = adjusted.mean(axis=1)
+    slope = np.zeros(n_series)
+    if trend and n_days > 1:
+        slope = (adjusted - level[:, None]) @ (t - t_mean) / np.sum((t - t_mean) ** 2)
+    intercept = level - slope * t_mean
+
+    # Hour profile per weekday, falling back to the series' overall profile
+    # and then to a flat day
+    weekday_hours = np.einsum('sdh,dw->swh', grid, onehot)
+    overall_hours = grid.sum(axis=1)
+    overall_share = np.full_like(overall_hours, 1 / 24)
+    has_sales = overall_hours.sum(axis=1) > 0
+    overall_share[has_sales] = overall_hours[has_sales] / overall_hours[has_sales].sum(axis=1, keepdims=True)
+    hour_share = np.repeat(overall_share[:, None, :], 7, axis=1)
+    weekday_sum = weekday_hours.sum(axis=2)
+    has_weekday = weekday_sum > 0
+    hour_share[has_weekday] = weekday_hours[has_weekday] / weekday_sum[has_weekday][:, None]
+
+    return {
+        'intercept': intercept,
+        'slope': slope,
+        'weekday_factor': weekday_factor,
+        'hour_share': hour_share,
+        'n_days': np.int64(n_days),
+        'first_weekday': np.int64(first_weekday),
+    }
+
+def forecast_seasonal(params: Dict[str, np.ndarray], horizon_days: int) -> np.ndarray:
+    """Forecast the days following the fitted history.
+
+    Args:
+        params (Dict[str, np.ndarray]): Output of `fit_seasonal`
+        horizon_days (int): Number of days to forecast
+
+    Returns:
+        np.ndarray: Forecast of shape (series, horizon_days, 24)
+    """
+    n_days = int(params['n_days'])
+    future = np.arange(n_days, n_days + horizon_days, dtype='float64')
+    level = np.maximum(params['intercept'][:, None] + params['slope'][:, None] * future, 0.0)
+    weekdays = _weekdays(int(params['first_weekday']), n_days, horizon_days)
+    daily = level * params['weekday_factor'][:, weekdays]
+    return daily[:, :, None] * params['hour_share'][:, weekdays, :]
+
+def _backtest_origin(task: Tuple) -> Dict:
+    """Worker: fit on the history before one origin and score the horizon."""
+    origin, window, first_weekday, history_days, horizon_days, trend = task
+    history, actual = window[:, :history_days], window[:, history_days:]
+    forecast = forecast_seasonal(fit_seasonal(history, first_weekday, trend), horizon_days)
+    error = forecast - actual
+    total = actual.sum()
+    daily_error = error.sum(axis=2)
+    return {
+        'origin': origin,
+        'mae': float(np.abs(error).mean()),
+        'wape': float(np.abs(error).sum() / total) if total else np.nan,
+        'daily_wape': float(np.abs(daily_error).sum() / total) if total else np.nan,
+        'bias': float(error.sum() / total) if total else np.nan,
+    }
+
+class SeasonalForecaster:
+    def __init__(self, keys: Sequence[str] = ('store_id', 'product_type'),
+                 value: str = 'transaction_qty', history_days: int = 56, trend: bool = True):
+        """Seasonal baseline forecaster fitted for all series at once.
+
+        The forecast of a series for a day and hour is its trend level times
+        the weekday factor times the weekday's hour-of-day share; see
+        `fit_seasonal`.
+
+        Args:
+            keys (Sequence[str]): Columns identifying a series, store x
+                product type by default
+            value (str): Column to forecast, quantity (demand) by default
+            history_days (int): Trailing days used for fitting
+            trend (bool): Fit a linear trend
+        """
+        self.keys = list(keys)
+        self.value = value
+        self.history_days = history_days
+        self.trend = trend
+        self.series_ = None
+        self.params_ = None
+        self.start_date_ = None
+
+    def fit(self, df: pd.DataFrame) -> 'SeasonalForecaster':
+        """Fit every series on the last `history_days` of the data.
+
+        Args:
+            df (pd.DataFrame): Processed dataframe
+
+        Returns:
+            SeasonalForecaster: The fitted forecaster
+        """
+        grid, self.series_, first_day = hourly_grid(df, self.keys, self.value)
+        start = max(grid.shape[1] - self.history_days, 0)
+        self.start_date_ = first_day + np.timedelta64(start, 'D')
+        self.params_ = fit_seasonal(grid[:, start:], self._weekday(self.start_date_), self.trend)
+        return self
+
+    def predict(self, horizon_days: int = 7, freq: str = 'hour') -> pd.DataFrame:
+        """Forecast the days after the fitted history.
+
+        Args:
+            horizon_days (int): Number of days to forecast
+            freq (str): 'hour' for hourly or 'day' for daily forecasts
+
+        Returns:
+            pd.DataFrame: Series keys, 'datetime' and 'forecast' columns
+        """
+        if self.params_ is None:
+            raise ValueError("SeasonalForecaster is not fitted yet")
+        if freq not in ('hour', 'day'):
+            raise ValueError(f"freq must be 'hour' or 'day', got '{freq}'")
+        forecast = forecast_seasonal(self.params_, horizon_days)
+        first = self.start_date_ + np.timedelta64(int(self.params_['n_days']), 'D')
+        dates = (first + np.arange(horizon_days)).astype('datetime64[ns]')
+        if freq == 'day':
+            values = forecast.sum(axis=2)
+            times = dates
+        else:
+            values = forecast
+            times = (dates[:, None] + np.arange(24) * np.timedelta64(1, 'h')).ravel()
+        n_series = len(self.series_)
+        result = self.series_.iloc[np.repeat(np.arange(n_series), len(times))].reset_index(drop=True)
+        result['datetime'] = np.tile(times, n_series)
+        result['forecast'] = values.reshape(n_series, -1).ravel()
+        return result
+
+    def backtest(self, df: pd.DataFrame, n_origins: int = 4, horizon_days: int = 7,
+                 max_workers: Optional[int] = None) -> pd.DataFrame:
+        """Evaluate the forecaster over rolling origins in parallel.
+
+        The last `n_origins` horizons of the data are held out one at a time;
+        for each origin the model is fitted on the `history_days` before it.
+        Origins are scored in a process pool, each worker receiving only its
+        slice of the stacked series.
+
+        Args:
+            df (pd.DataFrame): Processed dataframe
+            n_origins (int): Number of forecast origins
+            horizon_days (int): Days forecast from each origin
+            max_workers (Optional[int]): Pool size, one process per origin
+                (capped at the CPU count) by default; 1 runs serially
+
+        Returns:
+            pd.DataFrame: MAE, WAPE, daily WAPE and bias per origin date
+        """
+        grid, _, first_day = hourly_grid(df, self.keys, self.value)
+        n_days = grid.shape[1]
+        tasks = []
+        for k in range(n_origins, 0, -1):
+            origin = n_days - k * horizon_days
+            start = max(origin - self.history_days, 0)
+            if origin - start < 7:
+                continue
+            window = grid[:, start:origin + horizon_days]
+            tasks.append((first_day + np.timedelta64(origin, 'D'), window,
+                          self._weekday(first_day + np.timedelta64(start, 'D')),
+                          origin - start, horizon_days, self.trend))
+        if not tasks:
+            raise ValueError("Not enough history for the requested backtest")
+
+        if max_workers is None:
+            max_workers = min(len(tasks), os.cpu_count() or 1)
+        if max_workers == 1:
+            scores = [_backtest_origin(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                scores = list(executor.map(_backtest_origin, tasks))
+        result = pd.DataFrame(scores)
+        result['origin'] = pd.to_datetime(result['origin'])
+        return result
+
+    @staticmethod
+    def _weekday(day: np.datetime64) -> int:
+        # 1970-01-01 was a Thursday (weekday 3)
+        return int((day.astype('datetime64[D]').astype('int64') + 3) % 7)
@@ -0,0 +1,155 @@
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List
+
+from src.models.sales_analyzer import SalesAnalyzer
+from src.models.sales_cube import SalesCube
+
+# A transaction has one line per product, so a line is identified by both
+LINE_KEYS = ['transaction_id', 'product_id']
+
+class IncrementalSalesStore:
+    def __init__(self, state_dir: str = '.cache/incremental'):
+        """Initialize a persistent store of sales aggregates.
+
+        Each ingest appends one cube part (per date x hour x store x product
+        aggregates, which roll up to the daily, store/day, product and monthly
+        totals) and one sorted segment of hashed transaction ids. Nightly cost
+        therefore depends on the size of the new data, not on the history.
+
+        Args:
+            state_dir (str): Directory holding the persisted state
+        """
+        self.state_dir = Path(state_dir)
+        (self.state_dir / 'cube').mkdir(parents=True, exist_ok=True)
+        (self.state_dir / 'ids').mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.state_dir / 'manifest.json'
+        self.manifest = self._read_manifest()
+        self._cube = None
+
+    def _read_manifest(self) -> Dict:
+        if self.manifest_path.exists():
+            return json.loads(self.manifest_path.read_text())
+        return {'next_part': 0, 'parts': [], 'total_rows': 0}
+
+    def _write_manifest(self):
+        # The manifest is the commit point: parts not listed in it are ignored
+        tmp_path = self.manifest_path.with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps(self.manifest, indent=2))
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def _hash_ids(ids: pd.Series) -> np.ndarray:
+        return pd.util.hash_array(np.asarray(ids))
+
+    def _seen(self, hashes: np.ndarray) -> np.ndarray:
+        """Flag hashes already stored in one of the id segments."""
+        seen = np.zeros(len(hashes), dtype=bool)
+        for part in self.manifest['parts']:
+            # Memory-mapped binary search only touches a few pages per lookup
+            segment = np.load(self.state_dir / 'ids' / part['ids'], mmap_mode='r')
+            if len(segment) == 0:
+                continue
+            positions = np.searchsorted(segment, hashes)
+            positions[positions == len(segment)] = 0
+            seen |= np.asarray(segment[positions]) == hashes
+        return seen
+
+    def ingest(self, df: pd.DataFrame) -> Dict:
+        """Fold a batch of new processed transactions into the stored aggregates.
+
+        Rows whose transaction_id was ingested by an earlier call are dropped.
+        Within the batch, a transaction keeps all its lines, but only the last
+        row of each line (transaction_id and product_id) is kept, so a
+        corrected line re-sent in the same file replaces the earlier one.
+
+        Args:
+            df (pd.DataFrame): Processed dataframe with the new transactions
+
+        Returns:
+            Dict: Counts of received, duplicate and ingested rows
+        """
+        start = time.perf_counter()
+        fresh = df[~df.duplicated(subset=LINE_KEYS, keep='last')]
+        hashes = self._hash_ids(fresh['transaction_id'])
+        is_new = ~self._seen(hashes)
+        fresh = fresh[is_new]
+        hashes = hashes[is_new]
+
+        summary = {
+            'received_rows': len(df),
+            'duplicate_rows': len(df) - len(fresh),
+            'ingested_rows': len(fresh),
+        }
+        if len(fresh) > 0:
+            part_id = self.manifest['next_part']
+            cube_name = f'part-{part_id:05d}.parquet'
+            ids_name = f'part-{part_id:05d}.npy'
+            SalesCube.from_transactions(fresh).data.to_parquet(self.state_dir / 'cube' / cube_name)
+            np.save(self.state_dir / 'ids' / ids_name, np.unique(hashes))
+
+            self.manifest['parts'].append({'cube': cube_name, 'ids': ids_name, 'rows': len(fresh)})
+            self.manifest['next_part'] = part_id + 1
+            self.manifest['total_rows'] += len(fresh)
+            self._write_manifest()
+            self._cube = None
+
+        summary['seconds'] = time.perf_counter() - start
+        return summary
+
+    def cube(self) -> SalesCube:
+        """Return the aggregate cube over everything ingested so far.
+
+        Returns:
+            SalesCube: Merged cube
+        """
+        if self._cube is None:
+            parts = [SalesCube(pd.read_parquet(self.state_dir / 'cube' / part['cube']))
+                     for part in self.manifest['parts']]
+            if not parts:
+                raise ValueError(f"No data has been ingested into {self.state_dir}")
+            self._cube = SalesCube.merge(parts) if len(parts) > 1 else parts[0]
+        return self._cube
+
+    def compact(self) -> int:
+        """Merge all cube parts and id segments into one of each.
+
+        Returns:
+            int: Number of parts that were merged
+        """
+        parts: List[Dict] = self.manifest['parts']
+        if len(parts) <= 1:
+            return len(parts)
+
+        cube = self.cube()
+        ids = np.unique(np.concatenate([np.load(self.state_dir / 'ids' / part['ids'])
+                                        for part in parts]))
+        part_id = self.manifest['next_part']
+        merged = {'cube': f'part-{part_id:05d}.parquet', 'ids': f'part-{part_id:05d}.npy',
+                  'rows': sum(part['rows'] for part in parts)}
+        cube.data.to_parquet(self.state_dir / 'cube' / merged['cube'])
+        np.save(self.state_dir / 'ids' / merged['ids'], ids)
+
+        self.manifest['parts'] = [merged]
+        self.manifest['next_part'] = part_id + 1
+        self._write_manifest()
+        for part in parts:
+            (self.state_dir / 'cube' / part['cube']).unlink()
+            (self.state_dir / 'ids' / part['ids']).unlink()
+        return len(parts)
+
+    def analyze_sales_trends(self) -> Dict:
+        """Sales trends over all ingested data, see `SalesAnalyzer.analyze_sales_trends`."""
+        return SalesAnalyzer.analyze_sales_trends(self.cube())
+
+    def analyze_product_performance(self) -> pd.DataFrame:
+        """Product metrics over all ingested data, see `SalesAnalyzer.analyze_product_performance`."""
+        return SalesAnalyzer.analyze_product_performance(self.cube())
+
+    def analyze_store_performance(self) -> pd.DataFrame:
+        """Store metrics over all ingested data, see `SalesAnalyzer.analyze_store_performance`."""
+        return SalesAnalyzer.analyze_store_performance(self.cube())
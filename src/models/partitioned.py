@@ -0,0 +1,139 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from src.preprocessing.preprocessor import DataPreprocessor
+from src.models.sales_analyzer import SalesAnalyzer
+from src.models.sales_cube import SalesCube
+
+PARTITION_KEYS = ('store_id', 'date')
+
+class PartitionedExecutor:
+    def __init__(self, n_workers: Optional[int] = None, partition_by: str = 'date',
+                 n_partitions: Optional[int] = None):
+        """Run preprocessing and aggregation on shards in a process pool.
+
+        Every shard is preprocessed and reduced to a partial SalesCube in its
+        own worker. The partial cubes hold only additive measures, so merging
+        them and running the analyzer on the merged cube gives the same
+        counts and argmax answers as the single-core path, and the same sums
+        and monthly growth up to floating-point summation order.
+
+        Args:
+            n_workers (Optional[int]): Pool size, the CPU count by default
+            partition_by (str): 'date' to split the date range into contiguous
+                ranges, or 'store_id' for one shard per store
+            n_partitions (Optional[int]): Number of date ranges, twice the pool
+                size by default to smooth out uneven shards
+        """
+        if partition_by not in PARTITION_KEYS:
+            raise ValueError(f"partition_by must be one of {PARTITION_KEYS}, got '{partition_by}'")
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.partition_by = partition_by
+        self.n_partitions = n_partitions or 2 * self.n_workers
+
+    def _date_bounds(self, dates: pd.Series) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        days = pd.to_datetime(dates).dt.normalize()
+        first, last = days.min(), days.max()
+        n_days = (last - first).days + 1
+        edges = np.unique(np.linspace(0, n_days, min(self.n_partitions, n_days) + 1).astype(int))
+        return [(first + pd.Timedelta(days=int(lo)), first + pd.Timedelta(days=int(hi)))
+                for lo, hi in zip(edges[:-1], edges[1:])]
+
+    def shards(self, source: Union[pd.DataFrame, str]) -> List[Union[pd.DataFrame, Tuple]]:
+        """Split the input into shards.
+
+        Data frames are split in memory. For a Parquet path only the partition
+        column is read here; each shard becomes a (path, filters) read spec so
+        workers load their rows themselves instead of receiving pickled
+        frames. Rows with a missing store id or date form one more shard, so
+        no row is left out.
+
+        Args:
+            source (Union[pd.DataFrame, str]): Raw transactions or Parquet path
+
+        Returns:
+            List[Union[pd.DataFrame, Tuple]]: Shards or read specs
+        """
+        column = 'store_id' if self.partition_by == 'store_id' else 'transaction_date'
+        is_path = not isinstance(source, pd.DataFrame)
+        values = pd.read_parquet(source, columns=[column])[column] if is_path else source[column]
+
+        present = values.dropna()
+        if self.partition_by == 'store_id':
+            conditions = [[('store_id', '==', store_id)] for store_id in sorted(present.unique())]
+        elif len(present):
+            conditions = [[('transaction_date', '>=', lo), ('transaction_date', '<', hi)]
+                          for lo, hi in self._date_bounds(present)]
+        else:
+            conditions = []
+        if len(present) < len(values):
+            # Residual shard of the rows without a partition key
+            conditions.append(pc.field(column).is_null(nan_is_null=True))
+
+        if is_path:
+            return [(str(source), filters) for filters in conditions]
+
+        shards = []
+        dates = pd.to_datetime(values) if self.partition_by == 'date' else None
+        for filters in conditions:
+            if not isinstance(filters, list):
+                mask = values.isna()
+            elif self.partition_by == 'store_id':
+                mask = values == filters[0][2]
+            else:
+                mask = (dates >= filters[0][2]) & (dates < filters[1][2])
+            if mask.any():
+                shards.append(source[mask.to_numpy()])
+        return shards
+
+    def aggregate(self, source: Union[pd.DataFrame, str]) -> SalesCube:
+        """Preprocess and aggregate all shards in parallel and merge the results.
+
+        Args:
+            source (Union[pd.DataFrame, str]): Raw transactions or Parquet path
+
+        Returns:
+            SalesCube: Cube over the whole input
+        """
+        shards = self.shards(source)
+        if self.n_workers == 1:
+            cubes = [_aggregate_shard(shard) for shard in shards]
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+                cubes = list(executor.map(_aggregate_shard, shards))
+        cubes = [cube for cube in cubes if cube is not None]
+        if not cubes:
+            raise ValueError("No rows to aggregate")
+        return SalesCube.merge(cubes)
+
+    def run(self, source: Union[pd.DataFrame, str]) -> Dict:
+        """Compute the sales trend, product and store reports in parallel.
+
+        Args:
+            source (Union[pd.DataFrame, str]): Raw transactions or Parquet path
+
+        Returns:
+            Dict: 'sales_trends', 'product_performance', 'store_performance'
+                as returned by SalesAnalyzer, plus the merged 'cube'
+        """
+        cube = self.aggregate(source)
+        return {
+            'sales_trends': SalesAnalyzer.analyze_sales_trends(cube),
+            'product_performance': SalesAnalyzer.analyze_product_performance(cube),
+            'store_performance': SalesAnalyzer.analyze_store_performance(cube),
+            'cube': cube,
+        }
+
+def _aggregate_shard(shard: Union[pd.DataFrame, Tuple[str, list]]) -> Optional[SalesCube]:
+    """Worker: load (if needed), preprocess and aggregate one shard."""
+    if isinstance(shard, tuple):
+        path, filters = shard
+        shard = pd.read_parquet(Path(path), filters=filters)
+    if len(shard) == 0:
+        return None
+    return SalesCube.from_transactions(DataPreprocessor.preprocess_data(shard))
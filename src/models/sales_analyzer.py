@@ -1,73 +1,156 @@
+import functools
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
-from typing import Dict, Tuple
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from src.models.forecaster import SeasonalForecaster
+from src.models.sales_cube import SalesCube
+from src.models.segmentation import SegmentationModel, build_customer_features
+from src.models.streaming import StreamingSalesAnalyzer
+from src.utils.result_cache import ResultCache
+
+if TYPE_CHECKING:
+    # sklearn and scipy take longer to import than the rest of the package;
+    # the methods that need them import them on first use
+    from sklearn.cluster import KMeans
+    from src.models.basket_analysis import BasketAnalyzer
+
+def _memoized(columns: List[str]):
+    """Serve an analyzer method from `SalesAnalyzer.result_cache` when set.
+    
+    Args:
+        columns (List[str]): Columns of the input frame the method reads; only
+            these are fingerprinted
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = SalesAnalyzer.result_cache
+            if cache is None:
+                return func(*args, **kwargs)
+            return cache.call(func, args, kwargs, columns=columns)
+        # Also read by the lazy pipeline to prune columns the method ignores
+        wrapper.input_columns = list(columns)
+        return wrapper
+    return decorator
 
 class SalesAnalyzer:
+    # Memoization cache shared by all analyzers; results are recomputed on
+    # every call while it is None
+    result_cache: Optional[ResultCache] = None
+    
+    def __init__(self, backend: str = 'pandas', **backend_options):
+        """Create an analyzer on the given execution backend.
+        
+        Args:
+            backend (str): 'pandas' (default) runs every method on in-memory
+                frames or cubes; 'duckdb' answers sales trends, product and
+                store performance with `SQLBackend`, as SQL directly over
+                raw Parquet/CSV files, for this instance only
+            **backend_options: Options of `SQLBackend`, e.g. threads
+        """
+        self.backend = backend
+        if backend != 'pandas':
+            from src.models.sql_backend import SQLBackend
+            sql = SQLBackend(engine=backend, **backend_options)
+            # Instance attributes take precedence over the static methods
+            for name in SQLBackend.METHODS:
+                setattr(self, name, getattr(sql, name))
+    
     @staticmethod
-    def analyze_sales_trends(df: pd.DataFrame) -> Dict:
+    def set_result_cache(cache: Optional[ResultCache]) -> Optional[ResultCache]:
+        """Enable memoization of the analysis methods, or disable it with None.
+        
+        Args:
+            cache (Optional[ResultCache]): Cache to use
+            
+        Returns:
+            Optional[ResultCache]: The previously installed cache
+        """
+        previous = SalesAnalyzer.result_cache
+        SalesAnalyzer.result_cache = cache
+        return previous
+    
+    @staticmethod
+    @_memoized(['total_amount', 'transaction_date', 'hour', 'product_category',
+                'store_location', 'datetime'])
+    def analyze_sales_trends(df: Union[pd.DataFrame, SalesCube]) -> Dict:
         """Analyze sales trends and patterns.
         
         Args:
-            df (pd.DataFrame): Processed dataframe
+            df (Union[pd.DataFrame, SalesCube]): Processed dataframe or a
+                sales cube built from it
             
         Returns:
             Dict: Dictionary containing sales trend analysis
         """
         analysis = {
-            'total_sales': df['total_amount'].sum(),
-            'avg_daily_sales': df.groupby('transaction_date')['total_amount'].sum().mean(),
-            'peak_sales_hour': df.groupby('hour')['total_amount'].sum().idxmax(),
-            'best_performing_category': df.groupby('product_category')['total_amount'].sum().idxmax(),
-            'best_performing_store': df.groupby('store_location')['total_amount'].sum().idxmax(),
+            'total_sales': SalesCube.sales_by(df, None),
+            'avg_daily_sales': SalesCube.sales_by(df, 'transaction_date').mean(),
+            'peak_sales_hour': SalesCube.sales_by(df, 'hour').idxmax(),
+            'best_performing_category': SalesCube.sales_by(df, 'product_category').idxmax(),
+            'best_performing_store': SalesCube.sales_by(df, 'store_location').idxmax(),
             'sales_growth': SalesAnalyzer._calculate_sales_growth(df)
         }
         return analysis
     
     @staticmethod
-    def analyze_product_performance(df: pd.DataFrame) -> pd.DataFrame:
+    @_memoized(['product_category', 'product_type', 'transaction_qty',
+                'total_amount', 'transaction_id'])
+    def analyze_product_performance(df: Union[pd.DataFrame, SalesCube]) -> pd.DataFrame:
         """Analyze product performance metrics.
         
         Args:
-            df (pd.DataFrame): Processed dataframe
+            df (Union[pd.DataFrame, SalesCube]): Processed dataframe or a
+                sales cube built from it
             
         Returns:
             pd.DataFrame: Product performance metrics
         """
-        product_metrics = df.groupby(['product_category', 'product_type']).agg({
-            'transaction_qty': 'sum',
-            'total_amount': 'sum',
-            'transaction_id': 'count'
-        }).reset_index()
+        if isinstance(df, SalesCube):
+            product_metrics = (df.rollup(['product_category', 'product_type'])
+                               [['transaction_qty', 'total_amount', 'transaction_count']]
+                               .rename(columns={'transaction_count': 'transaction_id'})
+                               .reset_index())
+        else:
+            product_metrics = df.groupby(['product_category', 'product_type'], observed=True).agg({
+                'transaction_qty': 'sum',
+                'total_amount': 'sum',
+                'transaction_id': 'count'
+            }).reset_index()
         
-        product_metrics['avg_price'] = product_metrics['total_amount'] / product_metrics['transaction_qty']
-        product_metrics['sales_share'] = product_metrics['total_amount'] / product_metrics['total_amount'].sum()
-        
-        return product_metrics.sort_values('total_amount', ascending=False)
+        return SalesAnalyzer._finish_product_metrics(product_metrics)
     
     @staticmethod
-    def analyze_store_performance(df: pd.DataFrame) -> pd.DataFrame:
+    @_memoized(['store_id', 'store_location', 'transaction_id',
+                'total_amount', 'transaction_qty'])
+    def analyze_store_performance(df: Union[pd.DataFrame, SalesCube]) -> pd.DataFrame:
         """Analyze store performance metrics.
         
         Args:
-            df (pd.DataFrame): Processed dataframe
+            df (Union[pd.DataFrame, SalesCube]): Processed dataframe or a
+                sales cube built from it
             
         Returns:
             pd.DataFrame: Store performance metrics
         """
-        store_metrics = df.groupby(['store_id', 'store_location']).agg({
-            'transaction_id': 'count',
-            'total_amount': 'sum',
-            'transaction_qty': 'sum'
-        }).reset_index()
+        if isinstance(df, SalesCube):
+            store_metrics = (df.rollup(['store_id', 'store_location'])
+                             [['transaction_count', 'total_amount', 'transaction_qty']]
+                             .rename(columns={'transaction_count': 'transaction_id'})
+                             .reset_index())
+        else:
+            store_metrics = df.groupby(['store_id', 'store_location'], observed=True).agg({
+                'transaction_id': 'count',
+                'total_amount': 'sum',
+                'transaction_qty': 'sum'
+            }).reset_index()
         
-        store_metrics['avg_transaction_value'] = store_metrics['total_amount'] / store_metrics['transaction_id']
-        store_metrics['sales_share'] = store_metrics['total_amount'] / store_metrics['total_amount'].sum()
-        
-        return store_metrics.sort_values('total_amount', ascending=False)
+        return SalesAnalyzer._finish_store_metrics(store_metrics)
     
     @staticmethod
-    def segment_customers(df: pd.DataFrame, n_clusters: int = 3) -> Tuple[pd.DataFrame, KMeans]:
+    @_memoized(['transaction_id', 'total_amount', 'transaction_qty', 'product_id'])
+    def segment_customers(df: pd.DataFrame, n_clusters: int = 3) -> Tuple[pd.DataFrame, 'KMeans']:
         """Segment customers based on their purchasing behavior.
         
         Args:
@@ -78,35 +161,176 @@ class SalesAnalyzer:
             Tuple[pd.DataFrame, KMeans]: Segmentation results and model
         """
         # Create customer features
-        customer_features = df.groupby('transaction_id').agg({
-            'total_amount': 'sum',
-            'transaction_qty': 'sum',
-            'product_id': 'nunique'
-        }).reset_index()
+        customer_features = build_customer_features(df)
         
         # Normalize features
-        features_normalized = (customer_features.drop('transaction_id', axis=1) - 
-                             customer_features.drop('transaction_id', axis=1).mean()) / \
-                             customer_features.drop('transaction_id', axis=1).std()
+        features = customer_features.drop('transaction_id', axis=1)
+        features_normalized = (features - features.mean()) / features.std()
         
         # Perform clustering
+        from sklearn.cluster import KMeans
         kmeans = KMeans(n_clusters=n_clusters, random_state=42)
         customer_features['segment'] = kmeans.fit_predict(features_normalized)
         
         return customer_features, kmeans
     
     @staticmethod
-    def _calculate_sales_growth(df: pd.DataFrame) -> float:
-        """Calculate sales growth rate.
+    @_memoized(['transaction_id', 'total_amount', 'transaction_qty', 'product_id'])
+    def segment_customers_scalable(df: pd.DataFrame, n_clusters: int = 3,
+                                   batch_size: int = 10_000,
+                                   init_sample_size: Optional[int] = None
+                                   ) -> Tuple[pd.DataFrame, SegmentationModel]:
+        """Segment customers with MiniBatchKMeans for large inputs.
+        
+        Uses single-pass normalization statistics and mini-batch updates, so
+        the cost grows linearly with the number of transactions. For data that
+        does not fit in memory, fit a `SegmentationModel` on streamed feature
+        chunks directly.
         
         Args:
             df (pd.DataFrame): Processed dataframe
+            n_clusters (int): Number of clusters for segmentation
+            batch_size (int): Rows per mini-batch update
+            init_sample_size (Optional[int]): Size of the sample used for
+                k-means++ initialization
+            
+        Returns:
+            Tuple[pd.DataFrame, SegmentationModel]: Segmentation results and a
+                reusable fitted model
+        """
+        customer_features = build_customer_features(df)
+        model = SegmentationModel(n_clusters=n_clusters, batch_size=batch_size,
+                                  init_sample_size=init_sample_size)
+        model.fit(customer_features)
+        customer_features['segment'] = model.predict(customer_features)
+        
+        return customer_features, model
+    
+    @staticmethod
+    def analyze_sales_stream(batches: Iterable[pd.DataFrame], top_n: int = 5,
+                             capacity: int = 64) -> Tuple[Dict, StreamingSalesAnalyzer]:
+        """Answer the trend and top product/store questions over a stream.
+        
+        Batches are folded into fixed-size accumulators one at a time, so the
+        data never has to fit in memory. Totals and the peak hour are exact;
+        rankings come from top-k summaries with the stated error bounds.
+        
+        Args:
+            batches (Iterable[pd.DataFrame]): Processed batches, e.g. from
+                `DataPreprocessor.preprocess_batches`
+            top_n (int): Number of products to report
+            capacity (int): Keys monitored per top-k summary
+            
+        Returns:
+            Tuple[Dict, StreamingSalesAnalyzer]: 'sales_trends',
+                'product_performance', 'store_performance' and
+                'error_bounds', and the fitted streaming analyzer
+        """
+        stream = StreamingSalesAnalyzer(capacity=capacity).fit(batches)
+        results = {
+            'sales_trends': stream.sales_trends(),
+            'product_performance': stream.product_performance(top_n),
+            'store_performance': stream.store_performance(),
+            'error_bounds': stream.error_bounds(),
+        }
+        return results, stream
+    
+    @staticmethod
+    def analyze_baskets(df: pd.DataFrame, item: str = 'product_id',
+                        min_support: float = 0.001, min_confidence: float = 0.0
+                        ) -> Tuple[pd.DataFrame, 'BasketAnalyzer']:
+        """Find items bought together within a transaction.
+        
+        Args:
+            df (pd.DataFrame): Processed dataframe
+            item (str): Column identifying an item, e.g. 'product_type'
+            min_support (float): Minimum share of transactions a pair appears in
+            min_confidence (float): Minimum confidence of a rule
+            
+        Returns:
+            Tuple[pd.DataFrame, BasketAnalyzer]: Association rules with
+                support, confidence and lift, and the fitted analyzer
+        """
+        from src.models.basket_analysis import BasketAnalyzer
+        baskets = BasketAnalyzer(item=item, min_support=min_support).fit(df)
+        return baskets.rules(min_confidence=min_confidence), baskets
+    
+    @staticmethod
+    def forecast_demand(df: pd.DataFrame, horizon_days: int = 7,
+                        keys: Sequence[str] = ('store_id', 'product_type'),
+                        freq: str = 'day', history_days: int = 56
+                        ) -> Tuple[pd.DataFrame, SeasonalForecaster]:
+        """Forecast demand (quantity) for every store x product type.
+        
+        Fits the seasonal baseline of all series at once; use the returned
+        forecaster's `backtest` to evaluate it over rolling origins.
+        
+        Args:
+            df (pd.DataFrame): Processed dataframe
+            horizon_days (int): Number of days to forecast
+            keys (Sequence[str]): Columns identifying a series
+            freq (str): 'day' for daily or 'hour' for hourly forecasts
+            history_days (int): Trailing days used for fitting
+            
+        Returns:
+            Tuple[pd.DataFrame, SeasonalForecaster]: Forecast per series and
+                period, and the fitted forecaster
+        """
+        forecaster = SeasonalForecaster(keys=keys, history_days=history_days).fit(df)
+        return forecaster.predict(horizon_days, freq=freq), forecaster
+    
+    @staticmethod
+    def _calculate_sales_growth(df: Union[pd.DataFrame, SalesCube]) -> float:
+        """Calculate sales growth rate.
+        
+        Args:
+            df (Union[pd.DataFrame, SalesCube]): Processed dataframe or cube
             
         Returns:
             float: Sales growth rate
         """
-        monthly_sales = df.groupby(df['datetime'].dt.to_period('M'))['total_amount'].sum()
+        if isinstance(df, SalesCube):
+            monthly_sales = df.rollup('month')['total_amount']
+        else:
+            monthly_sales = df.groupby(df['datetime'].dt.to_period('M'), observed=True)['total_amount'].sum()
+        return SalesAnalyzer._growth_rate(monthly_sales)
+    
+    @staticmethod
+    def _growth_rate(monthly_sales: pd.Series) -> float:
+        """Growth from the first to the last month of monthly sales, in percent."""
         if len(monthly_sales) > 1:
             growth_rate = (monthly_sales.iloc[-1] - monthly_sales.iloc[0]) / monthly_sales.iloc[0] * 100
             return growth_rate
         return 0.0
+    
+    @staticmethod
+    def _finish_product_metrics(product_metrics: pd.DataFrame) -> pd.DataFrame:
+        """Add price and share columns to per-product sums and rank by sales.
+        
+        Args:
+            product_metrics (pd.DataFrame): Quantity, sales and line count per
+                category and product type, in key order
+            
+        Returns:
+            pd.DataFrame: Product performance metrics
+        """
+        product_metrics['avg_price'] = product_metrics['total_amount'] / product_metrics['transaction_qty']
+        product_metrics['sales_share'] = product_metrics['total_amount'] / product_metrics['total_amount'].sum()
+        
+        return product_metrics.sort_values('total_amount', ascending=False)
+    
+    @staticmethod
+    def _finish_store_metrics(store_metrics: pd.DataFrame) -> pd.DataFrame:
+        """Add transaction value and share columns to per-store sums and rank by sales.
+        
+        Args:
+            store_metrics (pd.DataFrame): Line count, sales and quantity per
+                store, in key order
+            
+        Returns:
+            pd.DataFrame: Store performance metrics
+        """
+        store_metrics['avg_transaction_value'] = store_metrics['total_amount'] / store_metrics['transaction_id']
+        store_metrics['sales_share'] = store_metrics['total_amount'] / store_metrics['total_amount'].sum()
+        
+        return store_metrics.sort_values('total_amount', ascending=False)
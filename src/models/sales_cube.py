@@ -0,0 +1,113 @@
+import pandas as pd
+from typing import Iterable, List, Optional, Union
+
+from src.preprocessing.preprocessor import DAY_NAMES
+
+CUBE_KEYS = ['transaction_date', 'hour', 'store_id', 'store_location',
+             'product_category', 'product_type']
+CUBE_MEASURES = ['total_amount', 'transaction_qty', 'transaction_count', 'line_count']
+
+class SalesCube:
+    def __init__(self, data: pd.DataFrame):
+        """Wrap an aggregated sales cube.
+
+        The cube holds one row per date x hour x store x category x product
+        type with additive measures, so any coarser aggregation the reports
+        need is a small rollup over the cube instead of a scan of the
+        transactions. Use `from_transactions` to build one.
+
+        Args:
+            data (pd.DataFrame): Cube rows with CUBE_KEYS and CUBE_MEASURES
+                columns
+        """
+        self.data = data
+
+    @classmethod
+    def from_transactions(cls, df: pd.DataFrame) -> 'SalesCube':
+        """Build the cube with a single scan of the processed transactions.
+
+        Args:
+            df (pd.DataFrame): Processed dataframe
+
+        Returns:
+            SalesCube: Aggregated cube
+        """
+        keys = {key: df[key] for key in CUBE_KEYS if key != 'transaction_date'}
+        keys['transaction_date'] = pd.to_datetime(df['transaction_date']).dt.normalize()
+        data = pd.DataFrame({
+            'total_amount': df['total_amount'],
+            'transaction_qty': df['transaction_qty'],
+            'transaction_count': df['transaction_id'].notna(),
+            'line_count': df['total_amount'].notna(),
+        })
+        # Rows with a missing key are kept as their own cells, so rollups by
+        # the other keys still count them, as groupbys on the frame do
+        data = data.groupby([keys[key] for key in CUBE_KEYS], observed=True, sort=False, dropna=False).sum()
+        return cls(data.reset_index())
+
+    @classmethod
+    def merge(cls, cubes: Iterable['SalesCube']) -> 'SalesCube':
+        """Combine partial cubes, e.g. built from separate batches or shards.
+
+        Args:
+            cubes (Iterable[SalesCube]): Cubes to combine
+
+        Returns:
+            SalesCube: Cube with the measures summed per key
+        """
+        frames = [cube.data for cube in cubes]
+        data = pd.concat(frames, ignore_index=True)
+        for key in ('store_location', 'product_category', 'product_type'):
+            # Partial cubes can carry different category sets
+            if not isinstance(data[key].dtype, pd.CategoricalDtype):
+                data[key] = data[key].astype('category')
+        data = data.groupby(CUBE_KEYS, observed=True, sort=False, dropna=False)[CUBE_MEASURES].sum()
+        return cls(data.reset_index())
+
+    def rollup(self, by: Union[str, List[str]]) -> pd.DataFrame:
+        """Aggregate the cube to a coarser grain.
+
+        Besides the cube keys, 'day_of_week' and 'month' (a monthly period)
+        can be used; both are derived from transaction_date.
+
+        Args:
+            by (Union[str, List[str]]): Grouping key or keys
+
+        Returns:
+            pd.DataFrame: Summed measures indexed by the grouping keys
+        """
+        if isinstance(by, str):
+            by = [by]
+        keys = [self._key(name) for name in by]
+        return self.data.groupby(keys, observed=True)[CUBE_MEASURES].sum()
+
+    @staticmethod
+    def sales_by(df: Union[pd.DataFrame, 'SalesCube'], key: Optional[str] = None) -> Union[pd.Series, float]:
+        """Total sales per key, answered from the cube when one is given.
+
+        Args:
+            df (Union[pd.DataFrame, SalesCube]): Processed dataframe or cube
+            key (Optional[str]): Grouping column, None for the grand total
+
+        Returns:
+            Union[pd.Series, float]: Sales per key, or the total
+        """
+        data = df.data if isinstance(df, SalesCube) else df
+        if key is None:
+            return data['total_amount'].sum()
+        if isinstance(df, SalesCube):
+            return df.rollup(key)['total_amount']
+        return df.groupby(key, observed=True)['total_amount'].sum()
+
+    def _key(self, name: str) -> pd.Series:
+        dates = self.data['transaction_date']
+        if name == 'day_of_week':
+            codes = dates.dt.dayofweek.fillna(-1).astype('int8')
+            return pd.Series(pd.Categorical.from_codes(codes, categories=DAY_NAMES, ordered=True),
+                             index=self.data.index, name=name)
+        if name == 'month':
+            return dates.dt.to_period('M').rename(name)
+        return self.data[name]
+
+    def __len__(self) -> int:
+        return len(self.data)
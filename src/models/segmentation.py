@@ -0,0 +1,257 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Union
+
+FEATURE_COLUMNS = ['total_amount', 'transaction_qty', 'product_id']
+
+FeatureSource = Union[pd.DataFrame, Callable[[], Iterable[pd.DataFrame]]]
+
+def build_customer_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate processed transactions to one feature row per transaction_id.
+
+    Args:
+        df (pd.DataFrame): Processed dataframe
+
+    Returns:
+        pd.DataFrame: transaction_id with total amount, quantity and number of
+            distinct products
+    """
+    return df.groupby('transaction_id', observed=True).agg({
+        'total_amount': 'sum',
+        'transaction_qty': 'sum',
+        'product_id': 'nunique'
+    }).reset_index()
+
+def iter_customer_features(batches: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """Build customer features batch by batch from processed batches.
+
+    Batches cut at fixed row counts, like `DataLoader.iter_batches`, can
+    split a transaction. The lines of each batch's last transaction are held
+    back and prepended to the next batch, so every transaction is built from
+    all its lines, as long as those lines are contiguous (exports sorted by
+    transaction).
+
+    Args:
+        batches (Iterable[pd.DataFrame]): Processed data batches
+
+    Yields:
+        pd.DataFrame: Customer features of each batch
+    """
+    carried = None
+    for batch in batches:
+        if carried is not None and len(carried):
+            batch = pd.concat([carried, batch], ignore_index=True)
+        if len(batch) == 0:
+            continue
+        last = batch['transaction_id'].eq(batch['transaction_id'].iloc[-1]).to_numpy()
+        carried = batch[last]
+        if not last.all():
+            yield build_customer_features(batch[~last])
+    if carried is not None and len(carried):
+        yield build_customer_features(carried)
+
+class RunningStats:
+    def __init__(self, n_features: int):
+        """Single-pass mean and variance over streamed chunks.
+
+        Chunks are merged with the parallel update of Chan et al., which is
+        numerically stable and gives the same result as a two-pass computation.
+
+        Args:
+            n_features (int): Number of feature columns
+        """
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+
+    def update(self, values: np.ndarray):
+        """Fold a chunk of rows into the statistics.
+
+        Args:
+            values (np.ndarray): 2-D array of shape (rows, n_features)
+        """
+        n = len(values)
+        if n == 0:
+            return
+        chunk_mean = values.mean(axis=0)
+        chunk_m2 = ((values - chunk_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + chunk_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+    @property
+    def std(self) -> np.ndarray:
+        """Sample standard deviation (ddof=1, as pandas computes it)."""
+        if self.count < 2:
+            return np.zeros_like(self.mean)
+        return np.sqrt(self.m2 / (self.count - 1))
+
+class SegmentationModel:
+    def __init__(self, n_clusters: int = 3, batch_size: int = 10_000,
+                 init_sample_size: Optional[int] = None, n_passes: int = 1,
+                 random_state: int = 42):
+        """Customer segmentation that scales past memory with MiniBatchKMeans.
+
+        Fitting streams the feature chunks twice: once to accumulate the
+        normalization statistics and once (or `n_passes` times) to update the
+        clusters with `partial_fit`. The fitted model can be saved and used to
+        assign new transactions to segments without refitting.
+
+        Args:
+            n_clusters (int): Number of segments
+            batch_size (int): Rows per partial_fit step
+            init_sample_size (Optional[int]): When set, a reservoir sample of
+                this many rows is drawn during the statistics pass and used for
+                k-means++ initialization; otherwise the first batch is used
+            n_passes (int): Number of clustering passes over the data
+            random_state (int): Random seed
+        """
+        self.n_clusters = n_clusters
+        self.batch_size = batch_size
+        self.init_sample_size = init_sample_size
+        self.n_passes = n_passes
+        self.random_state = random_state
+        self.mean_ = None
+        self.scale_ = None
+        self.kmeans_ = None
+
+    @staticmethod
+    def _chunks(source: FeatureSource) -> Iterable[pd.DataFrame]:
+        if isinstance(source, pd.DataFrame):
+            return [source]
+        return source()
+
+    def fit(self, source: FeatureSource) -> 'SegmentationModel':
+        """Fit normalization and clusters on customer features.
+
+        Args:
+            source (FeatureSource): Feature table, or a callable returning a
+                fresh iterable of feature chunks (it is called once per pass)
+
+        Returns:
+            SegmentationModel: The fitted model
+        """
+        rng = np.random.default_rng(self.random_state)
+        stats = RunningStats(len(FEATURE_COLUMNS))
+        sample = None
+        for chunk in self._chunks(source):
+            values = chunk[FEATURE_COLUMNS].to_numpy(dtype='float64')
+            seen = stats.count
+            stats.update(values)
+            if self.init_sample_size:
+                sample = self._reservoir(sample, values, seen, rng)
+
+        self.mean_ = stats.mean
+        # Constant features would divide by zero; leave them unscaled
+        self.scale_ = np.where(stats.std > 0, stats.std, 1.0)
+
+        # sklearn is slow to import, so it is only loaded once a model is fitted
+        from sklearn.cluster import MiniBatchKMeans, kmeans_plusplus
+        init = 'k-means++'
+        if sample is not None and len(sample) >= self.n_clusters:
+            init, _ = kmeans_plusplus(self._normalize(sample), self.n_clusters,
+                                      random_state=self.random_state)
+        self.kmeans_ = MiniBatchKMeans(n_clusters=self.n_clusters, init=init, n_init=1,
+                                       batch_size=self.batch_size,
+                                       random_state=self.random_state)
+
+        pending = np.empty((0, len(FEATURE_COLUMNS)))
+        for _ in range(self.n_passes):
+            for chunk in self._chunks(source):
+                values = self._normalize(chunk[FEATURE_COLUMNS].to_numpy(dtype='float64'))
+                for start in range(0, len(values), self.batch_size):
+                    batch = values[start:start + self.batch_size]
+                    if not hasattr(self.kmeans_, 'cluster_centers_'):
+                        # The first step initializes the centers and needs at
+                        # least n_clusters rows
+                        pending = np.vstack([pending, batch])
+                        if len(pending) < self.n_clusters:
+                            continue
+                        batch, pending = pending, pending[:0]
+                    self.kmeans_.partial_fit(batch)
+        if not hasattr(self.kmeans_, 'cluster_centers_'):
+            raise ValueError(f"Need at least {self.n_clusters} rows to fit the segmentation")
+        return self
+
+    def _reservoir(self, sample: Optional[np.ndarray], values: np.ndarray,
+                   seen: int, rng: np.random.Generator) -> np.ndarray:
+        """Vectorized reservoir sampling (algorithm R) over one chunk."""
+        size = self.init_sample_size
+        if sample is None:
+            sample = np.empty((0, values.shape[1]))
+        fill = min(size - len(sample), len(values))
+        if fill > 0:
+            sample = np.vstack([sample, values[:fill]])
+        rest = values[fill:]
+        if len(rest):
+            positions = seen + fill + np.arange(len(rest))
+            slots = (rng.random(len(rest)) * (positions + 1)).astype('int64')
+            keep = slots < size
+            # Later rows overwrite earlier ones in the same slot, as in the
+            # sequential algorithm
+            sample[slots[keep]] = rest[keep]
+        return sample
+
+    def _normalize(self, values: np.ndarray) -> np.ndarray:
+        return (values - self.mean_) / self.scale_
+
+    def predict(self, features: pd.DataFrame) -> np.ndarray:
+        """Assign customer feature rows to segments.
+
+        Args:
+            features (pd.DataFrame): Customer features
+
+        Returns:
+            np.ndarray: Segment label per row
+        """
+        if self.kmeans_ is None:
+            raise ValueError("SegmentationModel is not fitted yet")
+        values = self._normalize(features[FEATURE_COLUMNS].to_numpy(dtype='float64'))
+        return self.kmeans_.predict(values)
+
+    def assign(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Build customer features from processed transactions and label them.
+
+        Args:
+            df (pd.DataFrame): Processed dataframe
+
+        Returns:
+            pd.DataFrame: Customer features with a 'segment' column
+        """
+        features = build_customer_features(df)
+        features['segment'] = self.predict(features)
+        return features
+
+    def save(self, path: str) -> Path:
+        """Save the fitted model.
+
+        Args:
+            path (str): Output file
+
+        Returns:
+            Path: Path of the saved model
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        import joblib
+        joblib.dump(self, path)
+        return path
+
+    @staticmethod
+    def load(path: str) -> 'SegmentationModel':
+        """Load a model saved with `save`.
+
+        Args:
+            path (str): Model file
+
+        Returns:
+            SegmentationModel: The fitted model
+        """
+        import joblib
+        model = joblib.load(path)
+        if not isinstance(model, SegmentationModel):
+            raise TypeError(f"{path} does not contain a SegmentationModel")
+        return model
@@ -0,0 +1,245 @@
+import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from src.data.data_loader import DataLoader
+from src.models.sales_analyzer import SalesAnalyzer
+
+# Raw columns the SQL queries read
+SQL_INPUTS = ['transaction_id', 'transaction_date', 'transaction_time', 'transaction_qty',
+              'unit_price', 'store_id', 'store_location', 'product_category', 'product_type']
+
+SQLSource = Union[str, Path, pd.DataFrame, pa.Table]
+
+class SQLBackend:
+    # SalesAnalyzer methods this backend answers
+    METHODS = ('analyze_sales_trends', 'analyze_product_performance', 'analyze_store_performance')
+
+    def __init__(self, engine: str = 'duckdb', threads: Optional[int] = None,
+                 memory_limit: Optional[str] = None, time_format: Optional[str] = None):
+        """Run the SalesAnalyzer metrics as SQL in an embedded DuckDB engine.
+
+        Sources are raw (unprocessed) Parquet or CSV files, glob patterns of
+        them, or raw frames/Arrow tables. The derived columns are computed in
+        the query, the engine scans files in parallel and spills to disk past
+        `memory_limit`, and only the aggregates come back to pandas, where the
+        same finishing steps as the pandas path produce identical results.
+        Excel workbooks are loaded through `DataLoader` first.
+
+        Args:
+            engine (str): SQL engine; only 'duckdb' is supported
+            threads (Optional[int]): Worker threads, DuckDB's default (all
+                cores) when None
+            memory_limit (Optional[str]): Engine memory limit, e.g. '2GB'
+            time_format (Optional[str]): strptime format of string
+                transaction times, used when they are not plain HH:MM:SS
+        """
+        if engine != 'duckdb':
+            raise ValueError(f"Unsupported SQL engine: '{engine}'")
+        config = {}
+        if threads is not None:
+            config['threads'] = threads
+        if memory_limit is not None:
+            config['memory_limit'] = memory_limit
+        self.engine = engine
+        self.time_format = time_format
+        self.connection = duckdb.connect(config=config)
+
+    def analyze_sales_trends(self, source: SQLSource) -> Dict:
+        """SQL version of `SalesAnalyzer.analyze_sales_trends`.
+
+        All breakdowns come from one scan with GROUPING SETS.
+
+        Args:
+            source (SQLSource): Raw data file, glob pattern, frame or table
+
+        Returns:
+            Dict: Dictionary containing sales trend analysis
+        """
+        self._register(source)
+        sums = self.connection.execute("""
+            SELECT GROUPING(transaction_date, hour, product_category, store_location) AS grouping_id,
+                   transaction_date, hour, product_category, store_location,
+                   COALESCE(SUM(total_amount), 0) AS total_amount
+            FROM sales
+            GROUP BY GROUPING SETS ((), (transaction_date), (hour), (product_category), (store_location))
+        """).df()
+        # GROUPING() sets the bit of every column a row is not grouped by
+        by_key = {'transaction_date': 0b0111, 'hour': 0b1011,
+                  'product_category': 0b1101, 'store_location': 0b1110}
+        sales = {}
+        for key, grouping_id in by_key.items():
+            rows = sums[(sums['grouping_id'] == grouping_id) & sums[key].notna()]
+            sales[key] = rows.set_index(key)['total_amount'].sort_index()
+        sales['hour'].index = sales['hour'].index.astype('int8')
+        daily = sales['transaction_date']
+        monthly = daily.groupby(daily.index.to_period('M')).sum()
+
+        return {
+            'total_sales': sums.loc[sums['grouping_id'] == 0b1111, 'total_amount'].iloc[0],
+            'avg_daily_sales': daily.mean(),
+            'peak_sales_hour': sales['hour'].idxmax(),
+            'best_performing_category': sales['product_category'].idxmax(),
+            'best_performing_store': sales['store_location'].idxmax(),
+            'sales_growth': SalesAnalyzer._growth_rate(monthly),
+        }
+
+    def analyze_product_performance(self, source: SQLSource) -> pd.DataFrame:
+        """SQL version of `SalesAnalyzer.analyze_product_performance`.
+
+        Args:
+            source (SQLSource): Raw data file, glob pattern, frame or table
+
+        Returns:
+            pd.DataFrame: Product performance metrics
+        """
+        self._register(source)
+        product_metrics = self._grouped(['product_category', 'product_type'],
+                                        ['transaction_qty', 'total_amount', 'transaction_id'])
+        return SalesAnalyzer._finish_product_metrics(product_metrics)
+
+    def analyze_store_performance(self, source: SQLSource) -> pd.DataFrame:
+        """SQL version of `SalesAnalyzer.analyze_store_performance`.
+
+        Args:
+            source (SQLSource): Raw data file, glob pattern, frame or table
+
+        Returns:
+            pd.DataFrame: Store performance metrics
+        """
+        self._register(source)
+        store_metrics = self._grouped(['store_id', 'store_location'],
+                                      ['transaction_id', 'total_amount', 'transaction_qty'])
+        return SalesAnalyzer._finish_store_metrics(store_metrics)
+
+    def _grouped(self, keys: List[str], measures: List[str]) -> pd.DataFrame:
+        """Sum the measures per key, in key order, with the pandas dtypes.
+
+        Keys get the dtypes `DataPreprocessor.optimize_dtypes` gives them
+        (categories, downcast integers and floats), so results compare equal
+        to the pandas path.
+        """
+        aggregates = {
+            'transaction_qty': self._qty_sum,
+            # A group whose amounts are all missing sums to 0, as in pandas
+            'total_amount': 'COALESCE(SUM(total_amount), 0) AS total_amount',
+            'transaction_id': 'COUNT(transaction_id) AS transaction_id',
+        }
+        key_list = ', '.join(keys)
+        not_null = ' AND '.join(f'{key} IS NOT NULL' for key in keys)
+        result = self.connection.execute(f"""
+            SELECT {key_list}, {', '.join(aggregates[m] for m in measures)}
+            FROM sales WHERE {not_null}
+            GROUP BY {key_list} ORDER BY {key_list}
+        """).df()
+        for key in keys:
+            if pd.api.types.is_integer_dtype(result[key]):
+                result[key] = pd.to_numeric(result[key], downcast='integer')
+            elif pd.api.types.is_float_dtype(result[key]):
+                # Integer columns with missing values come back as DOUBLE;
+                # float32 when lossless, like optimize_dtypes
+                downcast = result[key].astype('float32')
+                if np.array_equal(downcast.to_numpy(dtype='float64'), result[key].to_numpy()):
+                    result[key] = downcast
+            elif key in self._categories:
+                # Keep the source's category order, which pandas groups by
+                known = self._categories[key]
+                extra = sorted(set(result[key]) - set(known))
+                # DuckDB returns ENUM columns of frame sources as ordered
+                result[key] = pd.Categorical(result[key], categories=list(known) + extra, ordered=False)
+            elif pd.api.types.is_string_dtype(result[key]):
+                result[key] = result[key].astype(str).astype('category')
+        return result.sort_values(keys, kind='stable', ignore_index=True)
+
+    def _register(self, source: SQLSource):
+        """Expose the source as the `sales` view with the derived columns."""
+        if isinstance(source, (str, Path)) and DataLoader.infer_format(source) == 'excel':
+            source = DataLoader(source).load_data(columns=SQL_INPUTS)
+        self._categories = self._source_categories(source)
+        if isinstance(source, (pd.DataFrame, pa.Table)):
+            self.connection.register('raw_sales', source)
+            relation = 'raw_sales'
+        else:
+            path = str(source).replace("'", "''")
+            file_format = DataLoader.infer_format(source)
+            if file_format == 'parquet':
+                relation = f"read_parquet('{path}')"
+            elif file_format == 'csv':
+                relation = f"read_csv_auto('{path}')"
+            else:
+                raise ValueError(f"Unsupported data file type: {source}")
+
+        types = dict(self.connection.execute(
+            f"SELECT column_name, column_type FROM (DESCRIBE SELECT * FROM {relation})").fetchall())
+        qty_type = types['transaction_qty']
+        self._qty_sum = ('SUM(transaction_qty)::BIGINT AS transaction_qty'
+                         if qty_type in ('TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'UTINYINT',
+                                         'USMALLINT', 'UINTEGER')
+                         else 'SUM(transaction_qty) AS transaction_qty')
+        self.connection.execute(f"""
+            CREATE OR REPLACE TEMP VIEW sales AS
+            SELECT transaction_id, transaction_qty, store_id, store_location,
+                   product_category, product_type,
+                   transaction_qty * unit_price AS total_amount,
+                   CAST(transaction_date AS DATE) AS transaction_date,
+                   {self._hour_expression(types['transaction_time'], source)} AS hour
+            FROM {relation}
+        """)
+
+    def _hour_expression(self, column_type: str, source: SQLSource) -> str:
+        """SQL expression of the hour of day for the stored time type."""
+        if column_type == 'VARCHAR':
+            if self.time_format:
+                time_format = self.time_format.replace("'", "''")
+                return f"hour(strptime(transaction_time, '{time_format}'))"
+            return 'hour(CAST(transaction_time AS TIME))'
+        if column_type in ('BIGINT', 'INTEGER'):
+            # pandas timedeltas are stored in Parquet as integer durations;
+            # the unit is only recorded in the Arrow schema
+            unit = self._duration_unit(source)
+            per_hour = {'s': 3600, 'ms': 3600 * 10 ** 3, 'us': 3600 * 10 ** 6, 'ns': 3600 * 10 ** 9}[unit]
+            return f'(transaction_time // {per_hour})'
+        return 'hour(transaction_time)'
+
+    @staticmethod
+    def _parquet_file(source: SQLSource) -> Optional[Path]:
+        """The (first) Parquet file of a path or glob pattern, if any."""
+        if not isinstance(source, (str, Path)) or DataLoader.infer_format(source) != 'parquet':
+            return None
+        if any(char in str(source) for char in '*?['):
+            source = Path(source)
+            return next(iter(sorted(source.parent.glob(source.name))), None)
+        return Path(source)
+
+    @staticmethod
+    def _source_categories(source: SQLSource) -> Dict[str, pd.Index]:
+        """Categories of the categorical key columns pandas would load."""
+        if isinstance(source, pa.Table):
+            source = source.slice(0, 0).to_pandas()
+        if isinstance(source, pd.DataFrame):
+            return {column: source[column].cat.categories for column in source.columns
+                    if isinstance(source[column].dtype, pd.CategoricalDtype)}
+        path = SQLBackend._parquet_file(source)
+        if path is None:
+            return {}
+        parquet_file = pq.ParquetFile(path)
+        columns = [field.name for field in parquet_file.schema_arrow
+                   if pa.types.is_dictionary(field.type)]
+        if not columns or parquet_file.num_row_groups == 0:
+            return {}
+        # Frames written by pandas carry the full category list in every row group
+        first = parquet_file.read_row_group(0, columns=columns).to_pandas()
+        return {column: first[column].cat.categories for column in columns}
+
+    @staticmethod
+    def _duration_unit(source: SQLSource) -> str:
+        path = SQLBackend._parquet_file(source)
+        if path is not None:
+            field = pq.read_schema(path).field('transaction_time')
+            if pa.types.is_duration(field.type):
+                return field.type.unit
+        raise ValueError("Integer transaction_time needs a Parquet duration column to know its unit")
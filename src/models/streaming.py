@@ -0,0 +1,220 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Optional
+
+from src.utils.sketches import CountMinSketch, SpaceSaving, hash_values
+
+# Raw columns a stream needs, and the derived ones preprocessing must add
+STREAM_INPUTS = ['transaction_id', 'transaction_date', 'transaction_time', 'transaction_qty',
+                 'unit_price', 'store_id', 'store_location', 'product_category', 'product_type']
+STREAM_DERIVED = ['datetime', 'total_amount', 'hour']
+
+PRODUCT_KEYS = ['product_category', 'product_type']
+STORE_KEYS = ['store_id', 'store_location']
+
+class StreamingSalesAnalyzer:
+    def __init__(self, capacity: int = 64, width: int = 2048, depth: int = 5, seed: int = 0):
+        """Sales analysis over batches in constant memory.
+
+        Every batch is folded into fixed-size accumulators: running totals,
+        a 24-bin hour histogram, per-day and per-month totals (one number per
+        calendar day or month), Space-Saving top-k summaries of sales by
+        category, product and store, and Count-Min sketches of their
+        quantities and line counts. Only these are kept, so the input never
+        has to fit in a data frame. Analyzers fitted on separate parts of the
+        data can be merged.
+
+        Args:
+            capacity (int): Keys monitored by each top-k summary; results are
+                exact while a key column has at most this many values
+            width (int): Counters per Count-Min row
+            depth (int): Count-Min rows
+            seed (int): Seed of the Count-Min hash functions
+        """
+        self.capacity = capacity
+        self.width = width
+        self.depth = depth
+        self.seed = seed
+        self.n_rows = 0
+        self.total_sales = 0.0
+        self.hour_sales = np.zeros(24)
+        self.daily_sales = pd.Series(dtype='float64')
+        self.monthly_sales = pd.Series(dtype='float64')
+        self.categories = SpaceSaving('product_category', capacity)
+        self.products = SpaceSaving(PRODUCT_KEYS, capacity)
+        self.stores = SpaceSaving(STORE_KEYS, capacity)
+        self.sketches = {
+            (entity, measure): CountMinSketch(width, depth, seed)
+            for entity in ('product', 'store') for measure in ('transaction_qty', 'lines')
+        }
+
+    def update(self, df: pd.DataFrame) -> 'StreamingSalesAnalyzer':
+        """Fold one processed batch into the accumulators.
+
+        Args:
+            df (pd.DataFrame): Processed batch with STREAM_INPUTS and
+                STREAM_DERIVED columns
+
+        Returns:
+            StreamingSalesAnalyzer: The analyzer itself
+        """
+        amount = df['total_amount'].to_numpy(dtype='float64')
+        valid = ~np.isnan(amount)
+        amount = np.where(valid, amount, 0.0)
+        self.n_rows += len(df)
+        self.total_sales += float(amount.sum())
+
+        hours = df['hour'].to_numpy(dtype='float64')
+        has_hour = ~np.isnan(hours)
+        self.hour_sales += np.bincount(hours[has_hour].astype('int64'),
+                                       weights=amount[has_hour], minlength=24)
+
+        days = pd.to_datetime(df['transaction_date']).to_numpy().astype('datetime64[D]')
+        has_day = ~np.isnat(days)
+        daily = pd.Series(amount[has_day]).groupby(days[has_day]).sum()
+        monthly = daily.groupby(daily.index.to_numpy().astype('datetime64[M]')).sum()
+        self.daily_sales = self.daily_sales.add(daily, fill_value=0)
+        self.monthly_sales = self.monthly_sales.add(monthly, fill_value=0)
+
+        # Sum the measures per product and store first, so the summaries and
+        # sketches are updated with one row per key instead of per line
+        measures = pd.DataFrame({
+            'total_amount': amount,
+            'transaction_qty': df['transaction_qty'].to_numpy(dtype='float64'),
+            'lines': df['transaction_id'].notna().to_numpy(dtype='float64'),
+        }, index=df.index)
+        for entity, keys, summary in (('product', PRODUCT_KEYS, self.products),
+                                      ('store', STORE_KEYS, self.stores)):
+            totals = pd.concat([df[keys], measures], axis=1).groupby(
+                keys, observed=True, sort=False).sum().reset_index()
+            summary.update(totals, 'total_amount')
+            hashes = hash_values(totals[keys])
+            self.sketches[(entity, 'transaction_qty')].update_hashes(hashes, totals['transaction_qty'])
+            self.sketches[(entity, 'lines')].update_hashes(hashes, totals['lines'])
+            if entity == 'product':
+                self.categories.update(totals, 'total_amount')
+        return self
+
+    def fit(self, batches: Iterable[pd.DataFrame]) -> 'StreamingSalesAnalyzer':
+        """Consume a stream of processed batches.
+
+        Args:
+            batches (Iterable[pd.DataFrame]): Processed batches, e.g. from
+                `DataPreprocessor.preprocess_batches`
+
+        Returns:
+            StreamingSalesAnalyzer: The analyzer itself
+        """
+        for batch in batches:
+            self.update(batch)
+        return self
+
+    def merge(self, other: 'StreamingSalesAnalyzer') -> 'StreamingSalesAnalyzer':
+        """Fold in an analyzer fitted on other batches.
+
+        Args:
+            other (StreamingSalesAnalyzer): Analyzer with the same settings
+
+        Returns:
+            StreamingSalesAnalyzer: The analyzer itself
+        """
+        self.n_rows += other.n_rows
+        self.total_sales += other.total_sales
+        self.hour_sales += other.hour_sales
+        self.daily_sales = self.daily_sales.add(other.daily_sales, fill_value=0)
+        self.monthly_sales = self.monthly_sales.add(other.monthly_sales, fill_value=0)
+        self.categories.merge(other.categories)
+        self.products.merge(other.products)
+        self.stores.merge(other.stores)
+        for key, sketch in self.sketches.items():
+            sketch.merge(other.sketches[key])
+        return self
+
+    def sales_trends(self) -> Dict:
+        """The answers of `SalesAnalyzer.analyze_sales_trends`.
+
+        Totals, the peak hour and the growth rate are exact. The best
+        category and store come from the top-k summaries; see
+        `error_bounds` for when they are certain.
+
+        Returns:
+            Dict: Dictionary containing sales trend analysis
+        """
+        if self.n_rows == 0:
+            raise ValueError("StreamingSalesAnalyzer has not seen any rows yet")
+        monthly = self.monthly_sales.sort_index()
+        growth = 0.0
+        if len(monthly) > 1:
+            growth = (monthly.iloc[-1] - monthly.iloc[0]) / monthly.iloc[0] * 100
+        return {
+            'total_sales': self.total_sales,
+            'avg_daily_sales': self.daily_sales.mean(),
+            'peak_sales_hour': int(np.argmax(self.hour_sales)),
+            'best_performing_category': self.categories.top(1)['product_category'].iloc[0],
+            'best_performing_store': self.stores.top(1)['store_location'].iloc[0],
+            'sales_growth': growth,
+        }
+
+    def product_performance(self, n: Optional[int] = 5) -> pd.DataFrame:
+        """Top products with the columns of `analyze_product_performance`.
+
+        Args:
+            n (Optional[int]): Number of products, every monitored one when None
+
+        Returns:
+            pd.DataFrame: Top products by sales with their estimates and the
+                'sales_error' and 'guaranteed' columns of `SpaceSaving.top`
+        """
+        return self._performance(self.products, 'product', n)
+
+    def store_performance(self, n: Optional[int] = None) -> pd.DataFrame:
+        """Top stores with the columns of `analyze_store_performance`.
+
+        Args:
+            n (Optional[int]): Number of stores, every monitored one when None
+
+        Returns:
+            pd.DataFrame: Top stores by sales, as `product_performance`
+        """
+        return self._performance(self.stores, 'store', n)
+
+    def _performance(self, summary: SpaceSaving, entity: str, n: Optional[int]) -> pd.DataFrame:
+        top = summary.top(n)
+        keys = top[summary.keys]
+        result = keys.assign(
+            transaction_qty=self.sketches[(entity, 'transaction_qty')].estimate(keys),
+            total_amount=top['count'],
+            transaction_id=self.sketches[(entity, 'lines')].estimate(keys),
+        )
+        if entity == 'product':
+            result['avg_price'] = result['total_amount'] / result['transaction_qty']
+        else:
+            result['avg_transaction_value'] = result['total_amount'] / result['transaction_id']
+        result['sales_share'] = result['total_amount'] / self.total_sales
+        result['sales_error'] = top['error']
+        result['guaranteed'] = top['guaranteed']
+        return result
+
+    def error_bounds(self) -> Dict[str, float]:
+        """Worst-case errors of the approximate answers.
+
+        Sales of a reported category, product or store overestimate the
+        truth by at most its 'sales_error', itself at most total sales /
+        capacity. Quantities and line counts overestimate by at most the
+        Count-Min bound, with the stated confidence.
+
+        Returns:
+            Dict[str, float]: Bounds per summary and sketch
+        """
+        bounds = {
+            'category_sales': self.categories.error_bound(),
+            'product_sales': self.products.error_bound(),
+            'store_sales': self.stores.error_bound(),
+            'best_category_certain': bool(self.categories.top(1)['guaranteed'].iloc[0]),
+            'best_store_certain': bool(self.stores.top(1)['guaranteed'].iloc[0]),
+        }
+        for (entity, measure), sketch in self.sketches.items():
+            bound = sketch.error_bound()
+            bounds[f'{entity}_{measure}'] = bound['max_overestimate']
+            bounds['count_min_confidence'] = bound['confidence']
+        return bounds
@@ -0,0 +1,157 @@
+import pandas as pd
+from typing import Dict, List, Optional, Union
+
+from src.data.data_loader import DataLoader
+from src.preprocessing.preprocessor import DataPreprocessor, DERIVED_COLUMNS, DERIVED_INPUTS
+from src.features.feature_engineering import FeatureEngineer, FEATURE_INPUTS
+from src.models.sales_analyzer import SalesAnalyzer
+from src.models.sales_cube import SalesCube, CUBE_KEYS
+
+# Source and derived columns `load_cube` builds the sales cube from
+CUBE_INPUTS = CUBE_KEYS + ['total_amount', 'transaction_qty', 'transaction_id']
+
+class LazyPipeline:
+    def __init__(self, source: Union[str, DataLoader, pd.DataFrame],
+                 time_format: Optional[str] = None, optimize: bool = True):
+        """Lazily composed load -> preprocess -> features -> analysis pipeline.
+
+        Calls such as `analyze_sales_trends()` or `select()` only record what
+        is wanted. `collect()` then works out which derived columns those
+        outputs depend on, loads only the source columns they need and
+        computes only the required preprocessing and feature columns.
+
+        Args:
+            source (Union[str, DataLoader, pd.DataFrame]): Data file path, a
+                configured loader, or an already loaded raw frame
+            time_format (Optional[str]): strftime format of string
+                transaction times
+            optimize (bool): Compact the dtypes of the loaded columns
+        """
+        self.source = source
+        self.time_format = time_format
+        self.optimize = optimize
+        self._analyses: Dict[str, Dict] = {}
+        self._selected: List[str] = []
+
+    def analyze_sales_trends(self) -> 'LazyPipeline':
+        """Request `SalesAnalyzer.analyze_sales_trends`."""
+        return self._add('analyze_sales_trends')
+
+    def analyze_product_performance(self) -> 'LazyPipeline':
+        """Request `SalesAnalyzer.analyze_product_performance`."""
+        return self._add('analyze_product_performance')
+
+    def analyze_store_performance(self) -> 'LazyPipeline':
+        """Request `SalesAnalyzer.analyze_store_performance`."""
+        return self._add('analyze_store_performance')
+
+    def segment_customers(self, n_clusters: int = 3) -> 'LazyPipeline':
+        """Request `SalesAnalyzer.segment_customers`."""
+        return self._add('segment_customers', n_clusters=n_clusters)
+
+    def segment_customers_scalable(self, n_clusters: int = 3, batch_size: int = 10_000,
+                                   init_sample_size: Optional[int] = None) -> 'LazyPipeline':
+        """Request `SalesAnalyzer.segment_customers_scalable`."""
+        return self._add('segment_customers_scalable', n_clusters=n_clusters,
+                         batch_size=batch_size, init_sample_size=init_sample_size)
+
+    def select(self, *columns: str) -> 'LazyPipeline':
+        """Request source, preprocessed or feature columns in the output frame.
+
+        Args:
+            *columns (str): Column names
+
+        Returns:
+            LazyPipeline: The pipeline itself, for chaining
+        """
+        self._selected.extend(column for column in columns if column not in self._selected)
+        return self
+
+    def _add(self, name: str, **kwargs) -> 'LazyPipeline':
+        # Requesting an analysis again replaces its arguments
+        self._analyses[name] = kwargs
+        return self
+
+    def plan(self) -> Dict[str, List[str]]:
+        """Resolve the columns each stage has to produce.
+
+        Returns:
+            Dict[str, List[str]]: 'load' (source columns to read),
+                'preprocess' and 'features' (derived columns to compute),
+                'skipped_features' (pruned feature columns) and 'outputs'
+        """
+        pending = list(self._selected)
+        for name in self._analyses:
+            pending.extend(getattr(SalesAnalyzer, name).input_columns)
+
+        needed = set()
+        while pending:
+            column = pending.pop()
+            if column in needed:
+                continue
+            needed.add(column)
+            pending.extend(FEATURE_INPUTS.get(column, DERIVED_INPUTS.get(column, [])))
+
+        derived = set(DERIVED_INPUTS) | set(FEATURE_INPUTS)
+        return {
+            'load': sorted(needed - derived),
+            'preprocess': [column for column in DERIVED_COLUMNS if column in needed],
+            'features': [column for column in FEATURE_INPUTS if column in needed],
+            'skipped_features': [column for column in FEATURE_INPUTS if column not in needed],
+            'outputs': list(self._analyses) + (['frame'] if self._selected else []),
+        }
+
+    def explain(self) -> str:
+        """Describe the resolved plan, one stage per line.
+
+        Returns:
+            str: Human-readable plan
+        """
+        plan = self.plan()
+        lines = [f"{stage}: {', '.join(columns) if columns else '-'}"
+                 for stage, columns in plan.items()]
+        return '\n'.join(lines)
+
+    def collect(self) -> Dict[str, object]:
+        """Run the pruned pipeline.
+
+        Returns:
+            Dict[str, object]: Result of every requested analysis keyed by
+                method name, plus the selected columns under 'frame'
+        """
+        plan = self.plan()
+        if not plan['outputs']:
+            return {}
+
+        if isinstance(self.source, pd.DataFrame):
+            df = self.source[plan['load']]
+        else:
+            loader = self.source if isinstance(self.source, DataLoader) else DataLoader(self.source)
+            df = loader.load_data(columns=plan['load'])
+
+        df = DataPreprocessor.preprocess_data(df, time_format=self.time_format,
+                                              optimize=self.optimize,
+                                              columns=plan['preprocess'])
+        if plan['features']:
+            df = FeatureEngineer.create_features(df, inplace=True, columns=plan['features'])
+
+        results = {name: getattr(SalesAnalyzer, name)(df, **kwargs)
+                   for name, kwargs in self._analyses.items()}
+        if self._selected:
+            results['frame'] = df[self._selected]
+        return results
+
+def load_cube(source: Union[str, DataLoader, pd.DataFrame],
+              time_format: Optional[str] = None) -> SalesCube:
+    """Load only the columns the sales cube needs and aggregate them.
+
+    Args:
+        source (Union[str, DataLoader, pd.DataFrame]): Data file path, a
+            configured loader, or an already loaded raw frame
+        time_format (Optional[str]): strftime format of string transaction times
+
+    Returns:
+        SalesCube: Aggregated cube
+    """
+    frame = LazyPipeline(source, time_format=time_format).select(*CUBE_INPUTS).collect()['frame']
+    return SalesCube.from_transactions(frame)
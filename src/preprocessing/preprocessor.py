@@ -1,60 +1,362 @@
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, time, timedelta
+from typing import Iterable, Iterator, List, Optional, Union
+
+from src.utils.sketches import HyperLogLog
+
+# Resolution the string-based datetime parser produces (ns on pandas 1.x/2.x,
+# us on pandas 3.x). The numeric path casts to it so its output is identical.
+_PARSED_DATETIME_DTYPE = pd.to_datetime(pd.Index(['2000-01-01 00:00:00'])).dtype
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+
+# Columns preprocess_data derives, and the columns each is computed from
+DERIVED_INPUTS = {
+    'datetime': ['transaction_date', 'transaction_time'],
+    'total_amount': ['transaction_qty', 'unit_price'],
+    'hour': ['datetime'],
+    'day_of_week': ['datetime'],
+    'month': ['datetime'],
+    'time_period': ['hour'],
+}
+DERIVED_COLUMNS = list(DERIVED_INPUTS)
 
 class DataPreprocessor:
     @staticmethod
-    def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
+    def preprocess_data(df: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+                        time_format: Optional[str] = None,
+                        optimize: bool = True,
+                        columns: Optional[Iterable[str]] = None
+                        ) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
         """Preprocess the coffee shop sales data.
         
         Args:
-            df (pd.DataFrame): Raw data frame
+            df (Union[pd.DataFrame, Iterable[pd.DataFrame]]): Raw data frame, or
+                an iterable of raw batches such as `DataLoader.iter_batches()`
+            time_format (Optional[str]): strftime format of string
+                transaction times, used when they are not plain HH:MM:SS
+            optimize (bool): Apply `optimize_dtypes` to the raw columns
+            columns (Optional[Iterable[str]]): Derived columns to compute,
+                all of DERIVED_COLUMNS by default; the columns they are
+                computed from must be included
             
         Returns:
-            pd.DataFrame: Preprocessed data frame
+            Union[pd.DataFrame, Iterator[pd.DataFrame]]: Preprocessed data
+                frame, or a lazy iterator of preprocessed batches when given
+                batches
         """
-        df = df.copy()
+        if not isinstance(df, pd.DataFrame):
+            return DataPreprocessor.preprocess_batches(df, time_format=time_format,
+                                                       optimize=optimize, columns=columns)
         
-        # Convert transaction_time to proper time format if it's not already
-        if isinstance(df['transaction_time'].iloc[0], str):
-            df['transaction_time'] = pd.to_datetime(df['transaction_time']).dt.time
+        wanted = set(DERIVED_COLUMNS if columns is None else columns)
+        df = df.copy()
         
-        # Combine date and time into datetime
-        df['datetime'] = pd.to_datetime(
-            df['transaction_date'].astype(str) + ' ' + 
-            df['transaction_time'].astype(str)
-        )
+        # Combine date and time into datetime numerically (date + time offset)
+        if 'datetime' in wanted:
+            offsets, time_values = DataPreprocessor._time_offsets(df['transaction_time'], time_format)
+            if time_values is not None:
+                # Convert string transaction_time to proper time format
+                df['transaction_time'] = time_values
+            df['datetime'] = DataPreprocessor._combine_date_time(df['transaction_date'], offsets)
         
         # Calculate total amount per transaction
-        df['total_amount'] = df['transaction_qty'] * df['unit_price']
+        if 'total_amount' in wanted:
+            df['total_amount'] = df['transaction_qty'] * df['unit_price']
         
-        # Extract time-based features
-        df['hour'] = df['datetime'].dt.hour
-        df['day_of_week'] = df['datetime'].dt.day_name()
-        df['month'] = df['datetime'].dt.month_name()
+        # Extract time-based features; names are stored as categoricals with a
+        # fixed calendar order so batches share the same categories
+        if 'hour' in wanted:
+            # Rows without a datetime keep a NaN hour, so the column is only
+            # int8 when every row has one (float32 otherwise)
+            hour = df['datetime'].dt.hour
+            df['hour'] = hour.astype('int8' if hour.notna().all() else 'float32')
+        if 'day_of_week' in wanted:
+            df['day_of_week'] = pd.Categorical.from_codes(
+                df['datetime'].dt.dayofweek.fillna(-1).astype('int8'),
+                categories=DAY_NAMES, ordered=True)
+        if 'month' in wanted:
+            df['month'] = pd.Categorical.from_codes(
+                (df['datetime'].dt.month.fillna(0) - 1).astype('int8'),
+                categories=MONTH_NAMES, ordered=True)
         
         # Create time periods
-        df['time_period'] = pd.cut(df['hour'],
-                                 bins=[0, 11, 14, 17, 24],
-                                 labels=['Morning', 'Lunch', 'Afternoon', 'Evening'])
+        if 'time_period' in wanted:
+            df['time_period'] = pd.cut(df['hour'],
+                                     bins=[0, 11, 14, 17, 24],
+                                     labels=['Morning', 'Lunch', 'Afternoon', 'Evening'])
+        
+        if optimize:
+            df = DataPreprocessor.optimize_dtypes(df)
         
         return df
+    
+    @staticmethod
+    def optimize_dtypes(df: pd.DataFrame, categorical_threshold: float = 0.5,
+                        verbose: bool = False) -> pd.DataFrame:
+        """Convert columns to compact dtypes.
+        
+        Low-cardinality string columns become categoricals and integer columns
+        are downcast to the smallest type that holds their range. Float columns
+        are only downcast to float32 when that is lossless, so aggregated sales
+        figures do not change.
         
+        Args:
+            df (pd.DataFrame): Input data frame
+            categorical_threshold (float): Maximum ratio of distinct values to
+                rows for a string column to become categorical
+            verbose (bool): Print memory usage before and after
+            
+        Returns:
+            pd.DataFrame: Data frame with compact dtypes
+        """
+        before = df.memory_usage(deep=True).sum() if verbose else None
+        df = df.copy()
+        
+        for col in df.columns:
+            series = df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                continue
+            if pd.api.types.is_bool_dtype(series):
+                df[col] = series.astype('int8')
+            elif pd.api.types.is_integer_dtype(series):
+                df[col] = pd.to_numeric(series, downcast='integer')
+            elif pd.api.types.is_float_dtype(series):
+                downcast = series.astype('float32')
+                if np.array_equal(downcast.to_numpy(dtype='float64'), series.to_numpy(), equal_nan=True):
+                    df[col] = downcast
+            elif (len(series) > 0
+                  and pd.api.types.infer_dtype(series, skipna=True) == 'string'
+                  and series.nunique() <= categorical_threshold * len(series)):
+                df[col] = series.astype('category')
+        
+        if verbose:
+            after = df.memory_usage(deep=True).sum()
+            print(f"Memory usage: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB "
+                  f"({1 - after / before:.0%} smaller)")
+        return df
+    
     @staticmethod
-    def check_data_quality(df: pd.DataFrame) -> dict:
+    def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+        """Compare per-column memory usage of two versions of a frame.
+        
+        Args:
+            before (pd.DataFrame): Frame before optimization
+            after (pd.DataFrame): Frame after optimization
+            
+        Returns:
+            pd.DataFrame: Bytes per column before and after, with dtypes
+        """
+        report = pd.DataFrame({
+            'dtype_before': before.dtypes.astype(str),
+            'bytes_before': before.memory_usage(deep=True, index=False),
+            'dtype_after': after.dtypes.astype(str),
+            'bytes_after': after.memory_usage(deep=True, index=False),
+        })
+        report.loc['total'] = ['', report['bytes_before'].sum(), '', report['bytes_after'].sum()]
+        return report
+    
+    @staticmethod
+    def _time_offsets(times: pd.Series, time_format: Optional[str] = None):
+        """Convert transaction times to offsets from midnight.
+        
+        Object and string columns are factorized first, so only the distinct
+        values (at most one per second of the day) are converted in Python and
+        the result is broadcast back with the integer codes.
+        
+        Args:
+            times (pd.Series): Times as strings, `datetime.time`, timedeltas or
+                datetimes, possibly mixed in one object column
+            time_format (Optional[str]): Explicit strftime format for strings
+            
+        Returns:
+            Tuple[pd.Series, Optional[np.ndarray]]: Offsets as timedelta64, and
+                the times as `datetime.time` objects when the input held any
+                strings (None otherwise)
+        """
+        if pd.api.types.is_timedelta64_dtype(times):
+            return times, None
+        if pd.api.types.is_datetime64_any_dtype(times):
+            return times - times.dt.normalize(), None
+        
+        codes, uniques = pd.factorize(times)
+        values = list(uniques)
+        # Type every distinct value rather than the column by its first value,
+        # so columns mixing strings, times and timedeltas convert correctly
+        unique_offsets = np.full(len(values), np.timedelta64('NaT', 'ns'))
+        is_string = np.zeros(len(values), dtype=bool)
+        for i, v in enumerate(values):
+            if isinstance(v, datetime):
+                unique_offsets[i] = np.timedelta64(v - datetime.combine(v.date(), time(), v.tzinfo), 'ns')
+            elif isinstance(v, time):
+                unique_offsets[i] = np.timedelta64(timedelta(hours=v.hour, minutes=v.minute, seconds=v.second,
+                                                             microseconds=v.microsecond), 'ns')
+            elif isinstance(v, timedelta):
+                unique_offsets[i] = pd.Timedelta(v).to_timedelta64()
+            else:
+                is_string[i] = True
+        
+        time_values = None
+        if is_string.any():
+            strings = pd.Index(uniques[is_string]).astype(str)
+            parsed_offsets = None
+            if time_format is None:
+                try:
+                    parsed_offsets = pd.to_timedelta(strings)
+                except ValueError:
+                    pass
+            if parsed_offsets is None:
+                # Explicit-format (or format-inferring) fallback
+                parsed = pd.to_datetime(strings, format=time_format or 'mixed')
+                parsed_offsets = parsed - parsed.normalize()
+            unique_offsets[is_string] = parsed_offsets.to_numpy()
+            
+            # String times are converted to `datetime.time`, and so is every
+            # other value of a column holding any strings
+            unique_times = np.empty(len(values) + 1, dtype=object)
+            unique_times[:-1] = (pd.Timestamp(0) + pd.to_timedelta(unique_offsets)).time
+            unique_times[-1] = None
+            # Missing values have code -1 and pick the trailing None
+            time_values = unique_times[codes]
+        
+        unique_offsets = np.append(unique_offsets, np.timedelta64('NaT'))
+        offsets = pd.Series(unique_offsets[codes], index=times.index)
+        return offsets, time_values
+    
+    @staticmethod
+    def _combine_date_time(dates: pd.Series, offsets: pd.Series) -> pd.Series:
+        """Add time-of-day offsets to transaction dates.
+        
+        Args:
+            dates (pd.Series): Transaction dates (datetime64, date objects or
+                strings)
+            offsets (pd.Series): Offsets from midnight as timedelta64
+            
+        Returns:
+            pd.Series: Combined datetimes
+        """
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            codes, uniques = pd.factorize(dates)
+            unique_dates = np.append(pd.to_datetime(uniques).to_numpy(), np.datetime64('NaT'))
+            dates = pd.Series(unique_dates[codes], index=dates.index)
+        combined = dates.dt.normalize() + offsets
+        return combined.astype(_PARSED_DATETIME_DTYPE)
+    
+    @staticmethod
+    def preprocess_batches(batches: Iterable[pd.DataFrame],
+                           time_format: Optional[str] = None,
+                           optimize: bool = True,
+                           columns: Optional[Iterable[str]] = None) -> Iterator[pd.DataFrame]:
+        """Preprocess a stream of raw batches one batch at a time.
+        
+        Every step of `preprocess_data` is row-local, so processing batches
+        independently gives the same rows as processing the whole data set,
+        while only one batch is held in memory at a time.
+        
+        Args:
+            batches (Iterable[pd.DataFrame]): Raw data batches
+            time_format (Optional[str]): strftime format of string
+                transaction times
+            optimize (bool): Apply `optimize_dtypes` to each batch
+            columns (Optional[Iterable[str]]): Derived columns to compute
+            
+        Yields:
+            pd.DataFrame: Preprocessed batch
+        """
+        for batch in batches:
+            yield DataPreprocessor.preprocess_data(batch, time_format=time_format,
+                                                   optimize=optimize, columns=columns)
+        
+    @staticmethod
+    def check_data_quality(df: pd.DataFrame,
+                           duplicate_subset: Optional[List[str]] = None,
+                           row_hash_column: Optional[str] = None,
+                           approximate: bool = False,
+                           precision: int = 14) -> dict:
         """Check data quality and return summary statistics.
         
+        Every column is scanned once: a single factorize yields its missing
+        count, its distinct count and the codes used for duplicate detection.
+        Duplicates are checked on the source columns only, since the derived
+        columns are functions of them, which gives the same count as
+        `df.duplicated()` on a preprocessed frame.
+        
         Args:
             df (pd.DataFrame): Input data frame
+            duplicate_subset (Optional[List[str]]): Columns identifying a
+                duplicate row, all non-derived columns by default; KeyError if
+                one is not in the frame
+            row_hash_column (Optional[str]): Column holding a precomputed row
+                hash; duplicates are counted on it instead of on the subset
+            approximate (bool): Estimate distinct counts with HyperLogLog and
+                detect duplicates on 64-bit row hashes instead of exact codes
+            precision (int): HyperLogLog precision in approximate mode
             
         Returns:
             dict: Data quality metrics
         """
+        distinct_columns = {'store_id': 'unique_stores', 'product_id': 'unique_products'}
+        if row_hash_column is not None:
+            subset = []
+        elif duplicate_subset is not None:
+            subset = list(duplicate_subset)
+            unknown = [column for column in subset if column not in df.columns]
+            if unknown:
+                # As DataFrame.duplicated(subset=...) does
+                raise KeyError(pd.Index(unknown))
+        else:
+            subset = [column for column in df.columns if column not in DERIVED_COLUMNS]
+        exact_duplicates = row_hash_column is None and not approximate
+        
+        missing_values = {}
+        distinct_counts = {}
+        row_codes = np.zeros(len(df), dtype='int64')
+        n_row_codes = 1
+        for column in df.columns:
+            values = df[column]
+            wants_distinct = column in distinct_columns
+            wants_codes = (exact_duplicates and column in subset) or (wants_distinct and not approximate)
+            if not wants_codes:
+                missing_values[column] = int(values.isna().sum())
+                if wants_distinct:
+                    distinct_counts[column] = HyperLogLog(precision).update(values).count()
+                continue
+            
+            codes, uniques = pd.factorize(values)
+            missing_values[column] = int(np.count_nonzero(codes < 0))
+            if wants_distinct:
+                distinct_counts[column] = len(uniques)
+            if exact_duplicates and column in subset:
+                radix = len(uniques) + 1
+                if n_row_codes * radix >= 2 ** 63:
+                    # Renumber to the observed combinations before the
+                    # mixed-radix codes overflow
+                    observed, row_codes = np.unique(row_codes, return_inverse=True)
+                    n_row_codes = len(observed)
+                # Missing values get code 0 so they compare equal, as in duplicated()
+                row_codes = row_codes * radix + (codes + 1)
+                n_row_codes *= radix
+        
+        if row_hash_column is not None:
+            row_keys = df[row_hash_column]
+        elif approximate:
+            row_keys = pd.util.hash_pandas_object(df[subset], index=False)
+        else:
+            row_keys = row_codes
+        # Sorting integer keys and comparing neighbours is much cheaper than
+        # hashing millions of distinct keys
+        row_keys = np.sort(np.asarray(row_keys))
+        duplicates = np.count_nonzero(row_keys[1:] == row_keys[:-1])
+        
         quality_metrics = {
             'total_rows': len(df),
-            'missing_values': df.isnull().sum().to_dict(),
-            'duplicates': df.duplicated().sum(),
-            'unique_stores': df['store_id'].nunique(),
-            'unique_products': df['product_id'].nunique(),
+            'missing_values': missing_values,
+            'duplicates': int(duplicates),
+            'unique_stores': distinct_counts.get('store_id'),
+            'unique_products': distinct_counts.get('product_id'),
             'date_range': {
                 'start': df['datetime'].min(),
                 'end': df['datetime'].max()
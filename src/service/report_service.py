@@ -0,0 +1,333 @@
+import asyncio
+import functools
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from typing import Callable, Deque, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from src.data.data_loader import DataLoader
+from src.models.sales_analyzer import SalesAnalyzer
+from src.models.sales_cube import SalesCube
+from src.pipeline.lazy_pipeline import load_cube
+
+FIGURE_NAMES = ('daily_sales_trend', 'hourly_sales_pattern', 'category_sales',
+                'store_performance', 'sales_heatmap')
+CONTENT_TYPES = {'json': 'application/json', 'png': 'image/png', 'svg': 'image/svg+xml',
+                 'pdf': 'application/pdf'}
+# Latencies kept per route for the percentiles
+LATENCY_WINDOW = 10_000
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str = ''):
+        super().__init__(message or status.phrase)
+        self.status = status
+
+class ReportSnapshot:
+    def __init__(self, cube: SalesCube, source_stamp: Tuple[int, int], version: int):
+        """Warm state of one version of the source file.
+
+        Snapshots are never modified after loading, so any number of requests
+        can read one while a reload builds the next. Results are memoized per
+        snapshot: the first request for a result starts its computation and
+        concurrent requests for the same result await the same future.
+
+        Args:
+            cube (SalesCube): Sales cube of the source file
+            source_stamp (Tuple[int, int]): Modification time (ns) and size
+                of the file the cube was built from
+            version (int): Reload counter, starting at 1
+        """
+        self.cube = cube
+        self.source_stamp = source_stamp
+        self.version = version
+        self.loaded_at = time.time()
+        self.results: Dict[tuple, asyncio.Future] = {}
+
+def _json_default(value):
+    """Encode numpy scalars and pandas timestamps and periods."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, pd.Period)):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} as JSON")
+
+def _frame_records(df: pd.DataFrame) -> list:
+    return df.astype({column: str for column in df.columns
+                      if isinstance(df[column].dtype, pd.CategoricalDtype)}).to_dict(orient='records')
+
+@functools.lru_cache(maxsize=None)
+def _visualizer():
+    """Import the plotting stack on the first figure request only."""
+    import seaborn as sns
+    from src.visualization.sales_visualizer import SalesVisualizer
+    sns.set_theme(style="whitegrid")
+    return SalesVisualizer
+
+def _render_figure(cube: SalesCube, name: str, file_format: str) -> bytes:
+    visualizer = _visualizer()
+    return visualizer.render_figure(name, visualizer.prepare_plot_data(cube)[name], file_format)
+
+class ReportService:
+    def __init__(self, data_path: str, host: str = '127.0.0.1', port: int = 8000,
+                 time_format: Optional[str] = None, use_cache: bool = True,
+                 file_format: Optional[str] = None, reload_interval: float = 1.0,
+                 max_workers: Optional[int] = None):
+        """Long-lived HTTP service answering report requests from warm state.
+
+        The source file is loaded, preprocessed and aggregated into a
+        `SalesCube` once; requests are answered from that cube. The analyses
+        and figure rendering run in a thread pool so the event loop keeps
+        accepting requests, and the state stays in this process instead of
+        being copied to workers. A watcher reloads the cube in the background
+        when the file's modification time or size changes and swaps it in
+        once it is ready; requests in flight finish on the snapshot they
+        started with.
+
+        Routes (GET only):
+            /health: Snapshot version and load time
+            /sales_trends: `SalesAnalyzer.analyze_sales_trends`
+            /product_performance?top=N: `analyze_product_performance`
+            /store_performance: `analyze_store_performance`
+            /figures/<name>.<png|svg|pdf>: One figure of `SalesVisualizer`
+            /stats: Latency percentiles per route
+
+        Args:
+            data_path (str): Path to the sales data file
+            host (str): Interface to listen on
+            port (int): Port to listen on, 0 for any free port
+            time_format (Optional[str]): strftime format of string
+                transaction times
+            use_cache (bool): Use the loader's columnar cache of the file
+            file_format (Optional[str]): 'excel', 'csv' or 'parquet';
+                inferred from the file extension when None
+            reload_interval (float): Seconds between checks of the source
+                file, no hot reload when 0
+            max_workers (Optional[int]): Threads computing results, the
+                executor's default when None
+        """
+        self.data_path = Path(data_path)
+        self.host = host
+        self.port = port
+        self.time_format = time_format
+        self.use_cache = use_cache
+        self.file_format = file_format
+        self.reload_interval = reload_interval
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report')
+        self.snapshot: Optional[ReportSnapshot] = None
+        self.latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self.routes: Dict[str, Callable] = {
+            '/health': self._health,
+            '/sales_trends': self._sales_trends,
+            '/product_performance': self._product_performance,
+            '/store_performance': self._store_performance,
+            '/stats': self._stats,
+        }
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._watcher: Optional[asyncio.Task] = None
+        self._reload_lock: Optional[asyncio.Lock] = None
+
+    async def start(self) -> 'ReportService':
+        """Load the data, then start listening and watching the source file.
+
+        Returns:
+            ReportService: The service itself; `port` holds the bound port
+        """
+        self._reload_lock = asyncio.Lock()
+        await self.reload()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.reload_interval > 0:
+            self._watcher = asyncio.create_task(self._watch())
+        print(f"Serving reports for {self.data_path} on http://{self.host}:{self.port}")
+        return self
+
+    async def stop(self):
+        """Stop the watcher and the server and shut the executor down."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=True)
+
+    async def serve_forever(self):
+        """Start the service and run until cancelled."""
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def reload(self, force: bool = False) -> bool:
+        """Rebuild the warm state if the source file changed.
+
+        Args:
+            force (bool): Reload even if the file looks unchanged
+
+        Returns:
+            bool: Whether a new snapshot was swapped in
+        """
+        async with self._reload_lock:
+            stamp = self._source_stamp()
+            if not force and self.snapshot is not None and stamp == self.snapshot.source_stamp:
+                return False
+            loop = asyncio.get_running_loop()
+            cube = await loop.run_in_executor(self.executor, self._load_cube)
+            version = self.snapshot.version + 1 if self.snapshot is not None else 1
+            self.snapshot = ReportSnapshot(cube, stamp, version)
+            print(f"Loaded snapshot {version} of {self.data_path} ({len(cube):,} cube rows)")
+            return True
+
+    def latency_percentiles(self, percentiles=(50, 90, 95, 99)) -> Dict[str, Dict[str, float]]:
+        """Request latencies per route over the recent window, in milliseconds.
+
+        Args:
+            percentiles (tuple): Percentiles to report
+
+        Returns:
+            Dict[str, Dict[str, float]]: Request count and percentiles per
+                route, plus an 'all' entry over every route
+        """
+        windows = dict(self.latencies)
+        windows['all'] = [latency for window in self.latencies.values() for latency in window]
+        stats = {}
+        for route, window in windows.items():
+            if not window:
+                continue
+            values = np.percentile(np.array(window) * 1000, percentiles)
+            stats[route] = {'count': len(window)}
+            stats[route].update({f'p{p}': round(float(v), 3) for p, v in zip(percentiles, values)})
+        return stats
+
+    def _source_stamp(self) -> Tuple[int, int]:
+        stat = os.stat(self.data_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load_cube(self) -> SalesCube:
+        loader = DataLoader(self.data_path, use_cache=self.use_cache, file_format=self.file_format)
+        return load_cube(loader, self.time_format)
+
+    async def _watch(self):
+        """Poll the source file and reload it when it changes."""
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                # Keep serving the last good snapshot, e.g. while a file is
+                # being replaced
+                print(f"Reload of {self.data_path} failed: {e}")
+
+    async def _result(self, key: tuple, func: Callable, *args):
+        """Compute a result of the current snapshot once, in the executor."""
+        snapshot = self.snapshot
+        future = snapshot.results.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, func, snapshot.cube, *args)
+            snapshot.results[key] = future
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            # Let the next request retry a failed computation
+            if snapshot.results.get(key) is future:
+                del snapshot.results[key]
+            raise
+
+    async def _health(self, query: Dict) -> Tuple[bytes, str]:
+        snapshot = self.snapshot
+        return self._json({'status': 'ok', 'version': snapshot.version,
+                           'loaded_at': snapshot.loaded_at, 'cube_rows': len(snapshot.cube)})
+
+    async def _sales_trends(self, query: Dict) -> Tuple[bytes, str]:
+        return self._json(await self._result(('sales_trends',), SalesAnalyzer.analyze_sales_trends))
+
+    async def _product_performance(self, query: Dict) -> Tuple[bytes, str]:
+        try:
+            top = int(query.get('top', ['0'])[0])
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "top must be an integer")
+        products = await self._result(('product_performance',), SalesAnalyzer.analyze_product_performance)
+        return self._json(_frame_records(products.head(top) if top > 0 else products))
+
+    async def _store_performance(self, query: Dict) -> Tuple[bytes, str]:
+        stores = await self._result(('store_performance',), SalesAnalyzer.analyze_store_performance)
+        return self._json(_frame_records(stores))
+
+    async def _stats(self, query: Dict) -> Tuple[bytes, str]:
+        return self._json(self.latency_percentiles())
+
+    async def _figure(self, path: str) -> Tuple[bytes, str]:
+        name, _, file_format = path[len('/figures/'):].rpartition('.')
+        if name not in FIGURE_NAMES or file_format not in CONTENT_TYPES or file_format == 'json':
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown figure: {path}")
+        body = await self._result(('figure', name, file_format), _render_figure, name, file_format)
+        return body, CONTENT_TYPES[file_format]
+
+    @staticmethod
+    def _json(result) -> Tuple[bytes, str]:
+        return json.dumps(result, default=_json_default).encode(), CONTENT_TYPES['json']
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answer one HTTP/1.1 request per connection."""
+        start = time.perf_counter()
+        route = None
+        try:
+            try:
+                request_line = (await reader.readline()).decode('latin-1').split()
+                # Headers are read and ignored; requests have no body
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                if len(request_line) != 3:
+                    raise HTTPError(HTTPStatus.BAD_REQUEST)
+                method, target, _ = request_line
+                if method != 'GET':
+                    raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+                url = urlsplit(target)
+                if url.path.startswith('/figures/'):
+                    route = '/figures'
+                    body, content_type = await self._figure(url.path)
+                elif url.path in self.routes:
+                    route = url.path
+                    body, content_type = await self.routes[url.path](parse_qs(url.query))
+                else:
+                    raise HTTPError(HTTPStatus.NOT_FOUND)
+                status = HTTPStatus.OK
+            except HTTPError as e:
+                status = e.status
+                body, content_type = self._json({'error': str(e)})
+            except Exception as e:
+                status = HTTPStatus.INTERNAL_SERVER_ERROR
+                body, content_type = self._json({'error': f"{type(e).__name__}: {e}"})
+
+            writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                         f"Content-Type: {content_type}\r\n"
+                         f"Content-Length: {len(body)}\r\n"
+                         f"Connection: close\r\n\r\n".encode('latin-1') + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            if route is not None and status == HTTPStatus.OK:
+                self.latencies[route].append(time.perf_counter() - start)
+
+async def serve(data_path: str, **options):
+    """Run a `ReportService` until interrupted.
+
+    Args:
+        data_path (str): Path to the sales data file
+        **options: Options of `ReportService`, e.g. port
+    """
+    await ReportService(data_path, **options).serve_forever()
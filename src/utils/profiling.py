@@ -0,0 +1,170 @@
+import csv
+import functools
+import json
+import math
+import sys
+import time
+import tracemalloc
+import pandas as pd
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where psutil is used if installed
+    resource = None
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MB, NaN if unknown."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+        return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+    try:
+        import psutil
+    except ImportError:
+        return math.nan
+    memory = psutil.Process().memory_info()
+    # peak_wset is the Windows peak working set; other platforms only report
+    # the current RSS
+    return getattr(memory, 'peak_wset', memory.rss) / 1e6
+
+class StageProfiler:
+    def __init__(self, trace_memory: bool = True):
+        """Record time and memory of pipeline stages.
+
+        For each stage the profiler records wall time, CPU time, the process
+        peak RSS after the stage (and how much the stage raised it), and, with
+        `trace_memory`, the Python allocation delta and peak from tracemalloc.
+        Stages can be nested: an inner stage is recorded when it ends, before
+        the stage around it, and the outer stage's figures include it.
+
+        Args:
+            trace_memory (bool): Track Python allocations with tracemalloc,
+                which slows allocation-heavy code down noticeably
+        """
+        self.trace_memory = trace_memory
+        self.records: List[Dict] = []
+        # Highest traced memory seen so far in each open stage, outermost
+        # first; an inner stage resets tracemalloc's peak, so it is kept here
+        self._open_peaks: List[int] = []
+
+    @contextmanager
+    def stage(self, name: str, **metadata):
+        """Profile the enclosed block as one stage.
+
+        Args:
+            name (str): Stage name
+            **metadata: Extra fields stored with the record, e.g. row counts
+        """
+        started_tracing = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            if self._open_peaks:
+                self._open_peaks[-1] = max(self._open_peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            traced_before, _ = tracemalloc.get_traced_memory()
+            self._open_peaks.append(traced_before)
+
+        rss_before = _peak_rss_mb()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {
+                'stage': name,
+                'wall_s': time.perf_counter() - wall_start,
+                'cpu_s': time.process_time() - cpu_start,
+                'peak_rss_mb': _peak_rss_mb(),
+            }
+            record['peak_rss_increase_mb'] = record['peak_rss_mb'] - rss_before
+            if self.trace_memory:
+                traced_after, traced_peak = tracemalloc.get_traced_memory()
+                traced_peak = max(traced_peak, self._open_peaks.pop())
+                if self._open_peaks:
+                    self._open_peaks[-1] = max(self._open_peaks[-1], traced_peak)
+                record['alloc_delta_mb'] = (traced_after - traced_before) / 1e6
+                record['alloc_peak_mb'] = (traced_peak - traced_before) / 1e6
+                if started_tracing:
+                    tracemalloc.stop()
+            record.update(metadata)
+            self.records.append(record)
+
+    def wrap(self, func: Callable, name: Optional[str] = None) -> Callable:
+        """Return a version of `func` that is profiled on every call.
+
+        Args:
+            func (Callable): Function or bound method to wrap
+            name (Optional[str]): Stage name, the function's qualified name by
+                default
+
+        Returns:
+            Callable: Wrapped function
+        """
+        stage_name = name or getattr(func, '__qualname__', repr(func))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def report(self) -> pd.DataFrame:
+        """Return the recorded stages as a data frame.
+
+        Returns:
+            pd.DataFrame: One row per stage
+        """
+        return pd.DataFrame(self.records)
+
+    def to_json(self, path: str) -> Path:
+        """Write the records as a JSON list, with null for unknown (NaN) values.
+
+        Args:
+            path (str): Output file
+
+        Returns:
+            Path: Path of the written report
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        records = [{key: None if isinstance(value, float) and math.isnan(value) else value
+                    for key, value in record.items()} for record in self.records]
+        path.write_text(json.dumps(records, indent=2, default=str))
+        return path
+
+    def to_csv(self, path: str) -> Path:
+        """Write the records as CSV.
+
+        Args:
+            path (str): Output file
+
+        Returns:
+            Path: Path of the written report
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fields = list(dict.fromkeys(key for record in self.records for key in record))
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(self.records)
+        return path
+
+    def save(self, path: str) -> Path:
+        """Write the report as JSON or CSV depending on the file extension.
+
+        Args:
+            path (str): Output file ending in .json or .csv
+
+        Returns:
+            Path: Path of the written report
+        """
+        if str(path).endswith('.csv'):
+            return self.to_csv(path)
+        return self.to_json(path)
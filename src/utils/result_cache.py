@@ -0,0 +1,312 @@
+import copy
+import hashlib
+import inspect
+import os
+import sys
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Part of every key; bump it to invalidate all cached results, e.g. after a
+# change the key cannot see such as a library upgrade
+CACHE_VERSION = 1
+
+# Source digests by (path, mtime_ns, size), so unchanged files are read once
+_source_digests: Dict[tuple, bytes] = {}
+
+def _column_digest(values: pd.Series, digest) -> None:
+    """Feed one column's dtype and contents into a running digest."""
+    digest.update(str(values.dtype).encode())
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        digest.update(np.ascontiguousarray(values.cat.codes.to_numpy()).view('uint8'))
+        _column_digest(pd.Series(values.cat.categories), digest)
+    elif isinstance(values.dtype, np.dtype) and values.dtype.kind in 'biufcmM':
+        # Fixed-width columns are hashed straight from their buffer
+        digest.update(np.ascontiguousarray(values.to_numpy()).view('uint8'))
+    else:
+        # Strings and objects go through pandas' vectorized value hash
+        digest.update(pd.util.hash_pandas_object(values, index=False).to_numpy().view('uint8'))
+
+def frame_fingerprint(df: pd.DataFrame, columns: Optional[Iterable[str]] = None) -> str:
+    """Content fingerprint of a data frame from its shape and column hashes.
+
+    Args:
+        df (pd.DataFrame): Frame to fingerprint
+        columns (Optional[Iterable[str]]): Only hash these columns (those a
+            computation reads); missing ones are skipped
+
+    Returns:
+        str: Hex digest
+    """
+    selected = list(df.columns) if columns is None else [c for c in columns if c in df.columns]
+    digest = hashlib.sha256()
+    digest.update(repr((df.shape, selected)).encode())
+    for column in selected:
+        _column_digest(df[column], digest)
+    return digest.hexdigest()
+
+def _code_digest(code, digest) -> None:
+    """Feed a code object's bytecode, names and constants into a digest.
+
+    Nested code objects (inner functions, comprehensions) are hashed
+    recursively instead of by their repr, which holds a memory address.
+    """
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            _code_digest(const, digest)
+        elif isinstance(const, frozenset):
+            # Set iteration order depends on the hash seed
+            digest.update(repr(sorted(map(repr, const))).encode())
+        else:
+            digest.update(repr(const).encode())
+
+def _source_digest(module) -> bytes:
+    """Digest of a module's source file, empty for modules without one."""
+    path = getattr(module, '__file__', None)
+    if path is None or not os.path.isfile(path):
+        return b''
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _source_digests:
+        with open(path, 'rb') as f:
+            _source_digests[key] = hashlib.sha256(f.read()).digest()
+    return _source_digests[key]
+
+def code_fingerprint(func: Callable) -> str:
+    """Fingerprint of a function's code and of the code it can call.
+
+    Covers the function's own bytecode and constants, the source of its
+    module, and the source of every module of the same top-level package
+    that the module references (e.g. helper classes it imports).
+
+    Args:
+        func (Callable): Function to fingerprint
+
+    Returns:
+        str: Hex digest
+    """
+    func = inspect.unwrap(func)
+    digest = hashlib.sha256()
+    _code_digest(func.__code__, digest)
+    module = sys.modules.get(func.__module__)
+    if module is not None:
+        package = func.__module__.split('.')[0]
+        modules = {module.__name__: module}
+        for value in list(vars(module).values()):
+            owner = value if inspect.ismodule(value) else (
+                inspect.getmodule(value) if inspect.isclass(value) or inspect.isfunction(value) else None)
+            if owner is not None and owner.__name__.split('.')[0] == package:
+                modules[owner.__name__] = owner
+        for name in sorted(modules):
+            digest.update(name.encode() + _source_digest(modules[name]))
+    return digest.hexdigest()
+
+class ResultCache:
+    def __init__(self, max_entries: int = 128, cache_dir: Optional[str] = '.cache/results',
+                 max_disk_bytes: int = 512 * 1024 ** 2, version: str = ''):
+        """Two-tier memoization cache for analysis results.
+
+        Results are keyed by the function, a fingerprint of its data frame
+        arguments and its other arguments. An in-memory LRU tier answers
+        repeated calls within a process; an on-disk tier shares results
+        across processes (scripts and notebooks) and evicts the least
+        recently used files once it outgrows `max_disk_bytes`.
+
+        Args:
+            max_entries (int): Results kept in memory
+            cache_dir (Optional[str]): Directory of the disk tier, None for a
+                memory-only cache
+            max_disk_bytes (int): Size limit of the disk tier
+            version (str): Salt added to every key, so caches with different
+                versions never share results
+        """
+        self.max_entries = max_entries
+        self.version = version
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_disk_bytes = max_disk_bytes
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+    @staticmethod
+    def make_key(func: Callable, args: tuple, kwargs: dict,
+                 columns: Optional[Iterable[str]] = None, version: str = '') -> str:
+        """Build the cache key of a call.
+
+        The key includes `code_fingerprint(func)`, so results computed by an
+        older version of a method or of the helpers it calls are not
+        reused, and the CACHE_VERSION and `version` salts.
+
+        Args:
+            func (Callable): Memoized function
+            args (tuple): Positional arguments
+            kwargs (dict): Keyword arguments
+            columns (Optional[Iterable[str]]): Columns of frame arguments the
+                function reads
+            version (str): Extra salt, see `ResultCache`
+
+        Returns:
+            str: Hex digest
+        """
+        bound = inspect.signature(func).bind(*args, **kwargs)
+        bound.apply_defaults()
+        digest = hashlib.sha256()
+        digest.update(f'{CACHE_VERSION}:{version}:'.encode())
+        digest.update(func.__module__.encode() + b'.' + func.__qualname__.encode())
+        digest.update(code_fingerprint(func).encode())
+        for name, value in bound.arguments.items():
+            data = getattr(value, 'data', None)
+            if isinstance(value, pd.DataFrame):
+                part = frame_fingerprint(value, columns)
+            elif isinstance(data, pd.DataFrame):
+                # Aggregates such as SalesCube wrap their frame in `.data`
+                part = type(value).__name__ + frame_fingerprint(data)
+            else:
+                part = repr(value)
+            digest.update(f'{name}={part};'.encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Tuple[bool, object]:
+        """Look a key up in memory, then on disk.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            Tuple[bool, object]: Whether the key was found, and a copy of the
+                cached value
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return True, copy.deepcopy(self._memory[key])
+
+        path = self._disk_path(key)
+        if path is not None and path.is_file():
+            import joblib
+            try:
+                value = joblib.load(path)
+            except Exception:
+                # A truncated or incompatible file is treated as a miss
+                path.unlink(missing_ok=True)
+            else:
+                os.utime(path)
+                with self._lock:
+                    self._stats['disk_hits'] += 1
+                    self._remember(key, value)
+                return True, copy.deepcopy(value)
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return False, None
+
+    def put(self, key: str, value):
+        """Store a value in both tiers.
+
+        Args:
+            key (str): Cache key
+            value: Picklable result
+        """
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._remember(key, value)
+        path = self._disk_path(key)
+        if path is not None:
+            import joblib
+            tmp_path = path.with_suffix('.tmp')
+            joblib.dump(value, tmp_path)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+
+    def call(self, func: Callable, args: tuple = (), kwargs: Optional[dict] = None,
+             columns: Optional[Iterable[str]] = None):
+        """Return the memoized result of `func(*args, **kwargs)`.
+
+        Args:
+            func (Callable): Function to call on a miss
+            args (tuple): Positional arguments
+            kwargs (Optional[dict]): Keyword arguments
+            columns (Optional[Iterable[str]]): Columns of frame arguments the
+                function reads
+
+        Returns:
+            The function's result
+        """
+        kwargs = kwargs or {}
+        key = self.make_key(func, args, kwargs, columns, self.version)
+        found, value = self.get(key)
+        if found:
+            return value
+        value = func(*args, **kwargs)
+        self.put(key, value)
+        return value
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and the current size of both tiers.
+
+        Returns:
+            Dict[str, float]: Cache statistics
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        stats['disk_bytes'] = sum(path.stat().st_size for path in self._disk_files())
+        return stats
+
+    def clear(self) -> Dict[str, int]:
+        """Empty both tiers and reset the statistics.
+
+        Returns:
+            Dict[str, int]: Number of removed disk files
+        """
+        with self._lock:
+            self._memory.clear()
+            self._stats = dict.fromkeys(self._stats, 0)
+        removed = 0
+        for path in self._disk_files():
+            path.unlink(missing_ok=True)
+            removed += 1
+        return {'removed': removed}
+
+    def _remember(self, key: str, value):
+        """Insert into the memory tier; the caller holds the lock."""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _disk_path(self, key: str) -> Optional[Path]:
+        return self.cache_dir / f'{key}.pkl' if self.cache_dir is not None else None
+
+    def _disk_files(self):
+        if self.cache_dir is None:
+            return []
+        return list(self.cache_dir.glob('*.pkl'))
+
+    def _evict_disk(self):
+        """Delete the least recently used files until the tier fits its limit."""
+        files = []
+        for path in self._disk_files():
+            try:
+                files.append((path.stat().st_mtime, path.stat().st_size, path))
+            except FileNotFoundError:
+                continue
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            with self._lock:
+                self._stats['evictions'] += 1
@@ -0,0 +1,311 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Union
+
+def _canonical(column: pd.Series) -> pd.Series:
+    """Cast a key column to a dtype-independent form, so equal keys hash alike."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        column = column.astype(column.cat.categories.dtype)
+    if pd.api.types.is_bool_dtype(column) or pd.api.types.is_numeric_dtype(column):
+        return column.astype('float64')
+    if pd.api.types.is_datetime64_dtype(column):
+        return column.astype('datetime64[ns]')
+    return column.astype(str).astype(object)
+
+def hash_values(values) -> np.ndarray:
+    """Hash array-like values to uint64, dropping missing values.
+
+    Keys are hashed by value rather than by dtype: a store id hashes the same
+    as int8, float32 or float64, and a label the same as string or category.
+
+    Args:
+        values (array-like): Values of one column, or a data frame whose rows
+            are hashed as composite keys
+
+    Returns:
+        np.ndarray: 64-bit hash per non-missing value (row)
+    """
+    if not isinstance(values, (pd.Series, pd.DataFrame)):
+        values = pd.Series(values)
+    values = values.dropna()
+    if isinstance(values, pd.DataFrame):
+        values = values.apply(_canonical)
+    else:
+        values = _canonical(values)
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+class HyperLogLog:
+    def __init__(self, precision: int = 14):
+        """Approximate distinct counter (HyperLogLog).
+
+        Uses 2**precision one-byte registers and has a relative standard error
+        of about 1.04 / sqrt(2**precision), 0.8% at the default precision.
+        Sketches built on different chunks can be merged.
+
+        Args:
+            precision (int): Number of index bits, between 11 and 18
+        """
+        if not 11 <= precision <= 18:
+            raise ValueError(f"precision must be between 11 and 18, got {precision}")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype='uint8')
+
+    def update(self, values) -> 'HyperLogLog':
+        """Add a chunk of values to the sketch.
+
+        Args:
+            values (array-like): Values to count, missing values are ignored
+
+        Returns:
+            HyperLogLog: The sketch itself
+        """
+        return self.update_hashes(hash_values(values))
+
+    def update_hashes(self, hashes: np.ndarray) -> 'HyperLogLog':
+        """Add precomputed 64-bit hashes to the sketch.
+
+        Args:
+            hashes (np.ndarray): uint64 hashes
+
+        Returns:
+            HyperLogLog: The sketch itself
+        """
+        hashes = np.asarray(hashes, dtype='uint64')
+        if len(hashes) == 0:
+            return self
+        tail_bits = 64 - self.precision
+        index = (hashes >> np.uint64(tail_bits)).astype('int64')
+        tail = hashes & np.uint64((1 << tail_bits) - 1)
+        # The tail has at most 53 bits, so the float conversion is exact and
+        # frexp's exponent is its bit length
+        _, bit_length = np.frexp(tail.astype('float64'))
+        rank = (tail_bits - bit_length + 1).astype('uint8')
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """Fold another sketch of the same precision into this one.
+
+        Args:
+            other (HyperLogLog): Sketch to merge
+
+        Returns:
+            HyperLogLog: The sketch itself
+        """
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        """Estimated number of distinct values."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype('int64')))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+class CountMinSketch:
+    def __init__(self, width: int = 2048, depth: int = 5, seed: int = 0):
+        """Weighted frequency sketch (Count-Min).
+
+        Point estimates never undercount. With total weight N, an estimate
+        exceeds the true value by more than e / width * N with probability at
+        most exp(-depth): 0.13% of N with 99.3% confidence at the defaults.
+        Sketches with the same shape and seed can be merged.
+
+        Args:
+            width (int): Counters per row
+            depth (int): Number of rows (independent hash functions)
+            seed (int): Seed of the row hash functions
+        """
+        self.width = width
+        self.depth = depth
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        # Odd multipliers and offsets of the per-row multiply-shift hashes
+        self._multipliers = rng.integers(1, 2 ** 63, depth, dtype='uint64') | np.uint64(1)
+        self._offsets = rng.integers(0, 2 ** 63, depth, dtype='uint64')
+        self.table = np.zeros((depth, width), dtype='float64')
+        self.total = 0.0
+
+    def _columns(self, hashes: np.ndarray) -> np.ndarray:
+        """Counter index of every hash in every row, shape (depth, n)."""
+        mixed = hashes[None, :] * self._multipliers[:, None] + self._offsets[:, None]
+        return ((mixed >> np.uint64(32)) % np.uint64(self.width)).astype('int64')
+
+    def update(self, values, weights=None) -> 'CountMinSketch':
+        """Add a batch of values, optionally weighted.
+
+        Args:
+            values (array-like): Keys, or a data frame of composite keys;
+                missing keys are ignored
+            weights (array-like): Weight per key, 1 by default
+
+        Returns:
+            CountMinSketch: The sketch itself
+        """
+        values = values if isinstance(values, (pd.Series, pd.DataFrame)) else pd.Series(values)
+        present = values.notna().to_numpy()
+        if present.ndim > 1:
+            present = present.all(axis=1)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype='float64')
+        return self.update_hashes(hash_values(values), weights[present])
+
+    def update_hashes(self, hashes: np.ndarray, weights=None) -> 'CountMinSketch':
+        """Add precomputed 64-bit hashes, optionally weighted.
+
+        Args:
+            hashes (np.ndarray): uint64 hashes
+            weights (array-like): Weight per hash, 1 by default
+
+        Returns:
+            CountMinSketch: The sketch itself
+        """
+        hashes = np.asarray(hashes, dtype='uint64')
+        weights = np.ones(len(hashes)) if weights is None else np.asarray(weights, dtype='float64')
+        columns = self._columns(hashes)
+        for row in range(self.depth):
+            self.table[row] += np.bincount(columns[row], weights=weights, minlength=self.width)
+        self.total += float(weights.sum())
+        return self
+
+    def estimate(self, values) -> np.ndarray:
+        """Estimated total weight of each value.
+
+        Args:
+            values (array-like): Keys, or a data frame of composite keys
+
+        Returns:
+            np.ndarray: Upper-biased estimate per key
+        """
+        columns = self._columns(hash_values(values))
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0)
+
+    def merge(self, other: 'CountMinSketch') -> 'CountMinSketch':
+        """Fold in a sketch of the same shape and seed.
+
+        Args:
+            other (CountMinSketch): Sketch to merge
+
+        Returns:
+            CountMinSketch: The sketch itself
+        """
+        if (other.width, other.depth, other.seed) != (self.width, self.depth, self.seed):
+            raise ValueError("Cannot merge sketches of different shape or seed")
+        self.table += other.table
+        self.total += other.total
+        return self
+
+    def error_bound(self) -> Dict[str, float]:
+        """Additive overestimate bound and the probability it holds."""
+        return {'max_overestimate': np.e / self.width * self.total,
+                'confidence': 1 - np.exp(-self.depth)}
+
+class SpaceSaving:
+    def __init__(self, keys: Union[str, List[str]], capacity: int = 64):
+        """Weighted heavy-hitter summary (Space-Saving).
+
+        Keeps at most `capacity` keys with an upper-bound total and the
+        maximum overestimate of that total. With total weight N every key
+        heavier than N / capacity is kept, and a kept key's true total lies
+        in [count - error, count] with error <= N / capacity. A batch is
+        aggregated first and merged as an exact summary, following the
+        mergeable Space-Saving construction, so updates are vectorized.
+
+        Args:
+            keys (Union[str, List[str]]): Key column(s)
+            capacity (int): Number of monitored keys
+        """
+        self.keys = [keys] if isinstance(keys, str) else list(keys)
+        self.capacity = capacity
+        self.counters = pd.DataFrame({**{key: pd.Series(dtype=object) for key in self.keys},
+                                      'count': pd.Series(dtype='float64'),
+                                      'error': pd.Series(dtype='float64')})
+        self.total = 0.0
+
+    def update(self, df: pd.DataFrame, weights: Optional[Union[str, np.ndarray]] = None) -> 'SpaceSaving':
+        """Add a batch of keys, optionally weighted.
+
+        Args:
+            df (pd.DataFrame): Batch holding the key column(s)
+            weights (Optional[Union[str, np.ndarray]]): Weight column name or
+                values, 1 per row by default
+
+        Returns:
+            SpaceSaving: The summary itself
+        """
+        if isinstance(weights, str):
+            weights = df[weights].to_numpy(dtype='float64')
+        elif weights is None:
+            weights = np.ones(len(df))
+        batch = df[self.keys].assign(count=weights)
+        batch = batch.groupby(self.keys, observed=True, sort=False)['count'].sum().reset_index()
+        batch['error'] = 0.0
+        self.total += float(batch['count'].sum())
+        self.counters = self._combine(self.counters, self.floor(), batch, 0.0)
+        return self
+
+    def merge(self, other: 'SpaceSaving') -> 'SpaceSaving':
+        """Fold in a summary over the same key columns.
+
+        Args:
+            other (SpaceSaving): Summary to merge
+
+        Returns:
+            SpaceSaving: The summary itself
+        """
+        if other.keys != self.keys:
+            raise ValueError("Cannot merge summaries over different keys")
+        self.counters = self._combine(self.counters, self.floor(), other.counters, other.floor())
+        self.total += other.total
+        return self
+
+    def floor(self) -> float:
+        """Upper bound of the total of any key that is not monitored."""
+        if len(self.counters) < self.capacity:
+            return 0.0
+        return float(self.counters['count'].min())
+
+    def _combine(self, left: pd.DataFrame, left_floor: float,
+                 right: pd.DataFrame, right_floor: float) -> pd.DataFrame:
+        """Add two summaries and keep the `capacity` largest keys.
+
+        A key missing from a summary is charged that summary's floor, both as
+        count and as error.
+        """
+        both = pd.concat([left.assign(_left=1.0, _right=0.0),
+                          right.assign(_left=0.0, _right=1.0)], ignore_index=True)
+        merged = both.groupby(self.keys, observed=True, sort=False)[
+            ['count', 'error', '_left', '_right']].sum()
+        charge = (1 - merged['_left']) * left_floor + (1 - merged['_right']) * right_floor
+        merged['count'] += charge
+        merged['error'] += charge
+        merged = merged.nlargest(self.capacity, 'count')
+        return merged[['count', 'error']].reset_index()
+
+    def top(self, n: Optional[int] = None) -> pd.DataFrame:
+        """The heaviest monitored keys.
+
+        Args:
+            n (Optional[int]): Number of keys, all monitored keys by default
+
+        Returns:
+            pd.DataFrame: Keys with 'count' (upper bound), 'error', 'lower'
+                (lower bound) and 'guaranteed', True when the key is certainly
+                among the true top keys up to its rank
+        """
+        ranked = self.counters.sort_values('count', ascending=False, ignore_index=True)
+        ranked['lower'] = ranked['count'] - ranked['error']
+        # The best a key ranked after position i can have: the next monitored
+        # count, or the floor for unmonitored keys
+        upper_after = np.append(ranked['count'].to_numpy()[1:], self.floor())
+        ranked['guaranteed'] = ranked['lower'].to_numpy() >= upper_after
+        return ranked if n is None else ranked.head(n)
+
+    def error_bound(self) -> float:
+        """Worst-case overestimate of any reported count, N / capacity."""
+        return self.total / self.capacity
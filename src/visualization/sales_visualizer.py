@@ -1,7 +1,20 @@
+import io
+import os
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.figure import Figure
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from src.models.sales_cube import SalesCube
+from src.preprocessing.preprocessor import DAY_NAMES
+
+# Sum of sales and number of lines per weekday x hour cell, as returned by
+# SalesVisualizer.hour_weekday_bins
+HeatmapBins = Tuple[np.ndarray, np.ndarray]
 
 class SalesVisualizer:
     def __init__(self, output_dir: str = 'reports/figures'):
@@ -17,69 +30,262 @@ class SalesVisualizer:
         plt.style.use('default')
         sns.set_theme(style="whitegrid")
     
-    def plot_daily_sales_trend(self, df: pd.DataFrame, save: bool = True):
-        """Plot daily sales trend."""
-        plt.figure(figsize=(15, 6))
-        daily_sales = df.groupby(df['datetime'].dt.date)['total_amount'].sum().reset_index()
-        plt.plot(daily_sales['datetime'], daily_sales['total_amount'])
-        plt.title('Daily Sales Trend')
-        plt.xlabel('Date')
-        plt.ylabel('Total Sales ($)')
-        plt.xticks(rotation=45)
-        if save:
-            plt.savefig(self.output_dir / 'daily_sales_trend.png', bbox_inches='tight')
-        plt.close()
+    def plot_daily_sales_trend(self, df: Union[pd.DataFrame, SalesCube, pd.Series], save: bool = True):
+        """Plot daily sales trend from transactions, a cube or `daily_sales` output."""
+        self._render('daily_sales_trend', self.daily_sales(df), save)
     
-    def plot_hourly_sales_pattern(self, df: pd.DataFrame, save: bool = True):
+    def plot_hourly_sales_pattern(self, df: Union[pd.DataFrame, SalesCube], save: bool = True):
         """Plot hourly sales pattern."""
-        plt.figure(figsize=(12, 6))
-        hourly_sales = df.groupby('hour')['total_amount'].mean().reset_index()
-        plt.bar(hourly_sales['hour'], hourly_sales['total_amount'])
-        plt.title('Average Hourly Sales Pattern')
-        plt.xlabel('Hour of Day')
-        plt.ylabel('Average Sales ($)')
-        if save:
-            plt.savefig(self.output_dir / 'hourly_sales_pattern.png', bbox_inches='tight')
-        plt.close()
+        self._render('hourly_sales_pattern', self.hourly_sales(df), save)
     
-    def plot_product_category_sales(self, df: pd.DataFrame, save: bool = True):
+    def plot_product_category_sales(self, df: Union[pd.DataFrame, SalesCube], save: bool = True):
         """Plot sales by product category."""
-        plt.figure(figsize=(10, 6))
-        category_sales = df.groupby('product_category')['total_amount'].sum()
-        category_sales.plot(kind='bar')
-        plt.title('Sales by Product Category')
-        plt.xlabel('Category')
-        plt.ylabel('Total Sales ($)')
-        plt.xticks(rotation=45)
-        if save:
-            plt.savefig(self.output_dir / 'category_sales.png', bbox_inches='tight')
-        plt.close()
+        self._render('category_sales', SalesCube.sales_by(df, 'product_category'), save)
     
-    def plot_store_performance(self, df: pd.DataFrame, save: bool = True):
+    def plot_store_performance(self, df: Union[pd.DataFrame, SalesCube], save: bool = True):
         """Plot store performance comparison."""
-        plt.figure(figsize=(12, 6))
-        store_sales = df.groupby('store_location')['total_amount'].sum()
-        store_sales.plot(kind='bar')
-        plt.title('Total Sales by Store Location')
-        plt.xlabel('Store Location')
-        plt.ylabel('Total Sales ($)')
-        plt.xticks(rotation=45)
-        if save:
-            plt.savefig(self.output_dir / 'store_performance.png', bbox_inches='tight')
-        plt.close()
+        self._render('store_performance', SalesCube.sales_by(df, 'store_location'), save)
+    
+    def plot_sales_heatmap(self, df: Union[pd.DataFrame, SalesCube, HeatmapBins], save: bool = True):
+        """Plot sales heatmap by hour and day of week, optionally from pre-binned sums."""
+        self._render('sales_heatmap', self.heatmap_table(df), save)
+    
+    def render_all(self, df: Union[pd.DataFrame, SalesCube, Dict[str, object]],
+                   formats: Iterable[str] = ('png',), dpi: Optional[float] = None,
+                   max_workers: Optional[int] = None) -> List[Path]:
+        """Render every figure concurrently in a process pool.
+        
+        The inputs are aggregated in this process and only the small per-plot
+        tables are sent to the workers, which draw with the object-oriented
+        Figure API instead of pyplot's global state.
+        
+        Args:
+            df (Union[pd.DataFrame, SalesCube, Dict[str, object]]): Processed
+                dataframe, a sales cube, or the output of `prepare_plot_data`
+            formats (Iterable[str]): Output formats, e.g. ('png', 'svg')
+            dpi (Optional[float]): Output resolution, matplotlib's default when
+                None
+            max_workers (Optional[int]): Pool size, one process per figure
+                (capped at the CPU count) by default
+        
+        Returns:
+            List[Path]: Paths of the written files
+        """
+        plot_data = df if isinstance(df, dict) else self.prepare_plot_data(df)
+        tasks = [(name, data, self.output_dir / f'{name}.{fmt}', dpi)
+                 for name, data in plot_data.items() for fmt in formats]
+        if not tasks:
+            return []
+        if max_workers is None:
+            max_workers = min(len(tasks), os.cpu_count() or 1)
+        
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+            futures = [executor.submit(_render_to_file, *task) for task in tasks]
+            return [future.result() for future in futures]
+    
+    @staticmethod
+    def render_figure(name: str, data, file_format: str = 'png', dpi: Optional[float] = None) -> bytes:
+        """Draw one figure in memory, e.g. to serve it without touching disk.
+        
+        Args:
+            name (str): Figure name, one of the keys of `prepare_plot_data`
+            data: Aggregated plot input from `prepare_plot_data`
+            file_format (str): Image format, e.g. 'png' or 'svg'
+            dpi (Optional[float]): Output resolution
+        
+        Returns:
+            bytes: Encoded image
+        """
+        buffer = io.BytesIO()
+        _draw(name, data, buffer, dpi, file_format)
+        return buffer.getvalue()
     
-    def plot_sales_heatmap(self, df: pd.DataFrame, save: bool = True):
-        """Plot sales heatmap by hour and day of week."""
-        plt.figure(figsize=(12, 8))
-        pivot_table = pd.pivot_table(
-            df,
-            values='total_amount',
-            index='day_of_week',
-            columns='hour',
-            aggfunc='mean'
-        )
-        sns.heatmap(pivot_table, cmap='YlOrRd', annot=True, fmt='.0f')
-        plt.title('Sales Heatmap: Hour vs Day of Week')
-        if save:
-            plt.savefig(self.output_dir / 'sales_heatmap.png', bbox_inches='tight')
-        plt.close()
+    @staticmethod
+    def prepare_plot_data(df: Union[pd.DataFrame, SalesCube]) -> Dict[str, object]:
+        """Compute the aggregated input of every figure.
+        
+        Args:
+            df (Union[pd.DataFrame, SalesCube]): Processed dataframe or cube
+        
+        Returns:
+            Dict[str, object]: Plot input keyed by figure name
+        """
+        # The hourly pattern and the heatmap share one weekday x hour binning
+        bins = df if isinstance(df, SalesCube) else SalesVisualizer.hour_weekday_bins(df)
+        return {
+            'daily_sales_trend': SalesVisualizer.daily_sales(df),
+            'hourly_sales_pattern': SalesVisualizer.hourly_sales(bins),
+            'category_sales': SalesCube.sales_by(df, 'product_category'),
+            'store_performance': SalesCube.sales_by(df, 'store_location'),
+            'sales_heatmap': SalesVisualizer.heatmap_table(bins),
+        }
+    
+    @staticmethod
+    def daily_sales(df: Union[pd.DataFrame, SalesCube, pd.Series]) -> pd.Series:
+        """Total sales per day.
+        
+        Days are floored on the datetime64 values and summed with bincount,
+        so no Python date object is created per row.
+        
+        Args:
+            df (Union[pd.DataFrame, SalesCube, pd.Series]): Processed
+                dataframe, cube, or daily totals, which are returned as is
+        
+        Returns:
+            pd.Series: Sales per day, indexed by date
+        """
+        if isinstance(df, pd.Series):
+            return df
+        if isinstance(df, SalesCube):
+            return df.rollup('transaction_date')['total_amount']
+        days = df['datetime'].to_numpy().astype('datetime64[D]')
+        valid = ~np.isnat(days)
+        if not valid.any():
+            return pd.Series(dtype='float64', name='total_amount')
+        first = days[valid].min()
+        offsets = (days[valid] - first).astype('int64')
+        amounts = df['total_amount'].to_numpy(dtype='float64')[valid]
+        observed = np.bincount(offsets) > 0
+        totals = np.bincount(offsets, weights=np.nan_to_num(amounts))
+        index = pd.DatetimeIndex(first + np.flatnonzero(observed), name='datetime')
+        return pd.Series(totals[observed], index=index, name='total_amount')
+    
+    @staticmethod
+    def hourly_sales(df: Union[pd.DataFrame, SalesCube, HeatmapBins]) -> pd.Series:
+        """Average sales per transaction line for each hour."""
+        if isinstance(df, SalesCube):
+            hourly = df.rollup('hour')
+            return (hourly['total_amount'] / hourly['line_count']).rename('total_amount')
+        if isinstance(df, tuple):
+            sums, counts = df[0].sum(axis=0), df[1].sum(axis=0)
+        else:
+            amounts = df['total_amount'].to_numpy(dtype='float64')
+            hour = df['hour'].to_numpy(dtype='float64')
+            valid = ~np.isnan(amounts) & ~np.isnan(hour)
+            hour = hour[valid].astype('int64')
+            sums = np.bincount(hour, weights=amounts[valid], minlength=24)
+            counts = np.bincount(hour, minlength=24)
+        hours = np.flatnonzero(counts)
+        return pd.Series(sums[hours] / counts[hours], index=pd.Index(hours, name='hour'),
+                         name='total_amount')
+    
+    @staticmethod
+    def hour_weekday_bins(df: pd.DataFrame) -> HeatmapBins:
+        """Bin sales into a weekday x hour grid with integer-coded bincounts.
+        
+        Bins of separate batches can be added element-wise and passed to
+        `heatmap_table` or `plot_sales_heatmap` later.
+        
+        Args:
+            df (pd.DataFrame): Processed dataframe
+        
+        Returns:
+            HeatmapBins: Sum of sales and number of lines per cell, two 7 x 24
+                arrays indexed by weekday (Monday first) and hour
+        """
+        if 'day_of_week' in df.columns:
+            day_of_week = df['day_of_week']
+            if not isinstance(day_of_week.dtype, pd.CategoricalDtype):
+                day_of_week = day_of_week.astype('category')
+            weekday = day_of_week.cat.codes.to_numpy().astype('int64')
+            if list(day_of_week.cat.categories) != DAY_NAMES:
+                # Day names categorized another way, e.g. alphabetically by
+                # optimize_dtypes: map each category to its Monday-first position
+                positions = pd.Index(DAY_NAMES).get_indexer(day_of_week.cat.categories)
+                weekday = np.where(weekday >= 0, positions[weekday], -1)
+        else:
+            weekday = df['datetime'].dt.dayofweek.fillna(-1).to_numpy().astype('int64')
+        hour = df['hour'].to_numpy(dtype='float64')
+        amounts = df['total_amount'].to_numpy(dtype='float64')
+        valid = (weekday >= 0) & ~np.isnan(hour) & ~np.isnan(amounts)
+        cells = weekday[valid] * 24 + hour[valid].astype('int64')
+        sums = np.bincount(cells, weights=amounts[valid], minlength=7 * 24).reshape(7, 24)
+        counts = np.bincount(cells, minlength=7 * 24).reshape(7, 24)
+        return sums, counts
+    
+    @staticmethod
+    def heatmap_table(df: Union[pd.DataFrame, SalesCube, HeatmapBins]) -> pd.DataFrame:
+        """Average sales per transaction line by day of week and hour.
+        
+        Args:
+            df (Union[pd.DataFrame, SalesCube, HeatmapBins]): Processed
+                dataframe, cube, or the output of `hour_weekday_bins`
+        
+        Returns:
+            pd.DataFrame: Days of week by hours, only observed ones
+        """
+        if isinstance(df, SalesCube):
+            cells = df.rollup(['day_of_week', 'hour'])
+            return (cells['total_amount'] / cells['line_count']).unstack('hour')
+        sums, counts = df if isinstance(df, tuple) else SalesVisualizer.hour_weekday_bins(df)
+        days = np.flatnonzero(counts.any(axis=1))
+        hours = np.flatnonzero(counts.any(axis=0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums[np.ix_(days, hours)] / counts[np.ix_(days, hours)]
+        index = pd.CategoricalIndex(np.array(DAY_NAMES)[days], categories=DAY_NAMES,
+                                    ordered=True, name='day_of_week')
+        return pd.DataFrame(np.where(counts[np.ix_(days, hours)] > 0, means, np.nan),
+                            index=index, columns=pd.Index(hours, name='hour'))
+    
+    def _render(self, name: str, data, save: bool):
+        path = self.output_dir / f'{name}.png' if save else None
+        _draw(name, data, path)
+
+def _init_worker():
+    sns.set_theme(style="whitegrid")
+
+def _render_to_file(name: str, data, path: Path, dpi: Optional[float]) -> Path:
+    _draw(name, data, path, dpi)
+    return path
+
+def _draw(name: str, data, path: Optional[Union[Path, io.BytesIO]], dpi: Optional[float] = None,
+          file_format: Optional[str] = None):
+    """Draw one figure with the object-oriented API and optionally save it.
+
+    Args:
+        name (str): Figure name, one of the keys of `prepare_plot_data`
+        data: Aggregated plot input
+        path (Optional[Union[Path, io.BytesIO]]): Output file or buffer,
+            nothing is saved when None
+        dpi (Optional[float]): Output resolution
+        file_format (Optional[str]): Image format, inferred from the file
+            extension when None
+    """
+    if name == 'daily_sales_trend':
+        fig = Figure(figsize=(15, 6))
+        ax = fig.subplots()
+        ax.plot(data.index, data.values)
+        ax.set_title('Daily Sales Trend')
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Total Sales ($)')
+        ax.tick_params(axis='x', labelrotation=45)
+    elif name == 'hourly_sales_pattern':
+        fig = Figure(figsize=(12, 6))
+        ax = fig.subplots()
+        ax.bar(data.index, data.values)
+        ax.set_title('Average Hourly Sales Pattern')
+        ax.set_xlabel('Hour of Day')
+        ax.set_ylabel('Average Sales ($)')
+    elif name in ('category_sales', 'store_performance'):
+        if name == 'category_sales':
+            fig = Figure(figsize=(10, 6))
+            title, xlabel = 'Sales by Product Category', 'Category'
+        else:
+            fig = Figure(figsize=(12, 6))
+            title, xlabel = 'Total Sales by Store Location', 'Store Location'
+        ax = fig.subplots()
+        data.plot(kind='bar', ax=ax)
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel('Total Sales ($)')
+        ax.tick_params(axis='x', labelrotation=45)
+    elif name == 'sales_heatmap':
+        fig = Figure(figsize=(12, 8))
+        ax = fig.subplots()
+        sns.heatmap(data, cmap='YlOrRd', annot=True, fmt='.0f', ax=ax)
+        ax.set_title('Sales Heatmap: Hour vs Day of Week')
+    else:
+        raise ValueError(f"Unknown figure: {name}")
+
+    if path is not None:
+        fig.savefig(path, format=file_format, bbox_inches='tight', dpi=dpi if dpi is not None else 'figure')
@@ -1,10 +1,1062 @@
+import asyncio
+import importlib
+import json
+import math
+import os
+import numpy as np
+import subprocess
+import sys
+import tempfile
+import time
 import pandas as pd
-import matplotlib.pyplot as plt
 from pathlib import Path
+from unittest import mock
+from urllib.error import HTTPError
+from urllib.request import urlopen
 
+from src.data.cache import DatasetCache
 from src.data.data_loader import DataLoader
-from src.preprocessing.preprocessor import DataPreprocessor
+from src.preprocessing.preprocessor import DAY_NAMES, DataPreprocessor
+from src.features.feature_engineering import FeatureEngineer
+from src.data.synthetic import TRANSACTION_COLUMNS, generate_transactions, iter_transactions, write_transactions
 from src.models.sales_analyzer import SalesAnalyzer
+from src.models.incremental_store import IncrementalSalesStore
+from src.models.partitioned import PartitionedExecutor
+from src.models.sales_cube import SalesCube
+from src.pipeline.lazy_pipeline import LazyPipeline, load_cube
+from src.models.segmentation import RunningStats, SegmentationModel, build_customer_features, iter_customer_features
+from src.service.report_service import ReportService
+from src.utils.result_cache import ResultCache
+from src.utils.sketches import HyperLogLog
+
+# Libraries only the plots and segment subcommands need
+HEAVY_MODULES = ('matplotlib', 'seaborn', 'sklearn', 'scipy')
+
+def test_synthetic_generator(n_rows: int = 10_000):
+    """Check the schema, row counts, determinism and file round trips of the generator."""
+    dtypes = {'transaction_id': 'int64', 'transaction_date': 'datetime64[us]',
+              'transaction_time': 'timedelta64[s]', 'store_id': 'int64', 'store_location': 'category',
+              'product_id': 'int64', 'product_category': 'category', 'product_type': 'category',
+              'transaction_qty': 'int64', 'unit_price': 'float64'}
+    for chunk_size in (1, 999, 4_000, n_rows, 3 * n_rows):
+        chunks = list(iter_transactions(n_rows, chunk_size=chunk_size, n_stores=4, n_products=6))
+        assert [len(chunk) for chunk in chunks] == [min(chunk_size, n_rows - offset)
+                                                    for offset in range(0, n_rows, chunk_size)], chunk_size
+        df = pd.concat(chunks, ignore_index=True)
+        assert list(df.columns) == TRANSACTION_COLUMNS
+        assert df.dtypes.astype(str).to_dict() == dtypes, (chunk_size, df.dtypes)
+        assert df['transaction_date'].is_monotonic_increasing and df['transaction_id'].is_monotonic_increasing
+
+        # Lines of a transaction share its store, date and time, stay in one
+        # chunk and list distinct products
+        chunk_of = np.repeat(np.arange(len(chunks)), [len(chunk) for chunk in chunks])
+        shared = df.assign(chunk=chunk_of).groupby('transaction_id')[
+            ['store_id', 'transaction_date', 'transaction_time', 'chunk']].nunique()
+        assert (shared == 1).all().all(), chunk_size
+        assert not df.duplicated(['transaction_id', 'product_id']).any(), chunk_size
+        assert df['product_id'].between(1, 6).all() and df['store_id'].nunique() == 4
+
+        again = pd.concat(iter_transactions(n_rows, chunk_size=chunk_size, n_stores=4, n_products=6),
+                          ignore_index=True)
+        pd.testing.assert_frame_equal(df, again)
+    other_seed = pd.concat(iter_transactions(n_rows, chunk_size=999, seed=7, n_stores=4, n_products=6),
+                           ignore_index=True)
+    assert not df['product_id'].equals(other_seed['product_id'])
+    pd.testing.assert_frame_equal(generate_transactions(n_rows, n_stores=4, n_products=6), df)
+
+    expected = pd.concat(iter_transactions(n_rows, chunk_size=999), ignore_index=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        parquet = DataLoader(str(write_transactions(os.path.join(tmp, 'sales.parquet'), n_rows,
+                                                    chunk_size=999)), use_cache=False).load_data()
+        csv = DataLoader(str(write_transactions(os.path.join(tmp, 'sales.csv'), n_rows,
+                                                chunk_size=999)), use_cache=False).load_data()
+    pd.testing.assert_frame_equal(parquet, expected)
+    categories = ['store_location', 'product_category', 'product_type']
+    csv = csv.assign(transaction_date=pd.to_datetime(csv['transaction_date']).astype('datetime64[us]'),
+                     transaction_time=pd.to_timedelta(csv['transaction_time']).astype('timedelta64[s]'))
+    pd.testing.assert_frame_equal(csv.drop(columns=categories), expected.drop(columns=categories))
+    for column in categories:
+        assert (csv[column] == expected[column].astype(str)).all(), column
+    print("Synthetic generator: OK")
+
+def test_dataset_cache():
+    """Check that the columnar cache follows the source file and stores atomically.
+
+    A touched but unchanged file is still served from the cache, a rewritten
+    one is re-parsed and replaces its stale copy, and a failed write leaves
+    no cache file behind.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_dir = Path(tmp_dir) / 'cache'
+        path = write_transactions(Path(tmp_dir) / 'sales.csv', 5_000, seed=1)
+        loader = DataLoader(path, cache_dir=str(cache_dir))
+        first = loader.load_data()
+        assert not loader.cache.last_load['hit']
+        assert loader.load_data().equals(first)
+        assert loader.cache.last_load['hit']
+
+        # Same contents, new mtime: found again through the content hash
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        loader.load_data()
+        assert loader.cache.last_load['hit']
+
+        write_transactions(path, 6_000, seed=2)
+        changed = loader.load_data()
+        assert not loader.cache.last_load['hit']
+        assert len(changed) == 6_000
+        assert len(list(cache_dir.glob('*.arrow'))) == 1, "Stale cached copy was not removed"
+
+        # A crash while writing must not leave a (truncated) cache file
+        write_transactions(path, 7_000, seed=3)
+        def failing_write(table, dest, **kwargs):
+            Path(dest).write_bytes(b'partial')
+            raise OSError("disk full")
+        with mock.patch('src.data.cache.feather.write_feather', failing_write):
+            try:
+                loader.load_data()
+                raise AssertionError("The failed write was not reported")
+            except OSError:
+                pass
+        assert loader.cache.lookup(path) is None
+        assert not list(cache_dir.glob('*.tmp')), "Partial write was left in the cache"
+        assert len(loader.load_data()) == 7_000
+        assert loader.cache.lookup(path) is not None
+    print("Dataset cache: OK")
+
+def test_iter_batches(n_rows: int = 2_500, batch_size: int = 700):
+    """Check that every batch reader yields the rows of a full load, in order.
+
+    Covers CSV, Parquet, and Excel read directly, from an Arrow cache (sliced
+    memory map) and from a Parquet cache, and the batch preprocessing.
+    """
+    columns = ['transaction_id', 'transaction_date', 'transaction_qty', 'unit_price', 'store_location']
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        raw = generate_transactions(n_rows, n_stores=4)
+        raw['transaction_time'] = raw['transaction_time'].astype(str).str[-8:]
+        raw.to_excel(tmp_dir / 'sales.xlsx', index=False)
+        loaders = {
+            'csv': DataLoader(write_transactions(tmp_dir / 'sales.csv', n_rows), use_cache=False),
+            'parquet': DataLoader(write_transactions(tmp_dir / 'sales.parquet', n_rows), use_cache=False),
+            'excel': DataLoader(tmp_dir / 'sales.xlsx', use_cache=False),
+        }
+        for cache_format in ('arrow', 'parquet'):
+            loader = DataLoader(tmp_dir / 'sales.xlsx', cache_dir=str(tmp_dir / cache_format),
+                                cache_format=cache_format)
+            loader.load_data()
+            loaders[f'excel ({cache_format} cache)'] = loader
+
+        for name, loader in loaders.items():
+            expected = loader.load_data(columns=columns)
+            batches = list(loader.iter_batches(batch_size, columns=columns))
+            assert [len(batch) for batch in batches] == [batch_size] * (n_rows // batch_size) + [n_rows % batch_size], name
+            streamed = pd.concat(batches, ignore_index=True)
+            # Full Excel/CSV loads keep the file's column order
+            pd.testing.assert_frame_equal(streamed[expected.columns], expected, check_dtype=False, obj=name)
+
+        loader = loaders['parquet']
+        processed = pd.concat(DataPreprocessor.preprocess_batches(loader.iter_batches(batch_size), optimize=False),
+                              ignore_index=True)
+        pd.testing.assert_frame_equal(processed, DataPreprocessor.preprocess_data(loader.load_data(), optimize=False))
+    print("Batch iteration: OK")
+
+def _processed_sample(n_rows: int, **kwargs) -> pd.DataFrame:
+    """Preprocessed synthetic transactions."""
+    return DataPreprocessor.preprocess_data(generate_transactions(n_rows, **kwargs))
+
+def _string_datetime(df: pd.DataFrame, time_format: str = None) -> pd.Series:
+    """The original datetime construction: concatenate strings and re-parse."""
+    times = df['transaction_time']
+    if isinstance(times.iloc[0], str):
+        times = pd.to_datetime(times, format=time_format or '%H:%M:%S').dt.time
+    return pd.to_datetime(df['transaction_date'].astype(str) + ' ' + times.astype(str))
+
+def test_datetime_construction(n_rows: int = 5_000):
+    """Check the numeric datetime construction against the string round trip.
+
+    Times stored as strings, `datetime.time`, timedeltas, a mix of the three
+    and strings in an explicit format must all give the original output.
+    Rows with a missing time or date get NaT.
+    """
+    from datetime import timedelta
+    raw = generate_transactions(n_rows)
+    offsets = raw['transaction_time']
+    strings = offsets.map(lambda offset: str(offset).split(' ')[-1]).astype(object)
+    times = pd.to_datetime(strings, format='%H:%M:%S').dt.time
+    # Starts with a time object, so sniffing the first value misses the strings
+    mixed = pd.Series([[value, text, timedelta(seconds=offset.total_seconds())][i % 3]
+                       for i, (text, value, offset) in enumerate(zip(strings, times, offsets))], dtype=object)
+    time_format = '%I:%M:%S %p'
+    formatted = pd.to_datetime(strings, format='%H:%M:%S').dt.strftime(time_format).astype(object)
+
+    expected = _string_datetime(raw.assign(transaction_time=strings))
+    variants = {
+        'str': (strings, None),
+        'time': (times, None),
+        'timedelta': (offsets, None),
+        'mixed': (mixed, None),
+        'format': (formatted, time_format),
+    }
+    for name, (values, fmt) in variants.items():
+        frame = raw.assign(transaction_time=values)
+        df = DataPreprocessor.preprocess_data(frame, time_format=fmt, optimize=False)
+        assert (df['datetime'] == expected).all(), name
+        assert df['datetime'].dtype == expected.dtype, name
+        if name in ('time', 'format'):
+            assert (df['datetime'] == _string_datetime(frame, fmt)).all(), name
+        if name in ('str', 'mixed', 'format'):
+            # String times are converted to datetime.time, as before
+            assert list(df['transaction_time']) == list(times), name
+
+    frame = raw.assign(transaction_time=strings)
+    frame.loc[frame.index[::7], 'transaction_time'] = None
+    frame.loc[frame.index[3::11], 'transaction_date'] = pd.NaT
+    df = DataPreprocessor.preprocess_data(frame, columns=['datetime'])
+    missing = frame['transaction_time'].isna() | frame['transaction_date'].isna()
+    assert df['datetime'].isna().equals(missing)
+    assert (df['datetime'][~missing] == expected[~missing]).all()
+    print("Datetime construction: OK")
+
+def test_missing_times(n_rows: int = 5_000, batch_size: int = 1_200):
+    """Check that rows with a missing time or date preprocess to NaN features.
+
+    The hour stays int8 when every row has a datetime and becomes float32
+    with NaN otherwise; day names, months and time periods are missing for
+    those rows, and the features computed from them follow.
+    """
+    raw = generate_transactions(n_rows)
+    assert DataPreprocessor.preprocess_data(raw)['hour'].dtype == 'int8'
+    raw.loc[raw.index[::7], 'transaction_time'] = pd.NaT
+    raw.loc[raw.index[3::11], 'transaction_date'] = pd.NaT
+    df = DataPreprocessor.preprocess_data(raw)
+    missing = raw['transaction_time'].isna() | raw['transaction_date'].isna()
+
+    assert df['datetime'].isna().equals(missing)
+    assert df['hour'].dtype == 'float32'
+    assert df['hour'].isna().equals(missing)
+    assert (df['hour'][~missing] == df['datetime'][~missing].dt.hour).all()
+    for column in ('day_of_week', 'month', 'time_period'):
+        assert df[column].isna()[missing].all(), column
+    assert df['day_of_week'].notna()[~missing].all() and df['month'].notna()[~missing].all()
+
+    batched = pd.concat(DataPreprocessor.preprocess_batches(
+        raw.iloc[start:start + batch_size] for start in range(0, n_rows, batch_size)), ignore_index=True)
+    pd.testing.assert_series_equal(batched['hour'].astype('float64'), df['hour'].astype('float64'))
+
+    features = FeatureEngineer.create_features(df)
+    time_features = FeatureEngineer.create_time_features(df)
+    for frame in (features, time_features):
+        assert frame['day_of_week_num'].isna().equals(missing)
+        assert frame['hour_sin'].isna().equals(missing)
+        assert (frame['is_weekend'][missing] == 0).all()
+    peak = df[~missing].groupby('hour')['total_amount'].sum().idxmax()
+    assert SalesAnalyzer.analyze_sales_trends(df)['peak_sales_hour'] == peak
+    print("Missing times: OK")
+
+def test_create_features_parity(n_rows: int = 100_000):
+    """Check the fused feature pass against chaining the three feature methods.
+
+    Group sums are accumulated in a different order, so float features are
+    compared with a relative tolerance.
+    """
+    df = _processed_sample(n_rows, n_stores=5, n_products=40)
+    chained = FeatureEngineer.create_store_features(
+        FeatureEngineer.create_sales_features(FeatureEngineer.create_time_features(df)))
+    fused = FeatureEngineer.create_features(df)
+    pd.testing.assert_frame_equal(fused[chained.columns], chained, check_exact=False, rtol=1e-12)
+    print("Fused features: OK")
+
+def _assert_results_close(expected, actual, rtol: float = 1e-9, obj: str = ''):
+    """Compare analysis results (frames or dicts of scalars) up to float rounding."""
+    if isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(expected.reset_index(drop=True), actual.reset_index(drop=True),
+                                      check_exact=False, rtol=rtol, obj=obj)
+        return
+    assert expected.keys() == actual.keys(), obj
+    for metric, value in expected.items():
+        if isinstance(value, (float, np.floating)):
+            assert math.isclose(value, actual[metric], rel_tol=rtol), (obj, metric, value, actual[metric])
+        else:
+            assert value == actual[metric], (obj, metric, value, actual[metric])
+
+def test_lazy_pipeline(n_rows: int = 20_000):
+    """Check the pruned lazy pipeline against the eager stages.
+
+    The plan must push column projection down into the loader and skip the
+    feature columns no requested output uses.
+    """
+    selected = ['transaction_id', 'total_amount', 'hour', 'is_weekend', 'store_daily_sales']
+    read = []
+    load_data = DataLoader.load_data
+    def recording_load(self, columns=None):
+        read.append(columns)
+        return load_data(self, columns=columns)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_transactions(os.path.join(tmp, 'sales.parquet'), n_rows,
+                                  n_stores=4, n_products=25)
+        loader = DataLoader(path, use_cache=False)
+        eager = FeatureEngineer.create_features(DataPreprocessor.preprocess_data(loader.load_data()))
+        full = (LazyPipeline(loader).analyze_sales_trends().analyze_product_performance()
+                .analyze_store_performance().segment_customers(n_clusters=3).select(*selected))
+        trends = LazyPipeline(loader).analyze_sales_trends()
+        with mock.patch.object(DataLoader, 'load_data', recording_load):
+            results = full.collect()
+            trend_results = trends.collect()
+
+    plan, trends_plan = full.plan(), trends.plan()
+    assert read == [plan['load'], trends_plan['load']], read
+    assert plan['outputs'] == ['analyze_sales_trends', 'analyze_product_performance',
+                               'analyze_store_performance', 'segment_customers', 'frame'], plan
+    assert plan['features'] == ['is_weekend', 'store_daily_sales'], plan
+    assert not {'transaction_id', 'product_id', 'store_id'} & set(trends_plan['load']), trends_plan
+    assert not trends_plan['features'], trends_plan
+    for column in ('hour_sin', 'hour_cos', 'store_product_mix'):
+        assert column not in plan['features'] and column in plan['skipped_features'], (column, plan)
+
+    for method in ('analyze_sales_trends', 'analyze_product_performance', 'analyze_store_performance'):
+        _assert_results_close(getattr(SalesAnalyzer, method)(eager), results[method], obj=method)
+    _assert_results_close(SalesAnalyzer.analyze_sales_trends(eager), trend_results['analyze_sales_trends'],
+                          obj='trends only')
+    expected_segments, _ = SalesAnalyzer.segment_customers(eager, n_clusters=3)
+    _assert_results_close(expected_segments, results['segment_customers'][0], obj='segment_customers')
+    pd.testing.assert_frame_equal(results['frame'], eager[selected], check_exact=False, rtol=1e-9)
+    print("Lazy pipeline: OK")
+
+def test_sales_cube(n_rows: int = 20_000):
+    """Check cube rollups and merged partial cubes against the frame results.
+
+    Some rows have missing keys or amounts: a rollup drops only the rows
+    missing its own key, like a groupby on the frame.
+    """
+    df = _processed_sample(n_rows, n_stores=4, n_products=25)
+    df.loc[df.index[::97], 'store_location'] = np.nan
+    df.loc[df.index[5::101], 'product_category'] = np.nan
+    df.loc[df.index[7::89], 'total_amount'] = np.nan
+    df.loc[df.index[11::103], ['transaction_date', 'datetime']] = pd.NaT
+    df['hour'] = df['datetime'].dt.hour
+    cube = SalesCube.from_transactions(df)
+    merged = SalesCube.merge(SalesCube.from_transactions(df.iloc[i:i + 7_000])
+                             for i in range(0, n_rows, 7_000))
+    frame = df.assign(transaction_date=pd.to_datetime(df['transaction_date']).dt.normalize(),
+                      month=df['transaction_date'].dt.to_period('M'))
+    for name, candidate in (('cube', cube), ('merged', merged)):
+        assert math.isclose(candidate.data['total_amount'].sum(), df['total_amount'].sum(), rel_tol=1e-12)
+        for key in ('transaction_date', 'hour', 'store_location', 'product_category', 'month'):
+            expected = frame.groupby(key, observed=True)['total_amount'].sum()
+            pd.testing.assert_series_equal(candidate.rollup(key)['total_amount'], expected,
+                                           check_exact=False, rtol=1e-9, check_index_type=False,
+                                           check_names=False, obj=f'{name} {key}')
+        for method in ('analyze_sales_trends', 'analyze_product_performance', 'analyze_store_performance'):
+            _assert_results_close(getattr(SalesAnalyzer, method)(df), getattr(SalesAnalyzer, method)(candidate),
+                                  obj=f'{name} {method}')
+    print("Sales cube: OK")
+
+def test_incremental_store(n_rows: int = 12_000):
+    """Check that nightly ingests add each transaction_id once.
+
+    The synthetic transactions have several lines each, all of which must
+    be kept. Covers re-ingesting a day, a line repeated within one batch,
+    compaction and reopening the store from its manifest.
+    """
+    df = _processed_sample(n_rows, n_stores=3)
+    assert df['transaction_id'].duplicated().any()
+    days = [day for _, day in df.groupby('transaction_date', observed=True)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = IncrementalSalesStore(tmp_dir)
+        for day in days[:-1]:
+            assert store.ingest(day)['ingested_rows'] == len(day)
+        summary = store.ingest(days[0])
+        assert summary['ingested_rows'] == 0 and summary['duplicate_rows'] == len(days[0])
+        # A new line for a transaction ingested earlier is rejected too
+        extra_line = days[1].iloc[[0]].assign(product_id=days[1]['product_id'].max() + 1)
+        assert store.ingest(extra_line)['ingested_rows'] == 0
+
+        # The last day arrives with one line sent twice, corrected the second time
+        last = days[-1]
+        corrected = last.iloc[[0]].assign(transaction_qty=5, total_amount=last['unit_price'].iloc[0] * 5)
+        summary = store.ingest(pd.concat([last, corrected]))
+        assert summary['ingested_rows'] == len(last) and summary['duplicate_rows'] == 1
+        expected = pd.concat([last.iloc[1:], corrected, *days[:-1]])
+        _assert_results_close(SalesAnalyzer.analyze_sales_trends(expected), store.analyze_sales_trends())
+
+        before = (store.analyze_sales_trends(), store.analyze_product_performance(),
+                  store.analyze_store_performance())
+        assert store.compact() == len(days)
+        assert len(store.manifest['parts']) == 1
+        assert len(list(Path(tmp_dir, 'cube').glob('*.parquet'))) == 1
+        reopened = IncrementalSalesStore(tmp_dir)
+        after = (reopened.analyze_sales_trends(), reopened.analyze_product_performance(),
+                 reopened.analyze_store_performance())
+        for expected_result, result in zip(before, after):
+            _assert_results_close(expected_result, result)
+        assert reopened.manifest['total_rows'] == n_rows
+        assert reopened.ingest(days[1])['ingested_rows'] == 0
+    print("Incremental store: OK")
+
+def test_render_all(n_rows: int = 5_000):
+    """Check that render_all writes every figure, and nothing for no formats."""
+    from src.visualization.sales_visualizer import SalesVisualizer
+    cube = SalesCube.from_transactions(_processed_sample(n_rows))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        visualizer = SalesVisualizer(tmp_dir)
+        assert visualizer.render_all(cube, formats=()) == []
+        assert visualizer.render_all({}) == []
+        paths = visualizer.render_all(cube, formats=('png', 'svg'), max_workers=2)
+        assert len(paths) == 10 and all(path.stat().st_size > 0 for path in paths)
+    print("Figure rendering: OK")
+
+def test_segmentation_model(n_rows: int = 20_000):
+    """Check the streamed statistics and a save/load round trip of the model."""
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(3.0, 1.0, (10_001, 3)) + 1e6
+    stats = RunningStats(3)
+    for start in range(0, len(values), 999):
+        stats.update(values[start:start + 999])
+    stats.update(values[:0])
+    assert stats.count == len(values)
+    assert np.allclose(stats.mean, values.mean(axis=0), rtol=1e-12, atol=0)
+    assert np.allclose(stats.std, values.std(axis=0, ddof=1), rtol=1e-9, atol=0)
+
+    df = _processed_sample(n_rows)
+    features = build_customer_features(df)
+    # Batches of 997 rows cut through multi-line transactions
+    batches = [df.iloc[i:i + 997] for i in range(0, len(df), 997)]
+    assert any(batch['transaction_id'].iloc[-1] == df['transaction_id'].iloc[i + 997]
+               for i, batch in zip(range(0, len(df) - 997, 997), batches))
+    streamed = pd.concat(iter_customer_features(batches), ignore_index=True)
+    pd.testing.assert_frame_equal(streamed, features, check_dtype=False)
+    chunks = [features.iloc[i:i + 3_000] for i in range(0, len(features), 3_000)]
+    model = SegmentationModel(n_clusters=3, batch_size=1_000, init_sample_size=500).fit(lambda: chunks)
+    assert np.allclose(model.mean_, features[['total_amount', 'transaction_qty', 'product_id']].mean())
+    labels = model.predict(features)
+    assert set(labels) <= {0, 1, 2}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        loaded = SegmentationModel.load(model.save(Path(tmp_dir) / 'model' / 'segments.joblib'))
+        assert np.array_equal(loaded.predict(features), labels)
+        assert np.array_equal(loaded.kmeans_.cluster_centers_, model.kmeans_.cluster_centers_)
+    print("Segmentation model: OK")
+
+def test_stage_profiler():
+    """Check stage records, nesting, `wrap` and the report files.
+
+    Runs with the resource module, without it (falling back to psutil) and
+    without either, where the peak RSS is unknown and written as null.
+    """
+    from src.utils import profiling
+    from src.utils.profiling import StageProfiler
+
+    def run(profiler):
+        with profiler.stage('outer', rows=3):
+            block = np.ones(3_000_000)
+            del block
+            time.sleep(0.02)
+            with profiler.stage('inner'):
+                block = np.ones(2_000_000)
+                time.sleep(0.01)
+                del block
+        total = profiler.wrap(sum)
+        assert total([1, 2, 3]) == 6 and total([4]) == 4
+        return profiler.report()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, patches in {'resource': [],
+                              'psutil': [mock.patch.object(profiling, 'resource', None)],
+                              'no resource': [mock.patch.object(profiling, 'resource', None),
+                                              mock.patch.dict(sys.modules, {'psutil': None})]}.items():
+            for patch in patches:
+                patch.start()
+            try:
+                report = run(StageProfiler())
+            finally:
+                for patch in patches:
+                    patch.stop()
+            assert not profiling.tracemalloc.is_tracing(), name
+            assert list(report['stage']) == ['inner', 'outer', 'sum', 'sum'], name
+            inner, outer = report.iloc[0], report.iloc[1]
+            assert outer['rows'] == 3 and np.isnan(inner['rows']), name
+            assert inner['wall_s'] >= 0.01 and outer['wall_s'] >= inner['wall_s'] + 0.02, name
+            assert (report['cpu_s'] >= 0).all(), name
+            # The outer peak is the 24 MB array freed before the inner stage,
+            # which the inner stage's peak reset must not hide
+            assert 15 <= inner['alloc_peak_mb'] < 20 and outer['alloc_peak_mb'] >= 23, name
+            assert abs(inner['alloc_delta_mb']) < 1, name
+            if name != 'no resource':
+                assert (report['peak_rss_mb'] > 0).all()
+            else:
+                assert report['peak_rss_mb'].isna().all()
+
+            profiler = StageProfiler(trace_memory=False)
+            profiler.records = report.to_dict('records')
+            json_path = profiler.save(Path(tmp_dir) / name / 'profile.json')
+            records = json.loads(json_path.read_text(), parse_constant=lambda token: 1 / 0)
+            assert [record['stage'] for record in records] == list(report['stage'])
+            if name == 'no resource':
+                assert all(record['peak_rss_mb'] is None for record in records)
+            csv_report = pd.read_csv(profiler.save(Path(tmp_dir) / name / 'profile.csv'))
+            pd.testing.assert_frame_equal(csv_report, report, check_dtype=False)
+        no_memory = StageProfiler(trace_memory=False)
+        with no_memory.stage('plain'):
+            pass
+        assert 'alloc_peak_mb' not in no_memory.records[0]
+    print("Stage profiler: OK")
+
+def test_partitioned_parity(n_rows: int = 30_000):
+    """Check sharded execution against the single-pass analysis.
+
+    Shards by date range and by store, from a frame and from Parquet read
+    through filters. Some rows have no store id or date and must land in a
+    residual shard. Merging partial cubes changes the summation order, so
+    floats are compared with a tolerance.
+    """
+    raw = generate_transactions(n_rows, n_stores=4, n_products=30)
+    raw.loc[raw.index[::50], 'store_id'] = np.nan
+    raw.loc[raw.index[7::80], 'transaction_date'] = pd.NaT
+    df = DataPreprocessor.preprocess_data(raw)
+    expected = {report: getattr(SalesAnalyzer, f'analyze_{report}')(df)
+                for report in ('sales_trends', 'product_performance', 'store_performance')}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / 'sales.parquet'
+        raw.to_parquet(path)
+        for partition_by in ('date', 'store_id'):
+            executor = PartitionedExecutor(n_workers=2, partition_by=partition_by, n_partitions=5)
+            shards = executor.shards(str(path))
+            assert all(isinstance(shard, tuple) and shard[1] is not None for shard in shards)
+            assert sum(len(shard) for shard in executor.shards(raw)) == n_rows
+            for name, source in (('frame', raw), ('parquet', str(path))):
+                results = executor.run(source)
+                assert results['cube'].data['line_count'].sum() == n_rows, (partition_by, name)
+                for report, result in expected.items():
+                    _assert_results_close(result, results[report], obj=f'{partition_by} {name} {report}')
+    print("Partitioned execution: OK")
+
+def test_data_quality(n_rows: int = 20_000):
+    """Check duplicate and distinct counts against pandas and the HyperLogLog bound.
+
+    The wide random frame needs more mixed-radix code space than 64 bits,
+    which exercises the renumbering of the row codes.
+    """
+    df = _processed_sample(n_rows, n_stores=4, n_products=30)
+    df = pd.concat([df, df.sample(500, random_state=0)], ignore_index=True)
+    df.loc[df.index[::211], 'unit_price'] = np.nan
+    df.loc[df.index[3::17], 'transaction_time'] = None
+    metrics = DataPreprocessor.check_data_quality(df)
+    assert metrics['duplicates'] == df.duplicated().sum()
+    assert metrics['missing_values'] == df.isna().sum().to_dict()
+    assert metrics['unique_products'] == df['product_id'].nunique()
+    assert DataPreprocessor.check_data_quality(df, approximate=True)['duplicates'] == df.duplicated().sum()
+    for approximate in (False, True):
+        try:
+            DataPreprocessor.check_data_quality(df, duplicate_subset=['transaction_id', 'no_such_col'],
+                                                approximate=approximate)
+        except KeyError as error:
+            assert 'no_such_col' in str(error)
+        else:
+            raise AssertionError("Unknown duplicate_subset column was ignored")
+
+    rng = np.random.default_rng(0)
+    wide = pd.DataFrame(rng.integers(0, 10 ** 9, (n_rows, 6)), columns=[f'c{i}' for i in range(6)])
+    wide = pd.concat([wide, wide.iloc[::7], wide.iloc[::13]], ignore_index=True)
+    wide.loc[wide.index[::19], 'c2'] = np.nan
+    wide['datetime'] = pd.Timestamp('2023-01-01')
+    metrics = DataPreprocessor.check_data_quality(wide, duplicate_subset=list(wide.columns[:6]))
+    assert metrics['duplicates'] == wide.duplicated().sum()
+
+    for precision in (11, 14):
+        bound = 4 * 1.04 / math.sqrt(2 ** precision)
+        for cardinality in (100, 5_000, 1_000_000):
+            values = rng.permutation(np.arange(cardinality) * 7919)
+            sketch = HyperLogLog(precision)
+            for chunk in np.array_split(values, 4):
+                sketch.merge(HyperLogLog(precision).update(chunk))
+            error = abs(sketch.count() - cardinality) / cardinality
+            assert error <= bound, (precision, cardinality, error)
+    print("Data quality: OK")
+
+def test_result_cache_invalidation():
+    """Check that a changed method, helper or version misses the result cache."""
+    def define(body):
+        namespace = {'__name__': __name__}
+        exec(f"def scale(x):\n    return {body}", namespace)
+        return namespace['scale']
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = ResultCache(cache_dir=str(Path(tmp_dir) / 'results'))
+        # Only a constant differs, so the bytecode alone is the same
+        assert cache.call(define('x * 100'), (2,)) == 200
+        assert cache.call(define('x * 1'), (2,)) == 2
+        assert cache.call(define('x * 1'), (2,)) == 2
+        assert cache.stats()['memory_hits'] == 1
+
+        # A helper edited in the module's source, seen by a new process
+        # through the disk tier
+        module_path = Path(tmp_dir) / 'cached_module.py'
+        source = "def helper():\n    return {}\n\ndef compute(x):\n    return helper() + x\n"
+        module_path.write_text(source.format(1))
+        sys.path.insert(0, tmp_dir)
+        try:
+            module = importlib.import_module('cached_module')
+            assert cache.call(module.compute, (1,)) == 2
+            module_path.write_text(source.format(10))
+            stat = module_path.stat()
+            os.utime(module_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            module = importlib.reload(module)
+            fresh_process = ResultCache(cache_dir=str(Path(tmp_dir) / 'results'))
+            assert fresh_process.call(module.compute, (1,)) == 11
+        finally:
+            sys.path.remove(tmp_dir)
+            sys.modules.pop('cached_module', None)
+
+        # The version salt separates caches sharing a directory
+        salted = ResultCache(cache_dir=str(Path(tmp_dir) / 'results'), version='2')
+        salted.call(module.compute, (1,))
+        assert salted.stats()['misses'] == 1
+    print("Result cache invalidation: OK")
+
+def test_heatmap_weekday_order(n_rows: int = 20_000):
+    """Check the weekday x hour bins however day_of_week is encoded.
+
+    Day names that became categorical another way (alphabetical categories)
+    or are plain strings must still land on their own weekday row. Rows
+    with a missing date or time are left out.
+    """
+    from src.visualization.sales_visualizer import SalesVisualizer
+    df = _processed_sample(n_rows)
+    df.loc[df.index[::53], ['transaction_date', 'datetime', 'day_of_week']] = np.nan
+    df['hour'] = df['datetime'].dt.hour
+    valid = df.dropna(subset=['datetime'])
+    expected = valid.groupby([valid['datetime'].dt.dayofweek, 'hour'])['total_amount'].mean().unstack('hour')
+    expected_hourly = valid.groupby('hour')['total_amount'].mean()
+
+    variants = {
+        'monday first': df,
+        'alphabetical': DataPreprocessor.optimize_dtypes(df.assign(day_of_week=df['day_of_week'].astype(str))),
+        'strings': df.assign(day_of_week=df['day_of_week'].astype(object)),
+        'no day_of_week': df.drop(columns='day_of_week'),
+    }
+    assert list(variants['alphabetical']['day_of_week'].cat.categories)[0] == 'Friday'
+    for name, frame in variants.items():
+        table = SalesVisualizer.heatmap_table(frame)
+        assert np.allclose(table.to_numpy(), expected.to_numpy(), rtol=1e-12), name
+        assert list(table.index) == list(np.array(DAY_NAMES)[expected.index]), name
+        assert np.allclose(SalesVisualizer.hourly_sales(frame), expected_hourly, rtol=1e-12), name
+    print("Heatmap weekday order: OK")
+
+def test_rolling_features(n_rows: int = 20_000):
+    """Check rolling, EWMA and lag features against a per-entity pandas reference.
+
+    Whole days and a week of one store's sales are removed, so the dense
+    grid must count days without sales as zero. Rows with a missing key or
+    date get NaN.
+    """
+    df = _processed_sample(n_rows, n_stores=3, n_products=25, n_days=60)
+    dates = df['transaction_date']
+    no_sales = dates.isin(pd.to_datetime(['2023-01-10', '2023-01-11', '2023-02-03']))
+    store_closed = (df['store_id'] == df['store_id'].iloc[0]) & dates.between('2023-01-20', '2023-01-26')
+    df = df[~no_sales & ~store_closed].reset_index(drop=True)
+    df.loc[df.index[::97], 'store_id'] = np.nan
+    df.loc[df.index[5::131], ['transaction_date', 'datetime']] = np.nan
+
+    entities = {'store': ['store_id'], 'store_category': ['store_id', 'product_category']}
+    windows, spans, lags = (3, 7), (7,), (1, 7)
+    features = FeatureEngineer.create_rolling_features(df, entities=entities, windows=windows,
+                                                       ewm_spans=spans, lags=lags)
+    calendar = pd.date_range(df['transaction_date'].min(), df['transaction_date'].max(), name='transaction_date')
+    for prefix, keys in entities.items():
+        valid = df.dropna(subset=keys + ['transaction_date'])
+        rows = []
+        for key, group in valid.groupby(keys, observed=True):
+            sales = group.groupby('transaction_date')['total_amount'].sum().reindex(calendar, fill_value=0.0)
+            past = sales.shift(1)
+            reference = pd.DataFrame({f'{prefix}_sales_roll{w}': past.rolling(w, min_periods=1).mean() for w in windows})
+            for span in spans:
+                reference[f'{prefix}_sales_ewm{span}'] = past.ewm(span=span, adjust=False).mean()
+            for lag in lags:
+                reference[f'{prefix}_sales_lag{lag}'] = sales.shift(lag)
+            rows.append(reference.assign(**dict(zip(keys, key))).reset_index())
+        reference = pd.concat(rows, ignore_index=True)
+        names = [name for name in reference.columns if name.startswith(f'{prefix}_sales_')]
+        expected = df[keys + ['transaction_date']].merge(reference, how='left', on=keys + ['transaction_date'])
+        pd.testing.assert_frame_equal(features[names].reset_index(drop=True), expected[names],
+                                      check_exact=False, rtol=1e-9, obj=prefix)
+        assert features.loc[df[keys + ['transaction_date']].isna().any(axis=1), names].isna().all().all()
+    print("Rolling features: OK")
+
+def test_forecaster(n_rows: int = 60_000):
+    """Check the seasonal forecaster on known series and a seeded backtest.
+
+    A noise-free series without trend is forecast exactly; with a trend the
+    weekday factors absorb part of the slope, so only a small error is
+    allowed. Fitting the stacked series must match fitting them one by one,
+    and a parallel backtest must match a serial one.
+    """
+    from src.models.forecaster import SeasonalForecaster, fit_seasonal, forecast_seasonal, hourly_grid
+    rng = np.random.default_rng(7)
+    n_series, history_days, horizon_days, first_weekday = 5, 70, 14, 2
+    weekday_factor = rng.uniform(0.5, 1.5, 7)
+    weekday_factor /= weekday_factor.mean()
+    hour_share = rng.dirichlet(np.ones(24), size=7)
+    scale = rng.uniform(10, 100, n_series)
+    days = np.arange(history_days + horizon_days)
+    weekdays = (first_weekday + days) % 7
+    for slope, max_wape in ((0.0, 1e-12), (0.01, 0.02)):
+        daily = scale[:, None] * (1 + slope * days) * weekday_factor[weekdays]
+        grid = daily[:, :, None] * hour_share[weekdays][None]
+        params = fit_seasonal(grid[:, :history_days], first_weekday)
+        forecast = forecast_seasonal(params, horizon_days)
+        actual = grid[:, history_days:]
+        assert np.abs(forecast - actual).sum() / actual.sum() <= max_wape, slope
+        assert np.allclose(params['slope'] / scale, slope, rtol=0.02, atol=1e-12), slope
+        looped = np.concatenate([forecast_seasonal(fit_seasonal(grid[i:i + 1, :history_days], first_weekday), horizon_days)
+                                 for i in range(n_series)])
+        assert np.allclose(forecast, looped, rtol=1e-12)
+
+    df = _processed_sample(n_rows, n_days=120)
+    grid, series, _ = hourly_grid(df, ['store_id', 'product_type'])
+    assert len(series) == len(df.groupby(['store_id', 'product_type'], observed=True))
+    assert np.isclose(grid.sum(), df['transaction_qty'].sum())
+    # Lines without a time (NaN hour) are left out of the hourly grid
+    no_time = df.assign(hour=df['hour'].astype('float32'))
+    no_time.loc[no_time.index[::9], 'hour'] = np.nan
+    assert np.isclose(hourly_grid(no_time, ['store_id', 'product_type'])[0].sum(),
+                      no_time['transaction_qty'][no_time['hour'].notna()].sum())
+
+    forecaster = SeasonalForecaster(history_days=56).fit(df)
+    hourly = forecaster.predict(7)
+    daily = forecaster.predict(7, freq='day')
+    assert len(daily) == len(series) * 7 and len(hourly) == len(series) * 7 * 24
+    assert daily['datetime'].min() == df['transaction_date'].max() + pd.Timedelta(days=1)
+    summed = hourly.groupby(['store_id', 'product_type', hourly['datetime'].dt.normalize()],
+                            observed=True, sort=False)['forecast'].sum()
+    assert np.allclose(summed.to_numpy(), daily['forecast'].to_numpy(), rtol=1e-12)
+
+    serial = forecaster.backtest(df, n_origins=4, max_workers=1)
+    parallel = forecaster.backtest(df, n_origins=4, max_workers=2)
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert list(serial['origin']) == list(df['transaction_date'].max() + pd.Timedelta(days=1)
+                                          - pd.to_timedelta([28, 21, 14, 7], unit='D'))
+    assert (serial['daily_wape'] < 0.4).all() and (serial['bias'].abs() < 0.05).all(), serial
+    print("Forecaster: OK")
+
+def test_basket_analysis(n_rows: int = 30_000):
+    """Check item, pair and rule counts against an itertools reference.
+
+    An item bought on several lines of a basket counts once, and rows
+    without an item are skipped. Folding daily batches with `partial_fit`
+    and counting in small chunks must give the same counts as one `fit`.
+    """
+    from collections import Counter
+    from itertools import combinations
+    from src.models.basket_analysis import BasketAnalyzer
+    df = _processed_sample(n_rows, n_products=80)
+    df = pd.concat([df, df[df['transaction_id'].duplicated(keep=False)].iloc[::5]], ignore_index=True)
+    df.loc[df.index[::157], 'product_id'] = np.nan
+
+    baskets = df.dropna(subset=['product_id']).groupby('transaction_id')['product_id'].agg(lambda items: sorted(set(items)))
+    n_baskets = df['transaction_id'].nunique()
+    item_counts = Counter(item for items in baskets for item in items)
+    pair_counts = Counter(pair for items in baskets for pair in combinations(items, 2))
+
+    def normalized(pairs):
+        keys = [tuple(sorted(pair)) for pair in zip(pairs['item_a'], pairs['item_b'])]
+        return pd.Series(pairs['count'].to_numpy(), index=pd.MultiIndex.from_tuples(keys)).sort_index()
+
+    # fit drops items below min_support before counting pairs; partial_fit
+    # keeps every item, so its rarer pairs are read at a lower threshold
+    min_support, pair_support = 0.009, 0.0003
+    frequent_items = {item: count for item, count in item_counts.items() if count / n_baskets >= min_support}
+    fitted = BasketAnalyzer(min_support=min_support, chunk_size=1_000).fit(df)
+    batched = BasketAnalyzer(min_support=min_support, chunk_size=700)
+    for _, day in df.groupby('transaction_date'):
+        batched.partial_fit(day)
+    for name, analyzer in {'fit': fitted, 'partial_fit': batched}.items():
+        assert analyzer.n_baskets_ == n_baskets, name
+        items = analyzer.frequent_items()
+        assert dict(zip(items['product_id'], items['count'])) == frequent_items, name
+        expected = pd.Series({(a, b): count for (a, b), count in pair_counts.items()
+                              if count / n_baskets >= pair_support
+                              and (name == 'partial_fit' or (a in frequent_items and b in frequent_items))}).sort_index()
+        assert normalized(analyzer.pairs(pair_support)).equals(expected), name
+
+        rules = analyzer.rules(pair_support, min_confidence=0.05)
+        reference = []
+        for (a, b), count in expected.items():
+            support = count / n_baskets
+            lift = support / (item_counts[a] / n_baskets * item_counts[b] / n_baskets)
+            for antecedent, consequent in ((a, b), (b, a)):
+                if count / item_counts[antecedent] >= 0.05:
+                    reference.append((antecedent, consequent, count, support, count / item_counts[antecedent], lift))
+        reference = pd.DataFrame(reference, columns=rules.columns).set_index(['antecedent', 'consequent']).sort_index()
+        pd.testing.assert_frame_equal(rules.set_index(['antecedent', 'consequent']).sort_index(), reference,
+                                      check_exact=False, rtol=1e-12, check_dtype=False, obj=name)
+    print("Basket analysis: OK")
+
+def test_cli_startup(max_seconds: float = 1.0, repeats: int = 3, n_rows: int = 5_000):
+    """Check that a metrics-only CLI run starts quickly and stays light.
+
+    Times a fresh interpreter importing `src.cli` and parsing a metrics
+    command, then runs the metrics subcommand on a small file and checks
+    that no plotting or clustering library was loaded either time. Also
+    checks that `analyze_sales` loads the data once for metrics and plots.
+    """
+    import analyze_sales
+    from src.cli import run_plots
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_path = Path(tmp_dir) / 'sales.csv'
+        write_transactions(str(data_path), n_rows)
+        runs = {
+            'parse': "build_parser().parse_args(['metrics'])",
+            'metrics': f"main(['metrics', '--data', {str(data_path)!r}, '--no-data-cache'])",
+        }
+        for name, statement in runs.items():
+            code = (f"import sys; from src.cli import build_parser, main; {statement}; "
+                    f"print('loaded:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                result = subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).parent,
+                                        capture_output=True, text=True, check=True)
+                timings.append(time.perf_counter() - start)
+            loaded = result.stdout.splitlines()[-1].removeprefix('loaded:')
+            print(f"CLI {name}: {min(timings):.3f}s (best of {repeats})")
+            assert not loaded, f"CLI {name} imported {loaded}"
+            # The metrics run also reads the file and builds the cube
+            budget = max_seconds if name == 'parse' else 2 * max_seconds
+            assert min(timings) < budget, f"CLI {name} took {min(timings):.3f}s"
+
+        with mock.patch.object(DataLoader, 'load_data', autospec=True, side_effect=DataLoader.load_data) as load_data, \
+                mock.patch.object(analyze_sales, 'DataLoader',
+                                  lambda path: DataLoader(path, cache_dir=str(Path(tmp_dir) / 'cache'))), \
+                mock.patch.object(analyze_sales, 'run_plots',
+                                  lambda loader, **kwargs: run_plots(loader, str(Path(tmp_dir) / 'figures'), **kwargs)):
+            analyze_sales.analyze_sales(str(data_path))
+        assert load_data.call_count == 1, load_data.call_count
+
+def test_streaming_sketches(n_rows: int = 200_000, batch_size: int = 25_000):
+    """Check the Space-Saving and Count-Min bounds and stream vs exact answers.
+
+    The sketches are fed skewed (Zipf) keys in batches and merged, then
+    compared with exact counts. The streaming analyzer must give the exact
+    answers while every key fits in its summaries, and stay within its
+    stated error bounds when they do not.
+    """
+    from src.models.streaming import PRODUCT_KEYS, STREAM_DERIVED, STORE_KEYS
+    from src.utils.sketches import CountMinSketch, SpaceSaving
+    rng = np.random.default_rng(0)
+    keys = pd.DataFrame({'key': rng.zipf(1.3, n_rows) % 5_000})
+    weights = rng.uniform(1, 10, n_rows)
+    exact = pd.Series(weights).groupby(keys['key']).sum()
+    n_total = weights.sum()
+
+    halves = []
+    for part in np.array_split(np.arange(n_rows), 2):
+        summary = SpaceSaving('key', capacity=50)
+        sketch = CountMinSketch(width=256, depth=4)
+        for batch in np.array_split(part, 8):
+            summary.update(keys.iloc[batch], weights[batch])
+            sketch.update(keys['key'].iloc[batch], weights[batch])
+        halves.append((summary, sketch))
+    summary, sketch = halves[0][0].merge(halves[1][0]), halves[0][1].merge(halves[1][1])
+
+    assert np.isclose(summary.total, n_total) and summary.error_bound() == summary.total / 50
+    top = summary.top()
+    truth = exact.reindex(top['key']).fillna(0).to_numpy()
+    assert (truth <= top['count'] + 1e-6).all() and (truth >= top['lower'] - 1e-6).all()
+    assert (top['error'] <= summary.error_bound() + 1e-6).all()
+    assert set(exact.index[exact > summary.error_bound()]) <= set(top['key'])
+    # Guaranteed keys are the true heaviest keys, in order
+    n_guaranteed = int(top['guaranteed'].cumprod().sum())
+    assert n_guaranteed > 0
+    assert list(top['key'].head(n_guaranteed)) == list(exact.nlargest(n_guaranteed).index)
+
+    estimates = sketch.estimate(exact.index.to_numpy())
+    overestimate = estimates - exact.to_numpy()
+    bound = sketch.error_bound()
+    assert np.isclose(sketch.total, n_total) and (overestimate >= -1e-6).all()
+    assert np.mean(overestimate > bound['max_overestimate']) <= 2 * (1 - bound['confidence'])
+
+    raw = generate_transactions(n_rows, n_stores=5)
+    df = DataPreprocessor.preprocess_data(raw)
+    exact_trends = SalesAnalyzer.analyze_sales_trends(df)
+    exact_products = SalesAnalyzer.analyze_product_performance(df).reset_index(drop=True)
+    exact_stores = SalesAnalyzer.analyze_store_performance(df).reset_index(drop=True)
+    for capacity in (64, 4):
+        batches = DataPreprocessor.preprocess_batches(
+            (raw.iloc[start:start + batch_size] for start in range(0, n_rows, batch_size)), columns=STREAM_DERIVED)
+        results, stream = SalesAnalyzer.analyze_sales_stream(batches, top_n=5, capacity=capacity)
+        trends = results['sales_trends']
+        for name in ('total_sales', 'avg_daily_sales', 'sales_growth'):
+            assert np.isclose(trends[name], exact_trends[name], rtol=1e-9), (capacity, name)
+        assert trends['peak_sales_hour'] == exact_trends['peak_sales_hour']
+        bounds = results['error_bounds']
+
+        products = stream.product_performance(None)
+        stores = stream.store_performance(None)
+        for name, approx, reference, keys in (('product', products, exact_products, PRODUCT_KEYS),
+                                               ('store', stores, exact_stores, STORE_KEYS)):
+            truth = reference.set_index(keys).reindex(pd.MultiIndex.from_frame(approx[keys]))
+            sales = truth['total_amount'].to_numpy()
+            assert (approx['total_amount'] >= sales - 1e-6).all(), (capacity, name)
+            assert (approx['total_amount'] - approx['sales_error'] <= sales + 1e-6).all(), (capacity, name)
+            assert (approx['sales_error'] <= bounds[f'{name}_sales'] + 1e-6).all(), (capacity, name)
+            for measure, column in (('transaction_qty', 'transaction_qty'), ('lines', 'transaction_id')):
+                overestimate = approx[column].to_numpy() - truth[column].to_numpy()
+                assert (overestimate >= -1e-6).all() and (overestimate <= bounds[f'{name}_{measure}']).all()
+            guaranteed = int(approx['guaranteed'].cumprod().sum())
+            assert (approx[keys].head(guaranteed).to_numpy() == reference[keys].head(guaranteed).to_numpy()).all(), (capacity, name)
+            if capacity == 64:
+                # Every key fits in the summaries: exact rankings and sales
+                assert guaranteed == len(reference) == len(approx), name
+                assert np.allclose(approx['total_amount'], reference['total_amount'], rtol=1e-9), name
+        if capacity == 64:
+            assert trends['best_performing_category'] == exact_trends['best_performing_category']
+            assert trends['best_performing_store'] == exact_trends['best_performing_store']
+            assert bounds['best_category_certain'] and bounds['best_store_certain']
+
+    # Keys hash by value whatever the batch dtypes: optimize_dtypes gives
+    # store_id int8 in full batches but float32 in one with missing ids
+    parts = [raw.iloc[start:start + batch_size].copy() for start in range(0, 4 * batch_size, batch_size)]
+    parts[1]['store_id'] = parts[1]['store_id'].astype('float64')
+    parts[1].loc[parts[1].index[::37], 'store_id'] = np.nan
+    parts[2].loc[parts[2].index[::41], 'product_type'] = np.nan
+    batches = list(DataPreprocessor.preprocess_batches(iter(parts), columns=STREAM_DERIVED))
+    batches[3] = batches[3].astype({'store_id': 'float64', 'product_category': str, 'product_type': str})
+    assert [str(batch['store_id'].dtype) for batch in batches] == ['int8', 'float32', 'int8', 'float64']
+    df = DataPreprocessor.preprocess_data(pd.concat(parts, ignore_index=True))
+    _, stream = SalesAnalyzer.analyze_sales_stream(iter(batches), capacity=64)
+    for approx, reference, keys in ((stream.product_performance(None),
+                                     SalesAnalyzer.analyze_product_performance(df), PRODUCT_KEYS),
+                                    (stream.store_performance(),
+                                     SalesAnalyzer.analyze_store_performance(df), STORE_KEYS)):
+        truth = reference.set_index(keys).reindex(pd.MultiIndex.from_frame(approx[keys]))
+        assert len(approx) == len(reference)
+        assert np.allclose(approx['total_amount'], truth['total_amount'], rtol=1e-9)
+        for column in ('transaction_qty', 'transaction_id'):
+            assert (approx[column].to_numpy() >= truth[column].to_numpy()).all(), (keys, column)
+    assert np.isfinite(stream.store_performance()['avg_transaction_value']).all()
+    print("Streaming sketches: OK")
+
+def test_sql_backend_parity(n_rows: int = 50_000):
+    """Check that the DuckDB backend answers exactly like the pandas one.
+
+    Runs both backends on synthetic Parquet and CSV files with several
+    stores and products and compares the results.
+    """
+    pandas_analyzer = SalesAnalyzer()
+    sql_analyzer = SalesAnalyzer(backend='duckdb')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for suffix in ('parquet', 'csv'):
+            path = write_transactions(Path(tmp_dir) / f'sales.{suffix}', n_rows, chunk_size=n_rows // 3,
+                                      n_stores=5, n_products=30)
+            df = DataPreprocessor.preprocess_data(DataLoader(path, use_cache=False).load_data())
+            for method in ('analyze_product_performance', 'analyze_store_performance'):
+                pd.testing.assert_frame_equal(getattr(pandas_analyzer, method)(df),
+                                              getattr(sql_analyzer, method)(path),
+                                              check_exact=False, rtol=1e-9)
+            expected = pandas_analyzer.analyze_sales_trends(df)
+            actual = sql_analyzer.analyze_sales_trends(path)
+            for metric, value in expected.items():
+                if isinstance(value, float):
+                    assert math.isclose(value, actual[metric], rel_tol=1e-9), (suffix, metric)
+                else:
+                    assert value == actual[metric], (suffix, metric)
+            print(f"SQL backend parity on {suffix}: OK")
+
+    # Quoted literals in the time format, and a product whose prices are all
+    # missing: its sales are 0 on both backends
+    raw = generate_transactions(n_rows // 10, n_stores=5, n_products=30)
+    seconds = raw['transaction_time'].dt.total_seconds().astype('int64')
+    time_format = "%H'%M'%S"
+    raw['transaction_time'] = [f"{s // 3600:02d}'{s // 60 % 60:02d}'{s % 60:02d}" for s in seconds]
+    raw.loc[raw['product_type'] == raw['product_type'].iloc[0], 'unit_price'] = np.nan
+    df = DataPreprocessor.preprocess_data(raw, time_format=time_format)
+    sql_analyzer = SalesAnalyzer(backend='duckdb', time_format=time_format)
+    product_performance = sql_analyzer.analyze_product_performance(raw)
+    pd.testing.assert_frame_equal(pandas_analyzer.analyze_product_performance(df), product_performance,
+                                  check_exact=False, rtol=1e-9)
+    assert (product_performance['total_amount'] == 0).any()
+    actual = sql_analyzer.analyze_sales_trends(raw)
+    for metric, value in pandas_analyzer.analyze_sales_trends(df).items():
+        assert value == actual[metric] or math.isclose(value, actual[metric], rel_tol=1e-9), metric
+    print("SQL backend on a quoted time format: OK")
+
+    # Missing store ids make store_id a float column (DOUBLE in DuckDB); the
+    # stores keep the pandas float32 ids on a frame and on a Parquet file
+    raw = generate_transactions(n_rows // 10, n_stores=5, n_products=30)
+    raw['store_id'] = raw['store_id'].astype('float64')
+    raw.loc[raw.index[::53], 'store_id'] = np.nan
+    expected = pandas_analyzer.analyze_store_performance(DataPreprocessor.preprocess_data(raw))
+    assert expected['store_id'].dtype == 'float32'
+    sql_analyzer = SalesAnalyzer(backend='duckdb')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / 'missing_stores.parquet'
+        raw.to_parquet(path, index=False)
+        for source in (raw, path):
+            pd.testing.assert_frame_equal(expected, sql_analyzer.analyze_store_performance(source),
+                                          check_exact=False, rtol=1e-9)
+    print("SQL backend with missing store ids: OK")
+
+def test_report_service(n_rows: int = 20_000, clients: int = 8, requests_per_client: int = 20):
+    """Check the report service under concurrent load and across a reload.
+
+    Starts the service on a free port, fires requests from concurrent HTTP
+    clients, compares the answers with `SalesAnalyzer`, then rewrites the
+    data file and waits for the hot reload to serve the new data.
+    """
+    routes = ['/sales_trends', '/product_performance?top=5', '/store_performance',
+              '/figures/category_sales.png', '/health']
+
+    def fetch(url):
+        with urlopen(url, timeout=30) as response:
+            return response.read()
+
+    def expected_sales(path):
+        return SalesAnalyzer.analyze_sales_trends(load_cube(DataLoader(path, use_cache=False)))['total_sales']
+
+    async def exercise(path):
+        service = await ReportService(path, port=0, use_cache=False, reload_interval=0.1).start()
+        base = f'http://{service.host}:{service.port}'
+        try:
+            async def client(i):
+                return [await asyncio.to_thread(fetch, base + routes[(i + j) % len(routes)])
+                        for j in range(requests_per_client)]
+            responses = [body for bodies in await asyncio.gather(*(client(i) for i in range(clients)))
+                         for body in bodies]
+            assert len(responses) == clients * requests_per_client
+
+            trends = json.loads(await asyncio.to_thread(fetch, base + '/sales_trends'))
+            assert math.isclose(trends['total_sales'], expected_sales(path), rel_tol=1e-9)
+            assert len(json.loads(await asyncio.to_thread(fetch, base + '/product_performance?top=3'))) == 3
+            figure = await asyncio.to_thread(fetch, base + '/figures/sales_heatmap.png')
+            assert figure.startswith(b'\x89PNG')
+            try:
+                await asyncio.to_thread(fetch, base + '/unknown')
+                raise AssertionError("Unknown route did not return 404")
+            except HTTPError as e:
+                assert e.code == 404
+
+            stats = service.latency_percentiles()
+            print("Report service latency (ms):")
+            for route, route_stats in stats.items():
+                print(f"  {route}: {route_stats}")
+            assert stats['all']['count'] >= clients * requests_per_client
+
+            # Hot reload: a rewritten file is picked up without a restart
+            write_transactions(path, n_rows * 2, seed=7)
+            deadline = time.perf_counter() + 30
+            while service.snapshot.version < 2:
+                assert time.perf_counter() < deadline, "Service did not reload the changed file"
+                await asyncio.sleep(0.1)
+            trends = json.loads(await asyncio.to_thread(fetch, base + '/sales_trends'))
+            assert math.isclose(trends['total_sales'], expected_sales(path), rel_tol=1e-9)
+            print("Report service: OK")
+        finally:
+            await service.stop()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = write_transactions(Path(tmp_dir) / 'sales.parquet', n_rows, n_stores=4)
+        asyncio.run(exercise(path))
 
 def main():
     print("Starting Basic Analysis Test...")
@@ -40,4 +1092,27 @@ def main():
         print(f"{metric}: {value}")
 
 if __name__ == "__main__":
+    test_synthetic_generator()
+    test_dataset_cache()
+    test_iter_batches()
+    test_datetime_construction()
+    test_missing_times()
+    test_create_features_parity()
+    test_lazy_pipeline()
+    test_sales_cube()
+    test_incremental_store()
+    test_render_all()
+    test_segmentation_model()
+    test_stage_profiler()
+    test_partitioned_parity()
+    test_data_quality()
+    test_result_cache_invalidation()
+    test_heatmap_weekday_order()
+    test_rolling_features()
+    test_forecaster()
+    test_basket_analysis()
+    test_cli_startup()
+    test_streaming_sketches()
+    test_sql_backend_parity()
+    test_report_service()
     main()